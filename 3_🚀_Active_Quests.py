@@ -2,6 +2,7 @@
 
 import streamlit as st
 import utils # Import shared utility functions
+import view_models
 
 # --- Page Configuration ---
 st.set_page_config(page_title="Active Quests", page_icon="🚀")
@@ -56,68 +57,10 @@ st.title("🚀 Your Active Quests")
 st.write("This board shows quests you can currently work on, primarily from your accepted Missions.")
 st.divider()
 
-kid_assignments = assignments_data.get(username, {})
 # --- 1. Gather ALL Active Items ---
-
-active_items = [] # List to hold dicts for all displayable/actionable items
-# A. Active Standalone Quests
-standalone_quest_assignments = {
-    assign_id: data for assign_id, data in kid_assignments.items()
-    if data.get('type') == 'quest' and data.get('status') == 'active'
-}
-for assign_id, assignment_data in standalone_quest_assignments.items():
-     quest_id = assignment_data.get('quest_id') or assignment_data.get('template_id')
-     quest_template = quest_templates.get(quest_id)
-     if quest_template:
-         active_items.append({
-             "item_type": "standalone_quest", "assign_id": assign_id,
-             "quest_id": quest_id, "template": quest_template,
-             "task_statuses": assignment_data.get('task_status', {})
-         })
-
-
-# B. Active Quests & Tasks from within Accepted Missions
-accepted_missions = {
-    assign_id: data for assign_id, data in kid_assignments.items()
-    if data.get('type') == 'mission' and data.get('status') == 'accepted'
-}
-for mission_assign_id, mission_assignment_data in accepted_missions.items():
-    mission_template_id = mission_assignment_data.get('template_id')
-    mission_template = mission_templates.get(mission_template_id)
-    if not mission_template: continue
-
-    # Check contained Quests
-    contained_quest_ids = mission_template.get('contains_quests', [])
-    for quest_id in contained_quest_ids:
-        quest_instance_status = utils.calculate_item_status(quest_id, 'quest', mission_template, mission_assignment_data)
-        if quest_instance_status == 'active':
-            quest_template = quest_templates.get(quest_id)
-            if quest_template:
-                # Append to active_items instead of active_mission_quests
-                # Ensure the keys match what the display loop expects
-                active_items.append({
-                    "item_type": "mission_quest", # Add this type identifier
-                    "assign_id": mission_assign_id, # Mission's assignment ID
-                    "quest_id": quest_id,
-                    "template": quest_template, # Use 'template' key like standalone quests
-                    "task_statuses": mission_assignment_data.get('quest_instances', {}).get(quest_id, {}).get('task_status', {}),
-                    "mission_template": mission_template # Keep for context display
-                 })
-            else:
-                print(f"DEBUG:   Template NOT FOUND for '{quest_id}' in quest_templates dict!")
-
-    # Check contained Standalone Tasks
-    contained_task_ids = mission_template.get('contains_tasks', [])
-    for task_id in contained_task_ids:
-        task_instance_status = utils.calculate_item_status(task_id, 'task', mission_template, mission_assignment_data)
-        if task_instance_status == 'active':
-             task_template = task_templates.get(task_id)
-             if task_template:
-                 active_items.append({
-                      "item_type": "mission_task", "assign_id": mission_assign_id, # Mission assignment ID
-                      "task_id": task_id, "template": task_template,
-                      "mission_template": mission_template # Pass mission template for context
-                 })
+# Maintained per user in view_models: only assignments that changed since the last
+# build are re-checked, so this read is proportional to what can be acted on now.
+active_items = view_models.actionable_items(username, assignments_data, mission_templates, quest_templates, task_templates)
 
 
 
@@ -161,58 +104,56 @@ else:
                           if st.button("Done!", key=button_key, disabled=(task_status != 'pending')):
                               # --- BUTTON LOGIC ---
                               # Load fresh data
-                              current_assignments = utils.load_assignments(ASSIGNMENTS_FILE)
-                              current_points = utils.load_points(POINTS_FILE)
-                              if current_assignments is None or current_points is None:
-                                  st.error("Failed to load data before update.")
-                              else:
-                                  task_completed = False
-                                  # Update task status in the correct place
-                                  try:
-                                      if item_type == "standalone_quest":
-                                          current_assignments[username][assign_id]['task_status'][task_id] = 'completed'
-                                          task_completed = True
-                                      elif item_type == "mission_quest":
-                                          current_assignments[username][assign_id]['quest_instances'][quest_id]['task_status'][task_id] = 'completed'
-                                          task_completed = True
-                                  except KeyError:
-                                       st.error("Failed to find task to update status.")
-
-                                  if task_completed:
-                                      st.success(f"Task '{task_desc}' marked done!")
-                                      # Award task points
-                                      current_points[username] = current_points.get(username, 0) + task_points
-                                      utils.save_points(current_points, POINTS_FILE) # Save points immediately
-
-                                      # Check for Quest Completion
-                                      quest_just_completed = utils.check_and_complete_quest_instance(
-                                          username, assign_id, quest_id, current_assignments, current_points, quest_templates
-                                          # Need to adapt this function slightly based on item_type if necessary
-                                      )
-                                      # Save points again if bonus was added
-                                      if quest_just_completed: utils.save_points(current_points, POINTS_FILE)
-
-
-                                      # If quest was part of mission, check mission completion & update prerequisites
-                                      if item_type == "mission_quest":
-                                           mission_just_completed = utils.check_and_complete_mission_instance(
-                                               username, assign_id, current_assignments, current_points, mission_templates, quest_templates, task_templates
-                                           )
-                                           if mission_just_completed: utils.save_points(current_points, POINTS_FILE) # Save points again
-
-                                           utils.update_prerequisites(
-                                               username, assign_id, current_assignments, mission_templates
-                                           )
-
-
-                                      # Save assignments & update session state
-                                      if utils.save_assignments(current_assignments, ASSIGNMENTS_FILE):
-                                          st.session_state['assignments'] = current_assignments
-                                          st.session_state['points'] = current_points # Update points in state too
-                                          st.experimental_rerun()
-                                      else:
-                                           st.error("Failed to save progress update.")
-                              # --- END BUTTON LOGIC ---
+                              with utils.assignments_lock:
+                                  current_assignments = utils.load_assignments(ASSIGNMENTS_FILE)
+                                  current_points = utils.load_points(POINTS_FILE)
+                                  if current_assignments is None or current_points is None:
+                                      st.error("Failed to load data before update.")
+                                  else:
+                                      task_completed = False
+                                      # Update task status in the correct place
+                                      try:
+                                          if item_type == "standalone_quest":
+                                              current_assignments[username][assign_id]['task_status'][task_id] = 'completed'
+                                              task_completed = True
+                                          elif item_type == "mission_quest":
+                                              current_assignments[username][assign_id]['quest_instances'][quest_id]['task_status'][task_id] = 'completed'
+                                              task_completed = True
+                                      except KeyError:
+                                           st.error("Failed to find task to update status.")
+
+                                      if task_completed:
+                                          st.success(f"Task '{task_desc}' marked done!")
+                                          # Award task points (plus any bonus below), saved once at the end
+                                          awards = []
+                                          utils.award_points(current_points, username, task_points, 'task', awards, tasks=1)
+
+                                          # Check for Quest Completion
+                                          quest_just_completed = utils.check_and_complete_quest_instance(
+                                              username, assign_id, quest_id, current_assignments, current_points, quest_templates, awards
+                                              # Need to adapt this function slightly based on item_type if necessary
+                                          )
+
+
+                                          # If quest was part of mission, check mission completion & update prerequisites
+                                          if item_type == "mission_quest":
+                                               mission_just_completed = utils.check_and_complete_mission_instance(
+                                                   username, assign_id, current_assignments, current_points, mission_templates, quest_templates, task_templates, awards
+                                               )
+
+                                               utils.update_prerequisites(
+                                                   username, assign_id, current_assignments, mission_templates
+                                               )
+
+
+                                          # Save points & assignments, then update session state
+                                          if utils.save_points(current_points, POINTS_FILE, awards) and utils.save_assignments(current_assignments, ASSIGNMENTS_FILE):
+                                              st.session_state['assignments'] = current_assignments
+                                              st.session_state['points'] = current_points # Update points in state too
+                                              st.experimental_rerun()
+                                          else:
+                                               st.error("Failed to save progress update.")
+                                  # --- END BUTTON LOGIC ---
 
         # --- Display Standalone Task from Mission ---
         elif item_type == "mission_task":
@@ -229,42 +170,42 @@ else:
              if st.button("Done!", key=button_key, disabled=(task_status != 'active')): # Should always be active here
                   # --- BUTTON LOGIC ---
                   # Load fresh data
-                  current_assignments = utils.load_assignments(ASSIGNMENTS_FILE)
-                  current_points = utils.load_points(POINTS_FILE)
-                  if current_assignments is None or current_points is None:
-                       st.error("Failed to load data before update.")
-                  else:
-                       task_completed = False
-                       try:
-                           # Update standalone task instance status within mission
-                           current_assignments[username][assign_id]['task_instances'][task_id]['status'] = 'completed'
-                           task_completed = True
-                       except KeyError:
-                            st.error("Failed to find task to update status.")
-
-                       if task_completed:
-                           st.success(f"Task '{tt.get('description')}' marked done!")
-                           task_points = tt.get('points', 0)
-                           current_points[username] = current_points.get(username, 0) + task_points
-                           utils.save_points(current_points, POINTS_FILE)
-
-                           # Check for Mission Completion & update prerequisites
-                           mission_just_completed = utils.check_and_complete_mission_instance(
-                                username, assign_id, current_assignments, current_points, mission_templates, quest_templates, task_templates
-                           )
-                           if mission_just_completed: utils.save_points(current_points, POINTS_FILE)
-
-                           utils.update_prerequisites(
-                                username, assign_id, current_assignments, mission_templates
-                           )
-
-                           # Save assignments & update session state
-                           if utils.save_assignments(current_assignments, ASSIGNMENTS_FILE):
-                               st.session_state['assignments'] = current_assignments
-                               st.session_state['points'] = current_points
-                               st.experimental_rerun()
-                           else:
-                                st.error("Failed to save progress update.")
+                  with utils.assignments_lock:
+                      current_assignments = utils.load_assignments(ASSIGNMENTS_FILE)
+                      current_points = utils.load_points(POINTS_FILE)
+                      if current_assignments is None or current_points is None:
+                           st.error("Failed to load data before update.")
+                      else:
+                           task_completed = False
+                           try:
+                               # Update standalone task instance status within mission
+                               current_assignments[username][assign_id]['task_instances'][task_id]['status'] = 'completed'
+                               task_completed = True
+                           except KeyError:
+                                st.error("Failed to find task to update status.")
+
+                           if task_completed:
+                               st.success(f"Task '{tt.get('description')}' marked done!")
+                               task_points = tt.get('points', 0)
+                               awards = []
+                               utils.award_points(current_points, username, task_points, 'task', awards, tasks=1)
+
+                               # Check for Mission Completion & update prerequisites
+                               mission_just_completed = utils.check_and_complete_mission_instance(
+                                    username, assign_id, current_assignments, current_points, mission_templates, quest_templates, task_templates, awards
+                               )
+
+                               utils.update_prerequisites(
+                                    username, assign_id, current_assignments, mission_templates
+                               )
+
+                               # Save points & assignments, then update session state
+                               if utils.save_points(current_points, POINTS_FILE, awards) and utils.save_assignments(current_assignments, ASSIGNMENTS_FILE):
+                                   st.session_state['assignments'] = current_assignments
+                                   st.session_state['points'] = current_points
+                                   st.experimental_rerun()
+                               else:
+                                    st.error("Failed to save progress update.")
 
 
 # --- End of App ---
\ No newline at end of file
@@ -1,6 +1,13 @@
 import streamlit as st
 import auth
 import utils
+import history
+import history_search # Keeps the history search index up to date as events are logged
+import daily_stats
+import leaderboards
+import login_stats
+import scheduler
+import view_models
 from datetime import datetime, timezone
 import time
 from pathlib import Path
@@ -15,6 +22,14 @@ st.set_page_config(page_title="Explorers", page_icon="😎", layout="wide",menu_
        })
 
 
+@st.cache_resource
+def start_chore_scheduler():
+    """Runs once per server process; the thread then creates recurring chores in the background."""
+    return scheduler.start()
+
+start_chore_scheduler()
+
+
 hide_menu_style = """
     <style>
     .st-emotion-cache-15yi2hn.eecegii10 [data-testid="stMarkdownContainer"] p:last-child {
@@ -44,7 +59,6 @@ with st.spinner("Getting all the goodies together...", show_time=True):
     MISSIONS_TEMPLATE_FILE = 'missions.json'
     ASSIGNMENTS_FILE = 'assignments.json'
     POINTS_FILE = 'points.json'
-    HISTORY_FOLDER = Path("user_history")
     
     # --- Load Data into Session State After Login (If not already loaded) ---
     if authentication_status:
@@ -95,87 +109,34 @@ with st.spinner("Getting all the goodies together...", show_time=True):
 
     
 
-    # --- Check if login event has already been logged for this session ---
+    # --- Count the login once per session ---
+    # Logins are aggregated in login_stats (first/last seen, per-day counts); only a sampled
+    # share of sessions also writes a raw "login" event, so session start never touches history.
     if not st.session_state.get('login_event_logged', False):
         try:
-            HISTORY_FOLDER.mkdir(parents=True, exist_ok=True)
-            safe_filename = f"{username}_history.json" # Use a safe version of the name if needed
-            print(f"Safe filename: {safe_filename}")
-            history_file_path = HISTORY_FOLDER / safe_filename
-
-            # --- Create history file if it doesn't exist ---
-            if not history_file_path.is_file():
-                initial_history_data = []
-                try:
-                    with open(history_file_path, 'w', encoding='utf-8') as f:
-                        json.dump(initial_history_data, f, indent=4)
-                    print(f"Created history file for {firstname} at: {history_file_path}") # Log for debugging
-                    utils.show_first_login(st.session_state.get('role'))
-                except OSError as e:
-                    st.error(f"Failed to create history file: {e}")
-                    st.stop()
-
-            # --- Log the event of user login (only if not already logged this session) ---
-            now_utc = datetime.now(timezone.utc)
-            timestamp_iso = now_utc.isoformat() # Standard ISO 8601 format
-
-            login_event = {
-                "timestamp": timestamp_iso,
-                "event_type": "login",
-                "user": username,
-                "message": f"{username} logged in.",
-                "affected_item":f"{username}"
-            }
-
-            # --- Read, Append, Write ---
-            current_history = []
-            try:
-                # Read existing data (even if file was just created, it's empty list)
-                with open(history_file_path, 'r', encoding='utf-8') as f:
-                    # Handle empty file case gracefully before JSON decoding
-                    content = f.read()
-                    if content:
-                        current_history = json.loads(content)
-                        if not isinstance(current_history, list):
-                             st.warning(f"History file for {firstname} was corrupted (not a list). Resetting history.")
-                             print(f"Warning: History file {history_file_path} was not a list. Resetting.") # Server log
-                             current_history = []
-                    else:
-                        # File exists but is empty
-                        current_history = []
-
-            except json.JSONDecodeError:
-                 st.warning(f"History file for {firstname} contained invalid JSON. Starting fresh.")
-                 print(f"Warning: History file {history_file_path} contained invalid JSON. Starting fresh.") # Server log
-                 current_history = []
-            except FileNotFoundError:
-                 # Should not happen due to check above, but good to be defensive
-                 st.error(f"History file {history_file_path} not found unexpectedly.")
-                 current_history = []
-                 st.stop() # Stop if the file vanished unexpectedly
-            except OSError as e:
-                 st.error(f"Error reading history file {history_file_path}: {e}")
-                 st.stop()
-
-
-            # Append the new login event
-            current_history.append(login_event)
-
-            # Write the updated list back to the file
-            try:
-                with open(history_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(current_history, f, indent=4)
-                print(f"Logged login event for {firstname}.")
-
-                # --- !!! SET THE FLAG !!! ---
-                # Mark that the login event has been processed for this session
-                st.session_state['login_event_logged'] = True
-                # -----------------------------
-
-            except OSError as e:
-                st.error(f"Error writing history file {history_file_path}: {e}")
-                st.stop()
-
+            first_login, log_raw_event = login_stats.record_login(
+                username,
+                tz_name=user_timezone or "UTC",
+                sample_rate=config.get('login_event_sample_rate', login_stats.DEFAULT_SAMPLE_RATE)
+            )
+            # Mark that the login has been processed for this session
+            st.session_state['login_event_logged'] = True
+
+            if log_raw_event:
+                login_event = history.new_event(
+                    event_type="login",
+                    message=f"{username} logged in.",
+                    affected_item=f"{username}",
+                    username=username
+                )
+                if history.append_event(username, login_event):
+                    print(f"Logged login event for {firstname}.")
+                else:
+                    st.warning(f"Could not write login event to {history.log_path(username)}")
+
+            if first_login:
+                print(f"First login for {firstname}.") # Log for debugging
+                utils.show_first_login(st.session_state.get('role'))
 
         except OSError as e:
             # Errors related to directory creation or initial file access
@@ -185,8 +146,6 @@ with st.spinner("Getting all the goodies together...", show_time=True):
         except Exception as e:
             # Catch other potential errors during file handling
             st.error(f"An unexpected error occurred while processing history: {e}")
-            # Optionally set the logged flag to False or delete it if error occurs?
-            # Depending on desired behavior. For now, just stop.
             st.stop()
     
 
@@ -238,6 +197,31 @@ if birthday == True:
     if st.sidebar.button("Birthday button!"):
         st.balloons()
 
+def show_leaderboard(household_kids, key_prefix, highlight=None):
+    """A household's leaderboard for the chosen window and metric, read from the maintained boards."""
+    if len(household_kids) < 2:
+        return
+    st.subheader("🏆 Leaderboard")
+    board_cols = st.columns(2)
+    metric = board_cols[0].radio("Ranked by", list(leaderboards.METRICS), format_func=leaderboards.METRICS.get, horizontal=True, key=f"{key_prefix}_metric")
+    window = board_cols[1].radio(
+        "Window", list(leaderboards.WINDOWS), format_func=leaderboards.WINDOWS.get, horizontal=True,
+        key=f"{key_prefix}_window", disabled=metric == "streak"
+    )
+    today = daily_stats.local_day(user_timezone or "UTC")
+    medals = ["🥇", "🥈", "🥉"]
+    place = 0
+    previous_score = None
+    for position, (kid, score) in enumerate(leaderboards.top(household_kids, window, metric, today=today)):
+        if score != previous_score:
+            place, previous_score = position, score
+        kid_name = utils.first_name(config.get('credentials', {}).get('usernames', {}).get(kid, {}).get('name', kid)) or kid
+        label = f"**{kid_name}**" if kid == highlight else kid_name
+        st.write(f"{medals[place] if place < len(medals) and score else f'{place + 1}.'} {label} · {score:,}")
+    if highlight:
+        my_rank, my_score = leaderboards.rank(highlight, household_kids, window, metric, today=today)
+        st.caption(f"You're #{my_rank} of {len(household_kids)} with {my_score:,}.")
+
 def home_parental_view():
     st.title(f"Welcome, {firstname}!")
     st.divider()
@@ -277,14 +261,19 @@ def home_parental_view():
             num_cols = min(num_kids, max_cols)
 
             if num_cols > 0:
+                    # Materialized per-child summaries - only rebuilt for kids whose data changed
+                    family_overview = view_models.family_overview(
+                        parent_children_usernames, assignments_data, points_data,
+                        mission_templates, quest_templates, task_templates
+                    )
                     cols = st.columns(num_cols)
                     col_index = 0
                     for child_username in parent_children_usernames:
                         child_info = config.get('credentials',{}).get('usernames',{}).get(child_username,{})
                         child_name = child_info.get('name', child_username)
                         child_birthday = child_info.get('birthday', child_username)
-                        child_points = points_data.get(child_username, 0)
-                        child_points_formatted = f"{child_points:,}"
+                        child_overview = family_overview[child_username]
+                        child_points_formatted = f"{child_overview['points']:,}"
                         child_firstname = utils.first_name(child_name)
 
                         # --- Display Column Content ---
@@ -293,48 +282,41 @@ def home_parental_view():
                             with st.container(border=True, height=450):
                                 st.subheader(child_name)
                                 st.write(f"Birthday: {child_birthday}")
+                                child_logins = login_stats.get_login_stats(child_username)
+                                if child_logins:
+                                    last_seen = datetime.fromisoformat(child_logins['last_seen']).astimezone(history.get_zone(user_timezone or "UTC"))
+                                    st.caption(f"👀 Last seen {last_seen:%b %d, %I:%M %p} · {child_logins['total']:,} logins")
                                 st.metric(label=f"👤 {child_firstname}'s points", value=f"{child_points_formatted} pts")
+                                st.caption(f"▶️ {child_overview['active']} active · ⏳ {child_overview['awaiting']} awaiting approval · "
+                                           f"📬 {child_overview['pending']} not accepted yet · ✅ {child_overview['completed']} completed")
+                                if child_overview['overdue']:
+                                    st.warning(f"⏰ {child_overview['overdue']} overdue")
+                                if child_overview['top_pending']:
+                                    st.markdown("**Needs attention:**")
+                                    for item in child_overview['top_pending']:
+                                        st.write(f"- {item['emoji']} {item['name']} *({item['status']})*")
                             
-                                # --- Expander for Child's Activities ---
-                                with st.expander(f"View {child_firstname}'s Activities", expanded=False):
-                                    child_assignments = assignments_data.get(child_username, {})
-
-                                    if not child_assignments:
+                                # --- Child's Activities (only built once a parent opens them) ---
+                                # An expander runs its body even while collapsed, so a toggle is used instead.
+                                show_activities = st.toggle(f"View {child_firstname}'s Activities", key=f"home_activities_{child_username}")
+                                if show_activities:
+                                    if child_overview['total'] == 0:
                                         st.caption("No activities currently assigned.")
                                     else:
-                                        # Prepare lists to categorize
-                                        missions_list = []
-                                        quests_list = []
-                                        tasks_list = []
-
-                                        # Categorize assignments
-                                        for assign_id, assign_data in child_assignments.items():
-                                            item_type = assign_data.get("type")
-                                            template_id = assign_data.get("template_id")
-                                            status = assign_data.get("status", "Unknown")
-                                            info = {"id": template_id, "status": status.replace('_',' ').capitalize()} # Basic info
-
-                                            if item_type == "mission" and template_id:
-                                                template = mission_templates.get(template_id, {})
-                                                info["name"] = template.get("name", template_id)
-                                                info["emoji"] = template.get("emoji", "🗺️")
-                                                missions_list.append(info)
-                                            elif item_type == "quest" and template_id:
-                                                template = quest_templates.get(template_id, {})
-                                                info["name"] = template.get("name", template_id)
-                                                info["emoji"] = template.get("emoji", "⚔️")
-                                                quests_list.append(info)
-                                            elif item_type == "task" or item_type == "standalone" and template_id:
-                                                template = task_templates.get(template_id, {})
-                                                info["name"] = template.get("description", template_id) # Use description for task name
-                                                info["emoji"] = template.get("emoji", "📝")
-                                                tasks_list.append(info)
+                                        activity_lists = view_models.child_activity_lists(
+                                            child_username, assignments_data,
+                                            mission_templates, quest_templates, task_templates
+                                        )
+                                        missions_list = activity_lists["missions"]
+                                        quests_list = activity_lists["quests"]
+                                        tasks_list = activity_lists["tasks"]
+
                                         # Display categorized lists
                                         if missions_list:
                                             st.write("---")
                                             st.markdown("**Missions:**")
                                             for item in missions_list:
-                                                st.echo(f"{st.badge(item['status'])}")
+                                                st.badge(item['status'])
                                                 st.write(f"- {item['emoji']} {item['name']}")
                                                     
                                             
@@ -352,10 +334,13 @@ def home_parental_view():
 
                                         if not missions_list and not quests_list and not tasks_list:
                                             st.caption("Could not categorize assigned activities.") # Fallback
-                                # --- !!! END EXPANDER !!! ---
+                                # --- END ACTIVITIES ---
 
                         col_index += 1
 
+            st.divider()
+            show_leaderboard(parent_children_usernames, key_prefix="home_parent_leaderboard")
+
 def home_kid_view():
     st.title(f"Welcome, {firstname}!")
     st.divider()
@@ -367,23 +352,11 @@ def home_kid_view():
 
     # Check if assignments data is loaded and username exists
     if assignments_data and username:
-        user_assignments = assignments_data.get(username, {}) # Get assignments for this user
-        for assign_id, assign_data in user_assignments.items():
-            status = assign_data.get('status')
-            item_type = assign_data.get('type')
-
-            # Count only items marked as completed
-            if status == 'completed':
-                if item_type == 'mission':
-                    completed_missions += 1
-                elif item_type == 'quest':
-                    # This counts completed *standalone* Quest assignments
-                    completed_quests += 1
-                elif item_type == 'task':
-                    # This counts completed *standalone* Task assignments
-                    completed_tasks += 1
-                elif item_type == 'standalone':
-                    completed_tasks += 1
+        # Counts come from the shared (cached) board, so the admin's second view is free
+        board = view_models.user_board(username, assignments_data, mission_templates, quest_templates, task_templates)
+        completed_missions = board["completed_counts"]["missions"]
+        completed_quests = board["completed_counts"]["quests"] # Standalone Quest assignments
+        completed_tasks = board["completed_counts"]["tasks"] # Standalone Task assignments
 
     # Display the stats using columns and metrics
     col1, col2, col3 = st.columns(3)
@@ -395,6 +368,11 @@ def home_kid_view():
     with col3:
         st.metric(label="Standalone Tasks Completed 📝", value=completed_tasks)
 
+    # One board per parent's family the kid is in (usually just one)
+    for i, household in enumerate(leaderboards.households_for(username)):
+        st.divider()
+        show_leaderboard(household, key_prefix=f"home_kid_leaderboard_{i}", highlight=username)
+
 
 
 
@@ -0,0 +1,111 @@
+# daily_stats.py
+#
+# Per-user daily aggregates: points earned, tasks/quests/missions completed and points by
+# source. Rows are bumped as points are awarded (see utils.award_points), so a year of
+# charts is ~365 small rows per user instead of a scan of the whole history.
+#
+# Days are calendar days in the user's own timezone. Stored in daily_stats.json as
+# {username: {"YYYY-MM-DD": {"points", "tasks", "quests", "missions", "by_source": {...}}}}.
+
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+import pandas as pd
+import history
+import json_store
+
+DAILY_STATS_FILE = Path("daily_stats.json")
+COUNT_FIELDS = ('points', 'tasks', 'quests', 'missions')
+POINT_SOURCES = ('task', 'standalone', 'quest_bonus', 'mission_reward')
+
+_stats_lock = threading.Lock()
+_stats_cache = json_store.new_cache()
+_record_listeners = [] # Called with (username, day, {field: amount}) after a row is saved
+
+def on_record(listener):
+    """Registers a callable run after every saved record() (see leaderboards.py). It must not call record()."""
+    _record_listeners.append(listener)
+
+def locked():
+    """
+    The stats lock. Holding it keeps record() (and so its listeners) out, for reading rows()
+    consistently with what listeners will be told next.
+    """
+    return _stats_lock
+
+def rows():
+    """Every user's rows, {username: {"YYYY-MM-DD": row}}. Read-only; hold locked() while using it."""
+    return _load()
+
+def _load():
+    """Returns the whole stats store, re-reading the file only if it changed on disk."""
+    return json_store.load_cached(DAILY_STATS_FILE, _stats_cache)
+
+def _save(data):
+    json_store.save_cached(DAILY_STATS_FILE, data, _stats_cache, sort_keys=True)
+
+def local_day(tz_name="UTC", when=None):
+    """The 'YYYY-MM-DD' calendar day of `when` (default now) in tz_name."""
+    when = when or datetime.now(timezone.utc)
+    return when.astimezone(history.get_zone(tz_name)).strftime('%Y-%m-%d')
+
+def record(username, points=0, source=None, tasks=0, quests=0, missions=0, tz_name="UTC", when=None):
+    """
+    Adds to a user's row for today (in tz_name). Points are also totalled per source.
+    Returns True if the store was saved.
+    """
+    if not username:
+        return False
+    day = local_day(tz_name, when)
+    with _stats_lock:
+        data = _load()
+        row = data.setdefault(username, {}).setdefault(
+            day, {**{field: 0 for field in COUNT_FIELDS}, "by_source": {}}
+        )
+        for field, amount in zip(COUNT_FIELDS, (points, tasks, quests, missions)):
+            row[field] = row.get(field, 0) + amount
+        if source and points:
+            row["by_source"][source] = row["by_source"].get(source, 0) + points
+        try:
+            _save(data)
+        except OSError as e:
+            print(f"Error: Could not save daily stats for {username}: {e}")
+            return False
+        # Listeners run under the lock so they see every saved row exactly once
+        amounts = dict(zip(COUNT_FIELDS, (points, tasks, quests, missions)))
+        for listener in _record_listeners:
+            try:
+                listener(username, day, amounts)
+            except Exception as e: # A listener must never break point awards
+                print(f"Warning: Daily stats listener {listener.__name__} failed for {username}: {e}")
+        return True
+
+def daily_frame(username, start_day=None):
+    """
+    Returns a user's daily rows as a DataFrame indexed by day (oldest first), with one column
+    per count field and one 'points_<source>' column per point source. Only the user's own
+    rows are read.
+    """
+    with _stats_lock:
+        rows = dict(_load().get(username, {}))
+    if start_day is not None:
+        rows = {day: row for day, row in rows.items() if day >= start_day}
+    columns = list(COUNT_FIELDS) + [f"points_{source}" for source in POINT_SOURCES]
+    records = [
+        [row.get(field, 0) for field in COUNT_FIELDS]
+        + [row.get("by_source", {}).get(source, 0) for source in POINT_SOURCES]
+        for row in rows.values()
+    ]
+    frame = pd.DataFrame(records, index=pd.to_datetime(list(rows)), columns=columns)
+    return frame.sort_index()
+
+def points_series(username, period="Day", start_day=None):
+    """Points earned per source for each day ('Day') or week starting Monday ('Week'), gaps filled with 0."""
+    frame = daily_frame(username, start_day)
+    source_columns = [f"points_{source}" for source in POINT_SOURCES]
+    if frame.empty:
+        return frame[source_columns]
+    frame = frame[source_columns].asfreq('D', fill_value=0)
+    if period == "Week":
+        frame = frame.resample('W-MON', label='left', closed='left').sum()
+    return frame
@@ -0,0 +1,229 @@
+# deadlines.py
+#
+# Time-driven assignment changes, kept in one in-memory min-heap of
+# (epoch, kind, kid, assignment id):
+#   - "overdue": assignments may carry an optional "due_on" (ISO timestamp); once it has
+#     passed, open assignments are flagged "overdue".
+#   - "expire": assignments still pending acceptance when their family's acceptance window
+#     runs out (acceptance_window_days in config.yaml, per parent with a site-wide
+#     default) move to the "expired" status, so they stop piling up on the boards.
+# The heap is filled by one scan when the server starts (or when the acceptance windows in
+# config.yaml change) and then only from the users whose assignments were just saved (see
+# utils.save_assignments). Entries that no longer match the saved assignment are dropped
+# lazily when they reach the top.
+#
+# sweep() pops everything that has come due and applies it in one batched save, then logs
+# one history append per parent for overdue items and one summary event per child for
+# expired ones. If assignments cannot be read or saved, the popped entries go back on the
+# heap and are retried RETRY_SECONDS later. The scheduler thread runs it and sleeps until the next deadline, so each
+# deadline costs O(log n) instead of a scan of every child's assignments on page load.
+
+import heapq
+import os
+import threading
+from datetime import datetime, timezone
+import yaml
+import history
+import utils
+
+ASSIGNMENTS_FILE = 'assignments.json'
+CONFIG_FILE = 'config.yaml'
+CLOSED_STATUSES = ('completed', 'expired', 'declined')
+DEFAULT_ACCEPTANCE_WINDOW_DAYS = 7 # 0 turns expiry off
+DAY_SECONDS = 86400
+RETRY_SECONDS = 60
+
+_deadline_heap = [] # (epoch, kind, kid, assign_id)
+_scheduled = {} # (kind, kid, assign_id) -> epoch of its live heap entry
+_deadlines_lock = threading.RLock()
+_loaded_windows = None # config.yaml mtime the heap was built with, None until the first scan
+_windows_cache = {"mtime": None, "windows": ({}, DEFAULT_ACCEPTANCE_WINDOW_DAYS)}
+
+# --- Acceptance Windows ---
+def _load_windows():
+    """Returns ({parent: days}, default days) from config.yaml, re-read only if it changed."""
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        _windows_cache["mtime"] = 0 # No config.yaml: the defaults apply
+        return _windows_cache["windows"]
+    if _windows_cache["mtime"] != mtime:
+        try:
+            with open(CONFIG_FILE, encoding='utf-8') as f:
+                config = yaml.safe_load(f) or {}
+        except (OSError, yaml.YAMLError) as e:
+            print(f"Warning: Could not read acceptance windows from {CONFIG_FILE}: {e}")
+            return _windows_cache["windows"]
+        users = config.get('credentials', {}).get('usernames', {}) or {}
+        per_parent = {
+            user: data['acceptance_window_days'] for user, data in users.items()
+            if isinstance(data, dict) and data.get('acceptance_window_days') is not None
+        }
+        default = config.get('acceptance_window_days', DEFAULT_ACCEPTANCE_WINDOW_DAYS)
+        _windows_cache.update(mtime=mtime, windows=(per_parent, default))
+    return _windows_cache["windows"]
+
+def acceptance_window_days(parent_username):
+    """Days a parent's assignments may wait for acceptance before expiring (0 = never)."""
+    per_parent, default = _load_windows()
+    return per_parent.get(parent_username, default)
+
+# --- Deadline Index ---
+def is_open(assign_data):
+    return assign_data.get('status') not in CLOSED_STATUSES and not assign_data.get('overdue')
+
+def due_epoch(assign_data):
+    return history.to_epoch(assign_data.get('due_on'))
+
+def assigned_epoch(assign_data):
+    """
+    assigned_on in epoch seconds. New assignments are stamped in UTC; older ones were stamped
+    without a timezone in the server's local time, so those are read as server-local.
+    """
+    try:
+        assigned = datetime.fromisoformat(str(assign_data.get('assigned_on')))
+    except ValueError:
+        return None
+    return assigned.timestamp() # A naive datetime's timestamp() assumes local time
+
+def expiry_epoch(assign_data):
+    """When a pending assignment expires, or None if it is not pending or never expires."""
+    if assign_data.get('status') != 'pending_acceptance':
+        return None
+    window_days = acceptance_window_days(assign_data.get('assigned_by'))
+    assigned = assigned_epoch(assign_data)
+    if not window_days or assigned is None:
+        return None
+    return assigned + float(window_days) * DAY_SECONDS
+
+def _schedule(kind, username, assign_id, epoch):
+    key = (kind, username, assign_id)
+    if epoch is None:
+        _scheduled.pop(key, None) # Any heap entry left behind is skipped when popped
+    elif _scheduled.get(key) != epoch:
+        _scheduled[key] = epoch
+        heapq.heappush(_deadline_heap, (epoch, kind, username, assign_id))
+
+def track(username, user_assignments):
+    """Schedules any new or changed deadlines in one user's assignments."""
+    with _deadlines_lock:
+        for assign_id, assign_data in user_assignments.items():
+            _schedule("overdue", username, assign_id, due_epoch(assign_data) if is_open(assign_data) else None)
+            _schedule("expire", username, assign_id, expiry_epoch(assign_data))
+
+def track_saved(assignments_data, changed_users):
+    """Called after assignments are saved, with only the users whose data changed."""
+    if _loaded_windows is None:
+        return # The first load scans everything anyway
+    for username in changed_users:
+        track(username, assignments_data.get(username, {}))
+
+def _ensure_loaded():
+    """Builds the heap on first use, and again if the acceptance windows were edited."""
+    global _loaded_windows
+    with _deadlines_lock:
+        _load_windows()
+        if _loaded_windows is not None and _loaded_windows == _windows_cache["mtime"]:
+            return
+        assignments = utils.read_assignments(ASSIGNMENTS_FILE) or {}
+        _deadline_heap.clear()
+        _scheduled.clear()
+        for username, user_assignments in assignments.items():
+            if isinstance(user_assignments, dict):
+                track(username, user_assignments)
+        _loaded_windows = _windows_cache["mtime"]
+
+def _is_live(entry):
+    epoch, kind, username, assign_id = entry
+    return _scheduled.get((kind, username, assign_id)) == epoch
+
+def seconds_until_next(now=None):
+    """Seconds until the earliest scheduled deadline (None if there is none)."""
+    _ensure_loaded()
+    now = (now or datetime.now(timezone.utc)).timestamp()
+    with _deadlines_lock:
+        while _deadline_heap and not _is_live(_deadline_heap[0]):
+            heapq.heappop(_deadline_heap) # Stale entry
+        return max(0.0, _deadline_heap[0][0] - now) if _deadline_heap else None
+
+# --- Sweep ---
+def _requeue(entries, epoch):
+    """Puts popped entries back on the heap, due at epoch."""
+    for _, kind, username, assign_id in entries:
+        _schedule(kind, username, assign_id, epoch)
+
+def _describe(assign_data):
+    return f"{assign_data.get('type', 'activity')} '{assign_data.get('template_id')}'"
+
+def sweep(now=None):
+    """
+    Flags open assignments whose due date has passed as overdue and expires assignments left
+    pending past their acceptance window, in one assignments save. Assigning parents get one
+    history append each for overdue items; each child gets one summary event for expired ones.
+    Returns the number of assignments changed.
+    """
+    _ensure_loaded()
+    now = now or datetime.now(timezone.utc)
+    now_epoch = now.timestamp()
+    # Page writers hold the assignments lock and then (through track_saved) this module's, so take them in that order
+    with utils.assignments_lock, _deadlines_lock:
+        due_entries = []
+        while _deadline_heap and _deadline_heap[0][0] <= now_epoch:
+            entry = heapq.heappop(_deadline_heap)
+            if _is_live(entry):
+                del _scheduled[entry[1:]]
+                due_entries.append(entry)
+        if not due_entries:
+            return 0
+
+        assignments = utils.read_assignments(ASSIGNMENTS_FILE)
+        if assignments is None:
+            print("Warning: Deadline sweep could not load assignments; will retry.")
+            _requeue(due_entries, now_epoch + RETRY_SECONDS)
+            return 0
+
+        overdue_by_parent = {}
+        expired_by_kid = {}
+        for _, kind, username, assign_id in due_entries:
+            assign_data = assignments.get(username, {}).get(assign_id)
+            if not assign_data:
+                continue
+            if kind == "expire":
+                if (expiry_epoch(assign_data) or float('inf')) > now_epoch:
+                    continue # Accepted or reassigned since it was queued
+                assign_data['status'] = 'expired'
+                assign_data['expired_on'] = now.isoformat()
+                expired_by_kid.setdefault(username, []).append(assign_data)
+            else:
+                if not is_open(assign_data) or (due_epoch(assign_data) or float('inf')) > now_epoch:
+                    continue # Finished or rescheduled since it was queued
+                assign_data['overdue'] = True
+                assign_data['overdue_since'] = now.isoformat()
+                overdue_by_parent.setdefault(assign_data.get('assigned_by'), []).append(history.new_event(
+                    "assignment_overdue",
+                    f"{_describe(assign_data).capitalize()} for {username} is overdue (was due {assign_data.get('due_on')})",
+                    assign_id, assign_data.get('assigned_by')
+                ))
+
+        overdue = sum(len(events) for events in overdue_by_parent.values())
+        expired = sum(len(items) for items in expired_by_kid.values())
+        if not overdue and not expired:
+            return 0
+        try:
+            utils.write_assignments(assignments, ASSIGNMENTS_FILE)
+        except (OSError, TypeError) as e:
+            print(f"Error: Deadline sweep could not save assignments; will retry: {e}")
+            _requeue(due_entries, now_epoch + RETRY_SECONDS)
+            return 0
+        for parent, events in overdue_by_parent.items():
+            if parent:
+                history.append_events(parent, events)
+        for kid, items in expired_by_kid.items():
+            history.append_event(kid, history.new_event(
+                "assignments_expired",
+                f"{len(items)} activit{'y' if len(items) == 1 else 'ies'} expired without being accepted: "
+                + ", ".join(_describe(assign_data) for assign_data in items),
+                kid, kid
+            ))
+        print(f"Deadline sweep flagged {overdue} overdue and expired {expired} assignment(s).")
+        return overdue + expired
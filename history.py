@@ -0,0 +1,774 @@
+# history.py
+#
+# Per-user event history. Each user's log is stored as JSON Lines (one event per line)
+# in user_history/<username>_history.jsonl, so logging an event is a single append
+# instead of reading, parsing and rewriting the whole file.
+#
+# Every log has a small binary sidecar index (<username>_history.idx) with one
+# fixed-size record per event: the byte offset of its line and its UTC timestamp.
+# Queries use it to jump straight to the newest events, page backwards with a cursor
+# and binary-search time ranges, so a page costs the same no matter how long the
+# history gets.
+#
+# The log above is the "hot" segment. When it reaches a new calendar month (UTC) or
+# SEGMENT_MAX_BYTES, it is closed: compressed into user_history/archive/ together with
+# a copy of its index, and listed in <username>_segments.json with its time range and
+# event count. Event positions count across all segments (archived first, then hot),
+# so cursors stay valid across a rotation, and recent pages only touch the hot log.
+#
+# Older installs wrote a single JSON array per user (<username>_history.json). Those
+# files are converted the first time the log is touched and kept as *.json.migrated.
+
+import atexit
+import bisect
+import concurrent.futures
+import functools
+import gzip
+import heapq
+import io
+import itertools
+import json
+import lzma
+import multiprocessing
+import os
+import struct
+import threading
+from array import array
+from datetime import datetime, date, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import pandas as pd
+
+HISTORY_FOLDER = Path("user_history")
+ARCHIVE_FOLDER = HISTORY_FOLDER / "archive"
+LOG_SUFFIX = "_history.jsonl"
+INDEX_SUFFIX = "_history.idx"
+LEGACY_SUFFIX = "_history.json"
+SEGMENTS_SUFFIX = "_segments.json"
+SEGMENT_MAX_BYTES = 1024 * 1024 # Hot logs are rotated at this size even mid-month
+SEGMENT_COMPRESSION = ".gz" # ".gz" (faster) or ".xz" (smaller)
+COMPRESSORS = {".gz": gzip, ".xz": lzma}
+INDEX_RECORD = struct.Struct('<Qd') # line byte offset, UTC epoch seconds
+DEFAULT_PAGE_SIZE = 50
+MAX_LOAD_WORKERS = 8 # Threads (or processes, for frames not cached yet) used to load several users' history at once
+LARGE_LEGACY_BYTES = 4 * 1024 * 1024 # Legacy files above this are decoded in a separate process
+
+# Event types written by the app, used for the history filters
+EVENT_TYPES = [
+    "login",
+    "task_created", "quest_created", "mision_created",
+    "standalone_assigned", "task_assigned", "quest_assigned", "mission_assigned",
+    "standalone_accepted", "standalone_declined", "standalone_submitted",
+    "standalone_approved", "standalone_rejected",
+    "quest_accepted", "quest_declined", "quest_submitted",
+    "task_completed", "task_rejected", "points_awarded",
+    "assignment_overdue", "assignments_expired",
+    "reward_created", "reward_requested", "reward_approved", "reward_rejected",
+    "templates_edited",
+]
+
+FRAME_COLUMNS = ['timestamp', 'event_type', 'message', 'affected_item', 'user']
+FRAME_TIME_FORMAT = '%d/%m/%y %H:%M:%S'
+
+_history_lock = threading.RLock()
+_index_cache = {} # username -> {"log_size", "index_size", "offsets", "epochs"}
+_frame_cache = {} # (username, timezone name) -> {"segments", "archive_rows", "size", "mtime", "read_offset", "frame"}
+_segments_cache = {} # username -> (manifest mtime, segment list)
+_rotation_listeners = [] # Called with (username, segment) after a segment is closed
+_append_listeners = [] # Called with (username, first position, events) after events are appended
+_load_pool = None # Worker processes for load_history_frames, started on first use
+
+# --- Paths ---
+def log_path(username):
+    return HISTORY_FOLDER / f"{username}{LOG_SUFFIX}"
+
+def index_path(username):
+    return HISTORY_FOLDER / f"{username}{INDEX_SUFFIX}"
+
+def legacy_path(username):
+    return HISTORY_FOLDER / f"{username}{LEGACY_SUFFIX}"
+
+def segments_path(username):
+    return HISTORY_FOLDER / f"{username}{SEGMENTS_SUFFIX}"
+
+# --- Timestamps ---
+def to_epoch(value, fallback=None):
+    """
+    Converts an ISO timestamp string, datetime, date or number to UTC epoch seconds.
+    Naive datetimes are treated as UTC, dates as midnight UTC. Returns fallback if unparseable.
+    """
+    if value is None:
+        return fallback
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        if isinstance(value, datetime):
+            parsed = value
+        elif isinstance(value, date):
+            parsed = datetime(value.year, value.month, value.day)
+        else:
+            parsed = datetime.fromisoformat(str(value))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    except (TypeError, ValueError):
+        return fallback
+
+def new_event(event_type, message, affected_item, username):
+    """Builds an event dict in the format every history file uses."""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "event_type": event_type,
+        "user": username,
+        "affected_item": affected_item,
+        "message": message,
+    }
+
+# --- Index Maintenance ---
+def _scan_log(path):
+    """Reads a log once and returns (offsets, epochs) for every line."""
+    offsets = array('Q')
+    epochs = array('d')
+    last_epoch = 0.0
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping unreadable line at byte {offset} in {path}")
+                    event = None
+                if isinstance(event, dict):
+                    last_epoch = to_epoch(event.get('timestamp'), last_epoch)
+                    offsets.append(offset)
+                    epochs.append(last_epoch)
+            offset += len(line)
+    return offsets, epochs
+
+def rebuild_index(username):
+    """Rebuilds a user's sidecar index from their log. Only needed after a crash or manual edit."""
+    with _history_lock:
+        path = log_path(username)
+        offsets, epochs = _scan_log(path) if path.is_file() else (array('Q'), array('d'))
+        with open(index_path(username), 'wb') as f:
+            f.write(b''.join(INDEX_RECORD.pack(o, e) for o, e in zip(offsets, epochs)))
+        _index_cache.pop(username, None)
+        print(f"Rebuilt history index for {username} ({len(offsets)} events).")
+
+def _index_is_consistent(path, log_size, offsets):
+    """True if the last indexed line ends exactly where the log ends."""
+    if not offsets:
+        return log_size == 0
+    with open(path, 'rb') as f:
+        f.seek(offsets[-1])
+        last_line = f.readline()
+    return offsets[-1] + len(last_line) == log_size
+
+def load_index(username):
+    """
+    Returns {"offsets": array, "epochs": array} for a user's log, reading only the part of
+    the index appended since the last call. The index is rebuilt if it no longer matches the log.
+    """
+    with _history_lock:
+        ensure_log(username)
+        path = log_path(username)
+        idx_path = index_path(username)
+        log_size = path.stat().st_size if path.is_file() else 0
+        if log_size and not idx_path.is_file():
+            rebuild_index(username)
+        index_size = idx_path.stat().st_size if idx_path.is_file() else 0
+
+        cached = _index_cache.get(username)
+        if cached and cached["log_size"] == log_size and cached["index_size"] == index_size:
+            return cached
+
+        if cached and cached["index_size"] <= index_size:
+            offsets, epochs, start = cached["offsets"], cached["epochs"], cached["index_size"]
+        else:
+            offsets, epochs, start = array('Q'), array('d'), 0
+        if index_size > start:
+            with open(idx_path, 'rb') as f:
+                f.seek(start)
+                tail = f.read(index_size - start)
+            for offset, epoch in INDEX_RECORD.iter_unpack(tail[:len(tail) - len(tail) % INDEX_RECORD.size]):
+                offsets.append(offset)
+                epochs.append(epoch)
+
+        if index_size % INDEX_RECORD.size or not _index_is_consistent(path, log_size, offsets):
+            rebuild_index(username)
+            return load_index(username)
+
+        cached = {"log_size": log_size, "index_size": index_size, "offsets": offsets, "epochs": epochs}
+        _index_cache[username] = cached
+        return cached
+
+# --- Writing ---
+def _write_lines(username, events, mode):
+    """Writes events as lines to the log and their records to the index (both appended or both replaced)."""
+    path = log_path(username)
+    HISTORY_FOLDER.mkdir(parents=True, exist_ok=True)
+    records = []
+    with open(path, mode) as f:
+        offset = f.seek(0, os.SEEK_END)
+        cached = _index_cache.get(username) if mode == 'ab' else None
+        last_epoch = cached["epochs"][-1] if cached and cached["epochs"] else 0.0
+        for event in events:
+            line = (json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8')
+            last_epoch = to_epoch(event.get('timestamp'), last_epoch)
+            records.append(INDEX_RECORD.pack(offset, last_epoch))
+            f.write(line)
+            offset += len(line)
+    with open(index_path(username), mode) as f:
+        f.write(b''.join(records))
+
+def _decode_legacy_file(path):
+    """
+    Reads a legacy JSON-array history file and returns its events, or None if it is unreadable.
+    Kept at module level so it can run in a worker process.
+    """
+    try:
+        content = Path(path).read_text(encoding='utf-8')
+        events = json.loads(content) if content.strip() else []
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not convert legacy history file {path}: {e}")
+        return None
+    if not isinstance(events, list):
+        print(f"Warning: Legacy history file {path} was not a list. Starting a new log.")
+        return []
+    return [event for event in events if isinstance(event, dict)]
+
+def ensure_log(username, decoded_events=None):
+    """
+    Converts a legacy JSON-array history file to the line format, if one is still around.
+    decoded_events can pass in the file's events when they were already decoded elsewhere.
+    """
+    with _history_lock:
+        legacy = legacy_path(username)
+        if log_path(username).exists() or not legacy.is_file():
+            return
+        events = decoded_events if decoded_events is not None else _decode_legacy_file(legacy)
+        if events is None:
+            return
+        _write_lines(username, events, 'wb')
+        legacy.rename(legacy.with_suffix('.json.migrated'))
+        _index_cache.pop(username, None)
+        print(f"Converted legacy history for {username} ({len(events)} events).")
+
+def create_log(username):
+    """Creates an empty log for a user. Returns False if one already existed."""
+    with _history_lock:
+        ensure_log(username)
+        if log_path(username).exists():
+            return False
+        _write_lines(username, [], 'wb')
+        return True
+
+def append_events(username, events):
+    """Appends events to a user's log in one write. Returns True on success."""
+    if not username or not events:
+        return False
+    closed_segment = None
+    with _history_lock:
+        ensure_log(username)
+        try:
+            index = load_index(username) # Makes sure the index matches before it is extended
+            if _needs_rotation(index, events):
+                closed_segment = _rotate(username)
+            first_position = count_events(username)
+            _write_lines(username, events, 'ab')
+        except OSError as e:
+            print(f"Error: Could not append to history log for {username}: {e}")
+            return False
+    # Listeners run after the lock is released, so they may take their own locks and read history
+    if closed_segment:
+        _notify(_rotation_listeners, username, closed_segment)
+    _notify(_append_listeners, username, first_position, events)
+    return True
+
+def append_event(username, event):
+    return append_events(username, [event])
+
+# --- Segments (rotation and compressed archives) ---
+def month_of(epoch):
+    """The 'YYYYMM' (UTC) month of an epoch, the month a segment is named and partitioned by."""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y%m')
+
+def _write_atomic(path, data):
+    """Writes bytes to a temp file and swaps it in, so readers never see a partial file."""
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def load_segments(username):
+    """
+    Returns the user's closed segments, oldest first. Each is a dict with "file", "index",
+    "count", "first_epoch", "last_epoch", "raw_bytes" and "stored_bytes".
+    """
+    path = segments_path(username)
+    if not path.is_file():
+        return []
+    mtime = path.stat().st_mtime_ns
+    cached = _segments_cache.get(username)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        segments = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read history segment list {path}: {e}")
+        return []
+    _segments_cache[username] = (mtime, segments)
+    return segments
+
+def archived_count(username):
+    return sum(segment["count"] for segment in load_segments(username))
+
+def _needs_rotation(index, events):
+    """True if the hot log is full, or the new events start a month the hot log does not cover."""
+    if not index["epochs"]:
+        return False
+    if index["log_size"] >= SEGMENT_MAX_BYTES:
+        return True
+    first_new = to_epoch(events[0].get('timestamp'), index["epochs"][-1])
+    return month_of(first_new) != month_of(index["epochs"][0])
+
+def rotate_log(username):
+    """
+    Closes the hot log: compresses it into the archive, keeps a copy of its index for seeking,
+    records it in the segment list and starts an empty hot log. Returns False if it was empty.
+    """
+    segment = _rotate(username)
+    if segment is None:
+        return False
+    _notify(_rotation_listeners, username, segment)
+    return True
+
+def _rotate(username):
+    """rotate_log without notifying listeners. Returns the new segment, or None if the log was empty."""
+    with _history_lock:
+        index = load_index(username)
+        if not index["offsets"]:
+            return None
+        segments = list(load_segments(username))
+        name = f"{username}_{month_of(index['epochs'][0])}_{len(segments):04d}"
+        raw = log_path(username).read_bytes()[:index["log_size"]]
+        stored = COMPRESSORS[SEGMENT_COMPRESSION].compress(raw)
+
+        ARCHIVE_FOLDER.mkdir(parents=True, exist_ok=True)
+        segment_file = ARCHIVE_FOLDER / f"{name}.jsonl{SEGMENT_COMPRESSION}"
+        segment_index = ARCHIVE_FOLDER / f"{name}.idx"
+        _write_atomic(segment_file, stored)
+        _write_atomic(segment_index, index_path(username).read_bytes())
+        segments.append({
+            "file": segment_file.name,
+            "index": segment_index.name,
+            "count": len(index["offsets"]),
+            "first_epoch": index["epochs"][0],
+            "last_epoch": index["epochs"][-1],
+            "raw_bytes": len(raw),
+            "stored_bytes": len(stored),
+        })
+        _write_atomic(segments_path(username), json.dumps(segments, indent=2).encode('utf-8'))
+        _write_lines(username, [], 'wb')
+        _index_cache.pop(username, None)
+        print(f"Rotated history for {username} into {segment_file.name} ({len(raw):,} -> {len(stored):,} bytes).")
+    return segments[-1]
+
+def _notify(listeners, username, *args):
+    for listener in listeners:
+        try:
+            listener(username, *args)
+        except Exception as e: # A listener must never break logging
+            print(f"Warning: History listener {listener.__name__} failed for {username}: {e}")
+
+def on_rotate(listener):
+    """
+    Registers listener(username, segment) to run after each rotation, outside the history lock.
+    Registering twice is a no-op.
+    """
+    if listener not in _rotation_listeners:
+        _rotation_listeners.append(listener)
+
+def on_append(listener):
+    """
+    Registers listener(username, first_position, events) to run after each append, outside the
+    history lock. Concurrent appends may be reported out of order.
+    """
+    if listener not in _append_listeners:
+        _append_listeners.append(listener)
+
+@functools.lru_cache(maxsize=32)
+def _segment_index(file_name):
+    """(offsets, epochs) of a closed segment. Segments never change, so this is cached by name."""
+    offsets, epochs = array('Q'), array('d')
+    for offset, epoch in INDEX_RECORD.iter_unpack((ARCHIVE_FOLDER / file_name).read_bytes()):
+        offsets.append(offset)
+        epochs.append(epoch)
+    return offsets, epochs
+
+@functools.lru_cache(maxsize=4)
+def _segment_bytes(file_name):
+    """The decompressed lines of a closed segment. Only the few most recently read are kept."""
+    path = ARCHIVE_FOLDER / file_name
+    return COMPRESSORS[path.suffix].decompress(path.read_bytes())
+
+def read_segment(segment):
+    """
+    (raw lines, epochs) of a closed segment from load_segments(), one epoch per line in the
+    same order. Closed segments never change, so no lock is needed.
+    """
+    return _segment_bytes(segment["file"]), _segment_index(segment["index"])[1]
+
+def read_hot_log(username):
+    """(raw lines, epochs) of the user's hot (not yet rotated) log as it is right now."""
+    with _history_lock:
+        index = load_index(username)
+        with open(log_path(username), 'rb') as f:
+            raw = f.read(index["log_size"])
+        return raw, index["epochs"][:]
+
+def _history_parts(username):
+    """
+    Every segment of a user's history, oldest first, with its first global position ("base"),
+    count and time range. "index" and "open" load an archived segment lazily, when it is read.
+    """
+    parts = []
+    base = 0
+    for segment in load_segments(username):
+        parts.append({
+            "base": base, "count": segment["count"],
+            "first_epoch": segment["first_epoch"], "last_epoch": segment["last_epoch"],
+            "index": functools.partial(_segment_index, segment["index"]),
+            "open": functools.partial(lambda name: io.BytesIO(_segment_bytes(name)), segment["file"]),
+        })
+        base += segment["count"]
+    hot = load_index(username)
+    if hot["offsets"]:
+        parts.append({
+            "base": base, "count": len(hot["offsets"]),
+            "first_epoch": hot["epochs"][0], "last_epoch": hot["epochs"][-1],
+            "index": lambda: (hot["offsets"], hot["epochs"]),
+            "open": lambda: open(log_path(username), 'rb'),
+        })
+    return parts
+
+def _walk_back(username, before=None, start_epoch=None, end_epoch=None):
+    """
+    Yields (position, epoch, event) newest first, below global position `before` and inside
+    the time range. Segments outside the range are skipped without being opened.
+    """
+    for part in reversed(_history_parts(username)):
+        if before is not None and part["base"] >= before:
+            continue
+        if end_epoch is not None and part["first_epoch"] > end_epoch:
+            continue
+        if start_epoch is not None and part["last_epoch"] < start_epoch:
+            return
+        offsets, epochs = part["index"]()
+        upper = part["count"] if before is None else min(part["count"], before - part["base"])
+        lower = 0
+        # Events are appended in time order, so the time range narrows the scan directly
+        if end_epoch is not None:
+            upper = min(upper, bisect.bisect_right(epochs, end_epoch))
+        if start_epoch is not None:
+            lower = bisect.bisect_left(epochs, start_epoch)
+        if upper > lower:
+            with part["open"]() as f:
+                for i in range(upper - 1, lower - 1, -1):
+                    f.seek(offsets[i])
+                    yield part["base"] + i, epochs[i], json.loads(f.readline())
+        if lower > 0:
+            return
+
+# --- Reading ---
+def has_history(username):
+    """True if the user has a log (or a legacy file waiting to be converted)."""
+    return log_path(username).exists() or legacy_path(username).is_file()
+
+def count_events(username):
+    if not has_history(username):
+        return 0
+    return archived_count(username) + len(load_index(username)["offsets"])
+
+def _event_matches(event, event_types, affected_item, user, start_epoch, end_epoch, epoch):
+    if event_types and event.get('event_type') not in event_types:
+        return False
+    if affected_item and str(event.get('affected_item')) != str(affected_item):
+        return False
+    if user and event.get('user') != user:
+        return False
+    if start_epoch is not None and epoch < start_epoch:
+        return False
+    if end_epoch is not None and epoch > end_epoch:
+        return False
+    return True
+
+def read_events_at(username, positions):
+    """Reads the events at the given (global) positions, in the order given."""
+    if not positions:
+        return []
+    parts = _history_parts(username)
+    bases = [part["base"] for part in parts]
+    events = []
+    for position in positions:
+        part = parts[bisect.bisect_right(bases, position) - 1]
+        offsets = part["index"]()[0]
+        with part["open"]() as f:
+            f.seek(offsets[position - part["base"]])
+            events.append(json.loads(f.readline()))
+    return events
+
+def query_history(username, event_types=None, start=None, end=None, affected_item=None, user=None,
+                  cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Returns one page of a user's history, newest first, as (events, next_cursor).
+
+    Args:
+        event_types: Only include these event types (any if empty).
+        start, end: Only include events in this time range (datetime, date, ISO string or epoch).
+        affected_item: Only include events for this assignment/template/user id.
+        user: Only include events performed by this username.
+        cursor: The next_cursor from the previous page, or None for the newest page.
+        limit: Page size.
+
+    next_cursor is None once the scan has reached the oldest event in range.
+    """
+    if not has_history(username):
+        return [], None
+    start_epoch = to_epoch(start)
+    end_epoch = to_epoch(end)
+    event_types = set(event_types or [])
+    before = None if cursor is None else int(cursor)
+
+    events = []
+    next_cursor = None
+    with _history_lock:
+        walker = _walk_back(username, before, start_epoch, end_epoch)
+        try:
+            for position, epoch, event in walker:
+                if _event_matches(event, event_types, affected_item, user, start_epoch, end_epoch, epoch):
+                    events.append(event)
+                if len(events) >= limit:
+                    next_cursor = str(position) if position > 0 else None
+                    break
+        finally:
+            walker.close()
+    return events, next_cursor
+
+# --- Family Feed (k-way merge across users) ---
+def iter_events_newest_first(username, before=None):
+    """
+    Yields (epoch, username, position, event) for a user's history, newest first, starting just
+    below position `before` (or at the newest event). Lines are read one at a time.
+    """
+    for position, epoch, event in _walk_back(username, before):
+        yield epoch, username, position, event
+
+def family_feed(usernames, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    Merges several users' logs into one feed, newest first, as (events, next_cursor).
+
+    Every log is already in time order, so a heap merge of one lazy reader per user only
+    reads the lines it returns. The cursor records, per user, the index position the next
+    page should start below; next_cursor is None once every log has been read to the start.
+    """
+    positions = json.loads(cursor) if cursor else {}
+    usernames = [username for username in dict.fromkeys(usernames) if has_history(username)]
+    streams = [iter_events_newest_first(username, positions.get(username)) for username in usernames]
+    next_positions = {
+        username: positions.get(username, count_events(username)) for username in usernames
+    }
+
+    events = []
+    merged = heapq.merge(*streams, key=lambda item: item[0], reverse=True)
+    try:
+        with _history_lock: # A rotation mid-page would move the lines being read
+            for epoch, username, position, event in itertools.islice(merged, limit):
+                events.append(event)
+                next_positions[username] = position
+    finally:
+        for stream in streams:
+            stream.close()
+
+    if not any(next_positions.values()):
+        return events, None
+    return events, json.dumps(next_positions)
+
+# --- Cached DataFrame (full history tables) ---
+@functools.lru_cache(maxsize=None)
+def get_zone(tz_name):
+    """Returns a cached ZoneInfo for a timezone name, falling back to UTC if it is unknown."""
+    try:
+        return ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        print(f"Warning: Unknown timezone '{tz_name}'. Using UTC.")
+        return ZoneInfo("UTC")
+
+def _events_frame(raw_lines, zone):
+    """
+    Parses raw log lines into a display frame. Timestamps are converted and formatted in
+    one vectorized pass; 'epoch' keeps UTC seconds for filtering and sorting.
+    """
+    events = []
+    for line in raw_lines.splitlines():
+        if line.strip():
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                print("Warning: Skipping unreadable history line.")
+    frame = pd.DataFrame.from_records(events, columns=FRAME_COLUMNS)
+    utc_times = pd.to_datetime(frame['timestamp'], errors='coerce', utc=True)
+    frame['epoch'] = (utc_times - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+    frame['timestamp'] = utc_times.dt.tz_convert(zone).dt.strftime(FRAME_TIME_FORMAT).fillna("N/A")
+    return frame
+
+def _segment_frame(file_name, zone):
+    return _events_frame(_segment_bytes(file_name), zone)
+
+def load_history_frame(username, tz_name="UTC"):
+    """
+    Returns a user's whole history (archived segments and hot log) as a display-ready
+    DataFrame, oldest first, in tz_name.
+
+    The frame is cached per (user, timezone). Archived segments never change, so they are
+    parsed once; the hot log is keyed by its size and mtime. When the hot log has only grown,
+    just the newly appended lines are parsed and concatenated; a rotation folds the newly
+    closed segments in and starts the hot part again. Reading and parsing happen outside the
+    lock so several users can be loaded at once.
+    """
+    zone = get_zone(tz_name)
+    with _history_lock:
+        ensure_log(username)
+        path = log_path(username)
+        if not path.is_file():
+            return _events_frame(b"", zone)
+        segments = load_segments(username)
+        stat = path.stat()
+        cache_key = (username, tz_name)
+        cached = _frame_cache.get(cache_key)
+        if (cached and cached["segments"] == len(segments)
+                and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime_ns):
+            return cached["frame"]
+
+    # Archived part: reuse what is cached and parse only segments closed since then
+    if cached and cached["segments"] <= len(segments):
+        archive_frame = cached["frame"].iloc[:cached["archive_rows"]]
+        new_segments = segments[cached["segments"]:]
+    else:
+        archive_frame = _events_frame(b"", zone)
+        new_segments = segments
+    if new_segments:
+        archive_frame = pd.concat(
+            [archive_frame] + [_segment_frame(segment["file"], zone) for segment in new_segments],
+            ignore_index=True
+        )
+
+    # Hot part: tail the log if it only grew, otherwise read it from the start
+    grew = (
+        cached is not None and cached["segments"] == len(segments)
+        and stat.st_size > cached["read_offset"] and stat.st_size >= cached["size"]
+    )
+    read_offset = cached["read_offset"] if grew else 0
+    with open(path, 'rb') as f:
+        f.seek(read_offset)
+        raw = f.read(stat.st_size - read_offset)
+    # Only whole lines are parsed; a half-written last line is picked up next time
+    complete = raw[:raw.rfind(b"\n") + 1]
+    new_rows = _events_frame(complete, zone)
+    if grew:
+        frame = pd.concat([cached["frame"], new_rows], ignore_index=True)
+        archive_rows = cached["archive_rows"]
+    else:
+        frame = pd.concat([archive_frame, new_rows], ignore_index=True)
+        archive_rows = len(archive_frame)
+
+    with _history_lock:
+        _frame_cache[cache_key] = {
+            "segments": len(segments), "archive_rows": archive_rows,
+            "size": stat.st_size, "mtime": stat.st_mtime_ns,
+            "read_offset": read_offset + len(complete), "frame": frame,
+        }
+    return frame
+
+# --- Parallel Loading (several users at once) ---
+def migrate_legacy_logs(usernames):
+    """
+    Converts any legacy history files for these users. Large files are decoded in a process
+    pool so one huge JSON array does not hold up the others; small ones are left to ensure_log.
+    """
+    large = {}
+    for username in usernames:
+        legacy = legacy_path(username)
+        if not log_path(username).exists() and legacy.is_file() and legacy.stat().st_size > LARGE_LEGACY_BYTES:
+            large[username] = legacy
+    if len(large) < 2:
+        return # A single file gains nothing from a process hop
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(len(large), os.cpu_count() or 1)) as pool:
+            decoded = dict(zip(large, pool.map(_decode_legacy_file, large.values())))
+    except (OSError, concurrent.futures.process.BrokenProcessPool) as e:
+        print(f"Warning: Could not decode legacy history in parallel, converting one at a time: {e}")
+        return
+    for username, events in decoded.items():
+        ensure_log(username, decoded_events=events)
+
+def _frame_entry(username, tz_name):
+    """
+    Builds a user's frame from scratch and returns its cache entry. Runs in a worker process,
+    which does not keep a copy: the entry is only cached by the process that asked for it.
+    """
+    load_history_frame(username, tz_name)
+    return _frame_cache.pop((username, tz_name))
+
+def _process_pool():
+    """
+    The worker processes for load_history_frames. They are spawned rather than forked, so a
+    lock another thread holds at that moment is not copied into them locked, and kept for
+    later loads so the start-up cost is paid once.
+    """
+    global _load_pool
+    with _history_lock:
+        if _load_pool is None:
+            _load_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=min(MAX_LOAD_WORKERS, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(_load_pool.shutdown)
+        return _load_pool
+
+def _build_cold_frames(usernames, tz_name):
+    """Parses the frames of users with nothing cached yet in worker processes and caches them."""
+    global _load_pool
+    try:
+        entries = list(_process_pool().map(_frame_entry, usernames, [tz_name] * len(usernames)))
+    except (OSError, concurrent.futures.process.BrokenProcessPool) as e:
+        print(f"Warning: Could not load history in parallel processes, using threads: {e}")
+        with _history_lock:
+            _load_pool = None
+        return
+    with _history_lock:
+        for username, entry in zip(usernames, entries):
+            _frame_cache.setdefault((username, tz_name), entry)
+
+def load_history_frames(usernames, tz_name="UTC"):
+    """
+    Loads several users' history frames at once and returns {username: frame}, so wall time
+    is roughly that of the largest history rather than the sum. Parsing JSON holds the GIL,
+    so users with nothing cached yet are parsed in worker processes; the rest (cache hits
+    and tails of grown logs) go through a bounded thread pool. Large legacy files are
+    decoded in a process pool first.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
+        return {}
+    migrate_legacy_logs(usernames)
+    with _history_lock:
+        for username in usernames:
+            ensure_log(username) # Converted here, so worker processes only ever read
+        cold = [username for username in usernames if (username, tz_name) not in _frame_cache and log_path(username).is_file()]
+    if len(cold) >= 2 and (os.cpu_count() or 1) > 1:
+        _build_cold_frames(cold, tz_name)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(MAX_LOAD_WORKERS, len(usernames))) as pool:
+        frames = pool.map(lambda username: load_history_frame(username, tz_name), usernames)
+        return dict(zip(usernames, frames))
@@ -0,0 +1,179 @@
+# history_archive.py
+#
+# Columnar copy of the history logs for analytics (completion rates, points per week,
+# response times). Closed history segments never change, so each one is exported once
+# to Parquet under user_history/columnar/owner=<username>/month=<YYYYMM>/. The scheduler
+# thread runs export_all() every tick, so exports never hold up a page or the history
+# lock. Analytics (see query_events and the Manage history tab) then read only the columns
+# and partitions they ask for, straight into Arrow, instead of re-parsing every JSON log
+# through pandas.
+#
+# The "owner" partition is the user whose log the event came from; the "user" column is
+# still whoever performed the event. pyarrow is optional: without it, exports are skipped
+# and queries return an empty DataFrame.
+
+import json
+import os
+from pathlib import Path
+import pandas as pd
+import history
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = pq = None
+
+COLUMNAR_FOLDER = history.HISTORY_FOLDER / "columnar"
+COLUMNAR_COLUMNS = ['epoch', 'timestamp', 'event_type', 'user', 'affected_item', 'message']
+PARTITION_COLUMNS = ['owner', 'month']
+
+if pa is not None:
+    EVENT_SCHEMA = pa.schema([
+        ('epoch', pa.float64()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('event_type', pa.string()),
+        ('user', pa.string()),
+        ('affected_item', pa.string()),
+        ('message', pa.string()),
+    ])
+    PARTITION_SCHEMA = pa.schema([('owner', pa.string()), ('month', pa.string())])
+    PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+    DATASET_SCHEMA = pa.unify_schemas([EVENT_SCHEMA, PARTITION_SCHEMA])
+
+def is_available():
+    return pa is not None
+
+def _partition_folder(username, month):
+    return COLUMNAR_FOLDER / f"owner={username}" / f"month={month}"
+
+def _events_table(raw_lines, epochs):
+    """Builds an Arrow table from raw log lines and their index epochs (same order, one per event)."""
+    columns = {name: [] for name in COLUMNAR_COLUMNS}
+    events = (json.loads(line) for line in raw_lines.splitlines() if line.strip())
+    for epoch, event in zip(epochs, events):
+        affected_item = event.get('affected_item')
+        columns['epoch'].append(epoch)
+        columns['timestamp'].append(int(epoch * 1_000_000))
+        columns['event_type'].append(event.get('event_type'))
+        columns['user'].append(event.get('user'))
+        columns['affected_item'].append(None if affected_item is None else str(affected_item))
+        columns['message'].append(event.get('message'))
+    return pa.Table.from_pydict(columns, schema=EVENT_SCHEMA)
+
+def _segment_target(username, segment):
+    """The Parquet file a closed segment is exported to."""
+    month = history.month_of(segment["first_epoch"]) # Segments never span a month
+    return _partition_folder(username, month) / f"{Path(segment['index']).stem}.parquet"
+
+def export_segment(username, segment):
+    """
+    Writes one closed history segment to its partition. Already exported segments are skipped,
+    so this is safe to call again. Returns True if a file was written.
+    """
+    if pa is None:
+        return False
+    target = _segment_target(username, segment)
+    if target.exists():
+        return False
+    table = _events_table(*history.read_segment(segment))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = target.with_name(f".{target.name}.tmp") # Dot files are ignored by dataset discovery
+    pq.write_table(table, temp_path)
+    os.replace(temp_path, target)
+    return True
+
+def export_user(username):
+    """Exports any of a user's closed segments that are not in the columnar archive yet. Returns how many."""
+    if pa is None:
+        return 0
+    return sum(export_segment(username, segment) for segment in history.load_segments(username))
+
+def export_all():
+    """Exports every user's closed segments that are not in the columnar archive yet (run by the scheduler)."""
+    if pa is None:
+        return 0
+    exported = 0
+    for path in history.HISTORY_FOLDER.glob(f"*{history.SEGMENTS_SUFFIX}"):
+        exported += export_user(path.name[:-len(history.SEGMENTS_SUFFIX)])
+    if exported:
+        print(f"Exported {exported} history segment(s) to the columnar archive.")
+    return exported
+
+def _partitioned_table(username, raw_lines, epochs):
+    """Raw log lines as an Arrow table with the partition columns added."""
+    table = _events_table(raw_lines, epochs)
+    months = [history.month_of(epoch) for epoch in epochs]
+    table = table.append_column('owner', pa.array([username] * len(table), pa.string()))
+    return table.append_column('month', pa.array(months, pa.string()))
+
+def _unexported_tables(username):
+    """
+    Arrow tables of the user's events that are not in the columnar archive yet: closed
+    segments the scheduler has not exported so far, then the hot (not yet rotated) log.
+    They are read in memory; nothing is written from here.
+    """
+    tables = [
+        _partitioned_table(username, *history.read_segment(segment))
+        for segment in history.load_segments(username) if not _segment_target(username, segment).exists()
+    ]
+    raw, epochs = history.read_hot_log(username)
+    if epochs:
+        tables.append(_partitioned_table(username, raw, epochs))
+    return tables
+
+def query_events(usernames=None, months=None, columns=None, event_types=None, include_hot=True, as_table=False):
+    """
+    Reads history events from the columnar archive.
+
+    Args:
+        usernames: Only read these users' partitions (all users if None).
+        months: Only read these 'YYYYMM' partitions (all months if None).
+        columns: Columns to load, from COLUMNAR_COLUMNS plus 'owner' and 'month' (all if None).
+        event_types: Only return these event types.
+        include_hot: Also include events of `usernames` that are not exported yet: the hot
+            logs, plus any closed segment the scheduler has not exported so far.
+        as_table: Return the Arrow table instead of converting it to pandas.
+
+    Unneeded partitions and columns are never read from disk. Exports are left to the
+    scheduler, so a query never writes Parquet files.
+    """
+    if pa is None:
+        print("Warning: pyarrow is not installed; the columnar history archive is unavailable.")
+        return pd.DataFrame(columns=columns or COLUMNAR_COLUMNS + PARTITION_COLUMNS)
+
+    usernames = list(usernames) if usernames is not None else None
+    filters = []
+    if usernames is not None:
+        filters.append(ds.field('owner').isin(usernames))
+    if months is not None:
+        filters.append(ds.field('month').isin([str(month) for month in months]))
+    if event_types:
+        filters.append(ds.field('event_type').isin(list(event_types)))
+    expression = None
+    for condition in filters:
+        expression = condition if expression is None else expression & condition
+
+    tables = []
+    if COLUMNAR_FOLDER.is_dir():
+        # The schema is given so filters on event_type work even before anything is exported
+        dataset = ds.dataset(str(COLUMNAR_FOLDER), format="parquet", partitioning=PARTITIONING, schema=DATASET_SCHEMA)
+        tables.append(dataset.to_table(columns=columns, filter=expression))
+    if include_hot:
+        for username in usernames or []:
+            if not history.has_history(username):
+                continue
+            for pending in _unexported_tables(username):
+                if expression is not None:
+                    pending = pending.filter(expression)
+                tables.append(pending.select(columns) if columns else pending)
+
+    if not tables:
+        empty = DATASET_SCHEMA.empty_table()
+        table = empty.select(columns) if columns else empty
+    else:
+        table = pa.concat_tables(tables)
+    if as_table:
+        return table
+    return table.to_pandas(split_blocks=True, self_destruct=True) # Avoids copying column buffers where it can
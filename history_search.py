@@ -0,0 +1,288 @@
+# history_search.py
+#
+# Token search over history messages, event types and affected items. Each user has an
+# inverted index (token -> sorted event positions) kept in memory and persisted beside
+# their history:
+#   - every closed segment gets archive/<segment>.terms.json.gz, written once at rotation;
+#   - the hot log's postings are journaled to <username>_history.terms as events are
+#     appended (one JSON line per event: [position, tokens]).
+# A search intersects posting lists and reads only the matching lines, so its cost
+# depends on the number of matches rather than the length of the history.
+#
+# A second, family-wide index maps each affected_item (assignment, template or user id)
+# to where its events live: (username, position, epoch, event type), journaled to
+# user_history/affected_items.jsonl. An assignment's timeline and turnaround times come
+# straight from it, without scanning any parent's or child's history.
+#
+# Events logged while this module was not loaded are picked up from the logs the next
+# time an index is opened.
+
+import gzip
+import json
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+import history
+
+TERMS_SUFFIX = "_history.terms"
+ITEMS_JOURNAL = history.HISTORY_FOLDER / "affected_items.jsonl"
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_PREFIX_TERMS = 200 # Cap on vocabulary terms one prefix can expand to
+
+_search_lock = threading.RLock()
+_search_cache = {} # username -> {"postings": {token: [positions]}, "indexed": int, "vocabulary": list|None}
+_items_state = {} # "locations": {item: [(username, position, epoch, event type)]}, "indexed": {username: int}
+
+# Lifecycle stages of an assignment, matched on the event type's suffix
+TIMELINE_STAGES = [
+    ("assigned", ("_assigned",)),
+    ("accepted", ("_accepted",)),
+    ("submitted", ("_submitted",)),
+    ("finished", ("_approved", "_completed", "_declined", "_rejected")),
+]
+
+def terms_path(username):
+    return history.HISTORY_FOLDER / f"{username}{TERMS_SUFFIX}"
+
+def _segment_terms_path(segment):
+    return history.ARCHIVE_FOLDER / f"{segment['index'].rsplit('.', 1)[0]}.terms.json.gz"
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower()) if text is not None else []
+
+def event_tokens(event):
+    """Distinct tokens of an event's message, event type and affected item."""
+    tokens = tokenize(event.get('message')) + tokenize(event.get('affected_item'))
+    event_type = event.get('event_type')
+    if event_type:
+        tokens += [event_type.lower()] + tokenize(event_type.replace('_', ' '))
+    return list(dict.fromkeys(tokens))
+
+# --- Persistence ---
+def _segment_postings(segment, base):
+    """Postings of a closed segment, from its terms file (built from the segment if missing)."""
+    path = _segment_terms_path(segment)
+    if path.is_file():
+        try:
+            return json.loads(gzip.decompress(path.read_bytes()))
+        except (OSError, EOFError, json.JSONDecodeError) as e:
+            print(f"Warning: Rebuilding unreadable search index {path}: {e}")
+    postings = defaultdict(list)
+    raw_lines = history.read_segment(segment)[0].splitlines()
+    events = (json.loads(line) for line in raw_lines if line.strip())
+    for position, event in enumerate(events, start=base):
+        for token in event_tokens(event):
+            postings[token].append(position)
+    path.write_bytes(gzip.compress(json.dumps(postings).encode('utf-8')))
+    return postings
+
+def _journal(username, entries):
+    """Appends (position, tokens) entries for hot-log events to the user's terms journal."""
+    lines = "".join(json.dumps([position, tokens]) + "\n" for position, tokens in entries)
+    with open(terms_path(username), 'a', encoding='utf-8') as f:
+        f.write(lines)
+
+def _add(state, position, tokens):
+    for token in tokens:
+        state["postings"].setdefault(token, []).append(position)
+    state["indexed"] = position + 1
+    state["vocabulary"] = None
+
+# --- Index Maintenance ---
+def load_search_index(username):
+    """Returns the user's in-memory index, loading it from disk and catching up with the log as needed."""
+    with _search_lock:
+        state = _search_cache.get(username)
+        if state is None:
+            state = {"postings": {}, "indexed": 0, "vocabulary": None}
+            base = 0
+            for segment in history.load_segments(username):
+                for token, positions in _segment_postings(segment, base).items():
+                    state["postings"].setdefault(token, []).extend(positions)
+                base += segment["count"]
+            state["indexed"] = base
+            if terms_path(username).is_file():
+                with open(terms_path(username), encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            position, tokens = json.loads(line)
+                        except (ValueError, TypeError):
+                            break # A torn last line; the catch-up below re-reads from the log
+                        if position == state["indexed"]: # Skips archived and repeated entries
+                            _add(state, position, tokens)
+            _search_cache[username] = state
+
+        total = history.count_events(username)
+        if state["indexed"] < total:
+            positions = range(state["indexed"], total)
+            entries = [(position, event_tokens(event)) for position, event in zip(positions, history.read_events_at(username, positions))]
+            for position, tokens in entries:
+                _add(state, position, tokens)
+            _journal(username, entries)
+        return state
+
+def _on_append(username, first_position, events):
+    with _search_lock:
+        state = _search_cache.get(username)
+        entries = [(first_position + i, event_tokens(event)) for i, event in enumerate(events)]
+        if state is not None and state["indexed"] == first_position:
+            for position, tokens in entries:
+                _add(state, position, tokens)
+        _journal(username, entries)
+
+        item_entries = [
+            _item_entry(username, first_position + i, event, history.to_epoch(event.get('timestamp'), 0.0))
+            for i, event in enumerate(events)
+        ]
+        if _items_state and _items_state["indexed"].get(username, 0) == first_position:
+            for entry in item_entries:
+                _add_item(entry)
+        _journal_items(item_entries)
+
+def _on_rotate(username, segment):
+    """Writes the closed segment's terms file and starts a fresh journal for the new hot log."""
+    with _search_lock:
+        segments = history.load_segments(username)
+        closed = next((i for i, listed in enumerate(segments) if listed["file"] == segment["file"]), len(segments) - 1)
+        base = sum(listed["count"] for listed in segments[:closed]) # Another rotation may have run since
+        _segment_postings(segment, base)
+        terms_path(username).write_text("", encoding='utf-8')
+
+# --- Search ---
+def search_history(username, query, limit=history.DEFAULT_PAGE_SIZE):
+    """
+    Returns (events newest first, total matches) for events containing every word in query.
+    The last word also matches as a prefix, so results show up while typing.
+    """
+    tokens = tokenize(query)
+    if not tokens or not history.has_history(username):
+        return [], 0
+    with _search_lock:
+        state = load_search_index(username)
+        postings = state["postings"]
+        matches = None
+        for i, token in enumerate(tokens):
+            token_positions = set(postings.get(token, ()))
+            if i == len(tokens) - 1:
+                if state["vocabulary"] is None:
+                    state["vocabulary"] = sorted(postings)
+                vocabulary = state["vocabulary"]
+                start = bisect_left(vocabulary, token)
+                for term in vocabulary[start:start + MAX_PREFIX_TERMS]:
+                    if not term.startswith(token):
+                        break
+                    token_positions.update(postings[term])
+            matches = token_positions if matches is None else matches & token_positions
+            if not matches:
+                return [], 0
+        newest = sorted(matches, reverse=True)[:limit]
+    return history.read_events_at(username, newest), len(matches)
+
+# --- Affected Item Index (across users) ---
+def _item_entry(username, position, event, epoch):
+    affected_item = event.get('affected_item')
+    item = "" if affected_item is None else str(affected_item)
+    return [item, username, position, epoch, event.get('event_type')]
+
+def _add_item(entry):
+    item, username, position, epoch, event_type = entry
+    if item:
+        _items_state["locations"].setdefault(item, []).append((username, position, epoch, event_type))
+    _items_state["indexed"][username] = position + 1
+
+def _journal_items(entries):
+    """Every event gets a line (even without an affected item) so each user's indexed count is known."""
+    history.HISTORY_FOLDER.mkdir(parents=True, exist_ok=True)
+    with open(ITEMS_JOURNAL, 'a', encoding='utf-8') as f:
+        f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+
+def _history_usernames():
+    folder = history.HISTORY_FOLDER
+    names = {path.name[:-len(history.LOG_SUFFIX)] for path in folder.glob(f"*{history.LOG_SUFFIX}")}
+    names |= {path.name[:-len(history.LEGACY_SUFFIX)] for path in folder.glob(f"*{history.LEGACY_SUFFIX}")}
+    return sorted(names)
+
+def load_item_index():
+    """Returns the family-wide affected_item index, loading the journal and catching up with every log."""
+    with _search_lock:
+        if not _items_state:
+            _items_state.update({"locations": {}, "indexed": {}})
+            if ITEMS_JOURNAL.is_file():
+                with open(ITEMS_JOURNAL, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            break # A torn last line; the catch-up below re-reads from the logs
+                        if entry[2] == _items_state["indexed"].get(entry[1], 0): # Skips repeated entries
+                            _add_item(entry)
+        indexed_counts = dict(_items_state["indexed"])
+
+    # The logs are read without _search_lock, so it is never held while waiting for the history lock
+    missing_by_user = {}
+    for username in _history_usernames():
+        indexed = indexed_counts.get(username, 0)
+        if history.count_events(username) <= indexed:
+            continue
+        missing = []
+        for epoch, _, position, event in history.iter_events_newest_first(username):
+            if position < indexed:
+                break
+            missing.append(_item_entry(username, position, event, epoch))
+        missing.reverse()
+        missing_by_user[username] = missing
+
+    with _search_lock:
+        for username, missing in missing_by_user.items():
+            indexed = _items_state["indexed"].get(username, 0)
+            fresh = [entry for entry in missing if entry[2] >= indexed] # An append listener may have added some since
+            if fresh and fresh[0][2] == indexed:
+                for entry in fresh:
+                    _add_item(entry)
+                _journal_items(fresh)
+        return _items_state
+
+def item_locations(affected_item):
+    """Where an item's events are, oldest first: a list of (username, position, epoch, event type)."""
+    with _search_lock:
+        locations = list(load_item_index()["locations"].get(str(affected_item), []))
+    return sorted(locations, key=lambda location: location[2])
+
+def item_timeline(affected_item):
+    """
+    All events about one item across every user's history, oldest first, as
+    (log owner, event) pairs. Only the item's own lines are read.
+    """
+    locations = item_locations(affected_item)
+    by_user = {}
+    for username, position, _, _ in locations:
+        by_user.setdefault(username, []).append(position)
+    events = {}
+    for username, positions in by_user.items():
+        for position, event in zip(positions, history.read_events_at(username, positions)):
+            events[(username, position)] = event
+    return [(username, events[(username, position)]) for username, position, _, _ in locations]
+
+def turnaround_times(affected_item, assigned_epoch=None):
+    """
+    Seconds between an assignment's lifecycle stages (see TIMELINE_STAGES), from the index
+    alone. assigned_epoch stands in for a missing "assigned" event. Returns
+    ({stage: first epoch}, {(from stage, to stage): seconds}).
+    """
+    stage_epochs = {}
+    for _, _, epoch, event_type in item_locations(affected_item):
+        for stage, suffixes in TIMELINE_STAGES:
+            if stage not in stage_epochs and (event_type or "").endswith(suffixes):
+                stage_epochs[stage] = epoch
+    if assigned_epoch is not None:
+        stage_epochs.setdefault("assigned", assigned_epoch)
+    reached = [stage for stage, _ in TIMELINE_STAGES if stage in stage_epochs]
+    durations = {
+        (earlier, later): stage_epochs[later] - stage_epochs[earlier]
+        for earlier, later in zip(reached, reached[1:])
+    }
+    return stage_epochs, durations
+
+history.on_append(_on_append)
+history.on_rotate(_on_rotate)
@@ -0,0 +1,55 @@
+# json_store.py
+#
+# The small JSON files that every session on this server shares (daily stats, login
+# counters, recurring rules, the rewards catalog and ledger). Writes go to a temp file that
+# is swapped in with os.replace, so a crash leaves either the old file or the new one.
+# Cached reads only re-parse a file when its mtime changes. Callers hold their own lock
+# around a read-modify-write.
+
+import json
+import os
+from pathlib import Path
+
+def new_cache():
+    """An empty cache for load_cached() and save_cached()."""
+    return {"mtime": None, "data": {}}
+
+def read_json(path, default):
+    """The parsed file, or default if it is missing or cannot be read."""
+    path = Path(path)
+    if not path.is_file():
+        return default
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read {path}: {e}")
+        return default
+
+def write_json(path, data, sort_keys=False):
+    """Replaces the file with data in one step. Raises OSError if it cannot be written."""
+    path = Path(path)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=sort_keys)
+    os.replace(temp_path, path)
+
+def load_cached(path, cache):
+    """The parsed file, re-read only if it changed on disk. Keeps the last good copy if it cannot be read."""
+    path = Path(path)
+    if not path.is_file():
+        return cache["data"]
+    mtime = path.stat().st_mtime_ns
+    if cache["mtime"] != mtime:
+        try:
+            cache["data"] = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Could not read {path}: {e}")
+            return cache["data"]
+        cache["mtime"] = mtime
+    return cache["data"]
+
+def save_cached(path, data, cache, sort_keys=False):
+    """write_json(), then makes data the cached copy. Raises OSError if it cannot be written."""
+    write_json(path, data, sort_keys)
+    cache["mtime"] = Path(path).stat().st_mtime_ns
+    cache["data"] = data
@@ -0,0 +1,194 @@
+# leaderboards.py
+#
+# Friendly family leaderboards: points and tasks completed this week, this month and all
+# time, plus the current run of consecutive days with points ("streak").
+#
+# Every household (a parent's children list in config.yaml; admins, who list children
+# from several families, do not make households) has one board per
+# (window, metric): a dict of scores and a list of (-score, kid) kept sorted with bisect.
+# An award moves one entry in each board the kid is on (see daily_stats.on_record), so
+# ranks and top-N reads never add anything up. The boards live in memory: they are built
+# once from the daily_stats rows (about one row per kid per active day, never points.json
+# or history) and rebuilt if the households in config.yaml change. Only the latest
+# KEPT_WINDOWS weeks and months have boards: the current one, plus the previous one for
+# viewers whose timezone is still a day behind. Older ones are dropped as new ones start.
+#
+# Weeks start on Monday and days are each kid's local days, the same as daily_stats.
+
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+import yaml
+import daily_stats
+
+CONFIG_FILE = 'config.yaml'
+WINDOWS = {"week": "This week", "month": "This month", "all": "All time"}
+METRICS = {"points": "Points", "tasks": "Tasks completed", "streak": "Day streak"}
+SUMMED_METRICS = ("points", "tasks")
+KEPT_WINDOWS = 2
+
+_leaderboard_lock = threading.RLock()
+_boards = {} # (household, window key, metric) -> {"scores": {kid: score}, "order": [(-score, kid)]}
+_streaks = {} # kid -> (last day with points, streak length)
+_households_of = {} # kid -> [household], a household being the sorted tuple of its kids
+_window_keys = {"week": [], "month": []} # Keys of the weeks and months that have boards, oldest first
+_built_mtime = [None] # config.yaml mtime the boards were built with
+
+def household_key(kids):
+    return tuple(sorted(kids))
+
+def window_key(window, day):
+    """The board key of the window containing day ('YYYY-MM-DD')."""
+    if window == "all":
+        return "all"
+    if window == "week":
+        day_date = date.fromisoformat(day)
+        return f"week:{day_date - timedelta(days=day_date.weekday())}"
+    return f"month:{day[:7]}"
+
+# --- Maintenance ---
+def _set_score(household, key, metric, kid, score):
+    board = _boards.setdefault((household, key, metric), {"scores": {}, "order": []})
+    old_score = board["scores"].get(kid)
+    if old_score is not None:
+        del board["order"][bisect_left(board["order"], (-old_score, kid))]
+    board["scores"][kid] = score
+    insort(board["order"], (-score, kid))
+
+def _keep_window(window, key):
+    """
+    True if the window key has (or may now get) boards. A newer key drops the boards of the
+    oldest kept one; a key older than every kept one is not tracked any more.
+    """
+    keys = _window_keys[window]
+    if key in keys:
+        return True
+    if len(keys) >= KEPT_WINDOWS and key < keys[0]:
+        return False
+    insort(keys, key)
+    while len(keys) > KEPT_WINDOWS:
+        dropped = keys.pop(0)
+        for board_key in [board_key for board_key in _boards if board_key[1] == dropped]:
+            del _boards[board_key]
+    return True
+
+def _score(household, key, metric, kid):
+    return _boards.get((household, key, metric), {}).get("scores", {}).get(kid, 0)
+
+def _apply(kid, day, amounts):
+    households = _households_of.get(kid, ())
+    for metric in SUMMED_METRICS:
+        if not amounts.get(metric):
+            continue
+        for window in WINDOWS:
+            key = window_key(window, day)
+            if window != "all" and not _keep_window(window, key):
+                continue
+            for household in households:
+                _set_score(household, key, metric, kid, _score(household, key, metric, kid) + amounts[metric])
+
+    if amounts.get("points", 0) > 0:
+        last_day, length = _streaks.get(kid, (None, 0))
+        if last_day is None or day > last_day:
+            follows = last_day is not None and date.fromisoformat(day) - date.fromisoformat(last_day) == timedelta(days=1)
+            _streaks[kid] = (day, length + 1 if follows else 1)
+            for household in households:
+                _set_score(household, "all", "streak", kid, _streaks[kid][1])
+
+def _on_record(username, day, amounts):
+    with _leaderboard_lock:
+        if _built_mtime[0] is not None:
+            _apply(username, day, amounts)
+
+def _load_households():
+    try:
+        with open(CONFIG_FILE, encoding='utf-8') as f:
+            config = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        print(f"Warning: Leaderboards could not read {CONFIG_FILE}: {e}")
+        return None
+    households_of = {}
+    for data in (config.get('credentials', {}).get('usernames', {}) or {}).values():
+        if not isinstance(data, dict) or data.get('role') != 'parent':
+            continue
+        kids = data.get('children') or []
+        household = household_key(kids)
+        for kid in kids:
+            if household not in households_of.setdefault(kid, []):
+                households_of[kid].append(household)
+    return households_of
+
+def _ensure_built():
+    """Builds every board from the daily stats rows, the first time and when households change."""
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        mtime = 0
+    with daily_stats.locked(), _leaderboard_lock: # Same lock order as record() and its listeners
+        if _built_mtime[0] == mtime:
+            return
+        households_of = _load_households()
+        if households_of is None:
+            return
+        _boards.clear()
+        _streaks.clear()
+        _households_of.clear()
+        _households_of.update(households_of)
+        for keys in _window_keys.values():
+            keys.clear()
+        for kid, rows in daily_stats.rows().items():
+            if kid not in _households_of:
+                continue
+            for day in sorted(rows):
+                _apply(kid, day, rows[day])
+        _built_mtime[0] = mtime
+
+# --- Reading ---
+def households_for(kid):
+    """The households (sorted tuples of kids) a kid belongs to."""
+    _ensure_built()
+    with _leaderboard_lock:
+        return list(_households_of.get(kid, []))
+
+def _is_live_streak(kid, today):
+    """A streak counts while its last day is today or yesterday."""
+    last_day = _streaks.get(kid, (None, 0))[0]
+    return last_day is not None and date.fromisoformat(today) - date.fromisoformat(last_day) <= timedelta(days=1)
+
+def top(kids, window, metric, n=None, today=None):
+    """
+    [(kid, score)] for a household, best first; kids who have not scored yet come last with 0.
+    today ('YYYY-MM-DD', default today in UTC) picks the week or month.
+    """
+    _ensure_built()
+    today = today or daily_stats.local_day()
+    household = household_key(kids)
+    key = "all" if metric == "streak" else window_key(window, today)
+    with _leaderboard_lock:
+        order = list(_boards.get((household, key, metric), {}).get("order", []))
+        if metric == "streak":
+            order = [(score, kid) for score, kid in order if _is_live_streak(kid, today)]
+    ranked = [(kid, -score) for score, kid in order]
+    scored = {kid for kid, _ in ranked}
+    ranked += [(kid, 0) for kid in household if kid not in scored]
+    return ranked[:n] if n else ranked
+
+def rank(kid, kids, window, metric, today=None):
+    """
+    (1-based rank, score) of a kid on a household board, found with one bisect on the
+    board's sorted order. Ties share the better rank.
+    """
+    _ensure_built()
+    today = today or daily_stats.local_day()
+    household = household_key(kids)
+    if metric == "streak":
+        ranked = top(kids, window, metric, today=today) # Only live streaks count, so filter first
+        scores = dict(ranked)
+        return 1 + sum(1 for _, score in ranked if score > scores.get(kid, 0)), scores.get(kid, 0)
+    with _leaderboard_lock:
+        board = _boards.get((household, window_key(window, today), metric), {"scores": {}, "order": []})
+        score = board["scores"].get(kid, 0)
+        return bisect_left(board["order"], (-score, "")) + 1, score
+
+daily_stats.on_record(_on_record)
@@ -0,0 +1,58 @@
+# login_stats.py
+#
+# Login activity kept as small per-user counters instead of one history event per session:
+# first seen, last seen, total logins and logins per (local) day, stored in login_stats.json.
+# Raw "login" history events are only written for a sampled share of sessions (see
+# config.yaml's login_event_sample_rate), so they no longer crowd the history tables.
+
+import random
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+import history
+import json_store
+
+LOGIN_STATS_FILE = Path("login_stats.json")
+DEFAULT_SAMPLE_RATE = 0.0 # Share of logins also written to history as raw events
+
+_login_lock = threading.Lock()
+_login_cache = json_store.new_cache()
+
+def _load():
+    """Returns the whole store, re-reading the file only if it changed on disk."""
+    return json_store.load_cached(LOGIN_STATS_FILE, _login_cache)
+
+def _save(data):
+    json_store.save_cached(LOGIN_STATS_FILE, data, _login_cache, sort_keys=True)
+
+def get_login_stats(username):
+    """{"first_seen", "last_seen", "total", "days": {"YYYY-MM-DD": count}} for a user, or None if never seen."""
+    with _login_lock:
+        stats = _load().get(username)
+        return dict(stats) if stats else None
+
+def record_login(username, tz_name="UTC", sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Counts one login. Returns (first_login, log_raw_event): first_login is True only the
+    very first time a user is seen, and log_raw_event says whether this session was sampled
+    for a raw history event.
+
+    Users who already have history from before these counters existed are not treated as new.
+    """
+    now = datetime.now(timezone.utc)
+    day = now.astimezone(history.get_zone(tz_name)).strftime('%Y-%m-%d')
+    with _login_lock:
+        data = _load()
+        stats = data.get(username)
+        first_login = stats is None and not history.has_history(username)
+        if stats is None:
+            stats = {"first_seen": now.isoformat(), "total": 0, "days": {}}
+            data[username] = stats
+        stats["last_seen"] = now.isoformat()
+        stats["total"] += 1
+        stats["days"][day] = stats["days"].get(day, 0) + 1
+        try:
+            _save(data)
+        except OSError as e:
+            print(f"Error: Could not save login stats for {username}: {e}")
+    return first_login, first_login or random.random() < sample_rate
@@ -1,5 +1,6 @@
 import streamlit as st
 import utils # Import shared utility functions
+import view_models
 import time
 
 # --- Page Configuration ---
@@ -43,13 +44,12 @@ else:
 st.title("🗺️ Your Missions")
 st.divider()
 
-kid_assignments = assignments_data.get(username, {})
+# --- Cached views: preview trees per template version, item statuses per assignment version ---
+board = view_models.user_board(username, assignments_data, mission_templates, quest_templates, task_templates)
+item_statuses = view_models.mission_item_statuses(username, assignments_data, mission_templates)
 
 # --- 1. Pending Acceptance Section ---
-pending_missions = {
-    assign_id: data for assign_id, data in kid_assignments.items()
-    if data.get('type') == 'mission' and data.get('status') == 'pending_acceptance'
-}
+pending_missions = view_models.board_group(board, 'mission', 'pending_acceptance')
 
 if not pending_missions:
     pass
@@ -59,17 +59,18 @@ else:
     # Outer loop: Correctly iterates through each PENDING mission assignment
     for assign_id, mission_assignment_data in pending_missions.items():
         mission_template_id = mission_assignment_data.get('template_id')
-        mission_template = mission_templates.get(mission_template_id)
+        preview = view_models.mission_preview(mission_template_id, mission_templates, quest_templates, task_templates)
 
-        if not mission_template:
+        if not preview:
             st.error(f"Details not found for pending mission template (ID: {mission_template_id}). Assignment ID: {assign_id}")
             continue
 
+        mission_template = preview["template"]
         # --- Calculate Total Points for THIS mission ---
         # Start with the base mission completion points
         total_points = mission_template.get('mission_combined_points', '')
-        contained_quests = mission_template.get('contains_quests', [])
-        contained_tasks = mission_template.get('contains_tasks', [])
+        contained_quests = preview["quests"]
+        contained_tasks = preview["tasks"]
 
 
         # --- Display Container for the Mission ---
@@ -92,15 +93,16 @@ else:
                     if not contained_quests:
                         st.caption("No quests in this mission.")
                     else:
-                        for quest_id in contained_quests:
-                            quest_info = quest_templates.get(quest_id)
+                        for quest_preview in contained_quests:
+                            quest_id = quest_preview["id"]
+                            quest_info = quest_preview["template"]
                             if quest_info:
                                 quest_points = quest_info.get('completion_bonus_points', 0)
                                 st.markdown(f"**{quest_info.get('name', 'Unnamed Quest')}** ({quest_points} pts)")
                                 st.caption(f"{quest_info.get('description', '')}")
 
                                 # --- MODIFIED SECTION FOR TASKS WITHIN QUEST ---
-                                tasks_in_quest = quest_info.get('tasks', []) # Get the list associated with the 'tasks' key
+                                tasks_in_quest = quest_preview["tasks"] # Get the list associated with the 'tasks' key
                                 if tasks_in_quest:
                                     st.markdown("*Tasks within quest:*")
                                     # Iterate assuming each item IS the task detail dictionary
@@ -128,8 +130,7 @@ else:
                     if not contained_tasks:
                         st.caption("No standalone tasks in this mission.")
                     else:
-                        for task_id in contained_tasks:
-                            task_info = task_templates.get(task_id)
+                        for task_id, task_info in contained_tasks:
                             if task_info:
                                 st.markdown(f"**{task_info.get('name', 'Unnamed Task')}** ({task_info.get('points', 0)} pts)")
                                 st.caption(f"{task_info.get('description', '')}")
@@ -150,43 +151,42 @@ else:
             with col1:
                 if st.button("✅ Accept Mission", key=f"accept_m_{assign_id}", use_container_width=True):
                     # --- Your existing acceptance logic ---
-                    current_assignments = utils.load_assignments(ASSIGNMENTS_FILE)
-                    if username in current_assignments and assign_id in current_assignments[username]:
-                         current_assignments[username][assign_id]['status'] = 'accepted'
-                         current_assignments[username][assign_id].setdefault('quest_instances', {})
-                         current_assignments[username][assign_id].setdefault('task_instances', {})
-                         if utils.save_assignments(current_assignments, ASSIGNMENTS_FILE):
-                             st.session_state['assignments'] = current_assignments
-                             st.success(f"Mission '{mission_template.get('name')}' accepted!")
-                             time.sleep(1)
-                             st.rerun()
-                    else:
-                        st.error("Could not find mission assignment to accept.")
-                    # --- End Acceptance Logic ---
+                    with utils.assignments_lock:
+                        current_assignments = utils.load_assignments(ASSIGNMENTS_FILE)
+                        if username in current_assignments and assign_id in current_assignments[username]:
+                             current_assignments[username][assign_id]['status'] = 'accepted'
+                             current_assignments[username][assign_id].setdefault('quest_instances', {})
+                             current_assignments[username][assign_id].setdefault('task_instances', {})
+                             if utils.save_assignments(current_assignments, ASSIGNMENTS_FILE):
+                                 st.session_state['assignments'] = current_assignments
+                                 st.success(f"Mission '{mission_template.get('name')}' accepted!")
+                                 time.sleep(1)
+                                 st.rerun()
+                        else:
+                            st.error("Could not find mission assignment to accept.")
+                        # --- End Acceptance Logic ---
 
             with col2:
                 if st.button("❌ Decline Mission", key=f"decline_m_{assign_id}", use_container_width=True):
                     # --- Your existing decline logic ---
-                    current_assignments = utils.load_assignments(ASSIGNMENTS_FILE)
-                    if username in current_assignments and assign_id in current_assignments[username]:
-                        current_assignments[username][assign_id]['status'] = 'declined'
-                        if utils.save_assignments(current_assignments, ASSIGNMENTS_FILE):
-                            st.session_state['assignments'] = current_assignments
-                            st.warning(f"Mission '{mission_template.get('name')}' declined.")
-                            time.sleep(1)
-                            st.rerun()
-                    else:
-                        st.error("Could not find mission assignment to decline.")
-                    # --- End Decline Logic ---
+                    with utils.assignments_lock:
+                        current_assignments = utils.load_assignments(ASSIGNMENTS_FILE)
+                        if username in current_assignments and assign_id in current_assignments[username]:
+                            current_assignments[username][assign_id]['status'] = 'declined'
+                            if utils.save_assignments(current_assignments, ASSIGNMENTS_FILE):
+                                st.session_state['assignments'] = current_assignments
+                                st.warning(f"Mission '{mission_template.get('name')}' declined.")
+                                time.sleep(1)
+                                st.rerun()
+                        else:
+                            st.error("Could not find mission assignment to decline.")
+                        # --- End Decline Logic ---
 
         st.divider() # Separate each pending mission visually
 
 # --- 2. Accepted Missions Section ---
 
-accepted_missions = {
-    assign_id: data for assign_id, data in kid_assignments.items()
-    if data.get('type') == 'mission' and data.get('status') == 'accepted'
-}
+accepted_missions = view_models.board_group(board, 'mission', 'accepted')
 
 if not accepted_missions:
     pass
@@ -197,11 +197,13 @@ else:
 
     for assign_id, mission_assignment_data in accepted_missions.items():
         mission_template_id = mission_assignment_data.get('template_id')
-        mission_template = mission_templates.get(mission_template_id)
+        preview = view_models.mission_preview(mission_template_id, mission_templates, quest_templates, task_templates)
 
-        if not mission_template:
+        if not preview:
             st.error(f"Could not find template details for Mission ID {mission_template_id}. Skipping.")
             continue # Skip this iteration if template is missing
+        mission_template = preview["template"]
+        mission_statuses = item_statuses.get(assign_id, {})
 
         # --- Use Expander for each Accepted Mission ---
         # Create a descriptive label for the expander
@@ -218,8 +220,8 @@ else:
             st.markdown("---") # Divider inside expander, above components
 
             # --- Get Components ---
-            contained_quests = mission_template.get('contains_quests', [])
-            contained_tasks = mission_template.get('contains_tasks', []) # Standalone tasks
+            contained_quests = preview["quests"]
+            contained_tasks = preview["tasks"] # Standalone tasks
 
             # --- Handle Case with No Components ---
             if not contained_quests and not contained_tasks:
@@ -235,13 +237,12 @@ else:
                     if not contained_quests:
                         st.caption("No quests defined.")
                     else:
-                        for quest_id in contained_quests:
-                            quest_template = quest_templates.get(quest_id)
+                        for quest_preview in contained_quests:
+                            quest_id = quest_preview["id"]
+                            quest_template = quest_preview["template"]
                             if quest_template:
                                 # --- Display Quest Status ---
-                                current_status = utils.calculate_item_status(
-                                    quest_id, 'quest', mission_template, mission_assignment_data
-                                )
+                                current_status = mission_statuses.get(('quest', quest_id), 'locked')
                                 status_icon = "🔒" if current_status == "locked" else "✅" if current_status == "completed" else "▶️"
                                 quest_name = quest_template.get('name', 'Unknown Quest')
                                 quest_emoji = quest_template.get('emoji','⚔️')
@@ -255,7 +256,7 @@ else:
                                     st.markdown(f"- {status_icon} {quest_emoji} **{quest_name}**")
 
                                 # --- Display Tasks WITHIN this Quest (indented look) ---
-                                tasks_in_quest = quest_template.get('tasks', [])
+                                tasks_in_quest = quest_preview["tasks"]
                                 if tasks_in_quest:
                                     for task_detail in tasks_in_quest:
                                         if isinstance(task_detail, dict):
@@ -280,13 +281,10 @@ else:
                     if not contained_tasks:
                         st.caption("No standalone tasks.")
                     else:
-                        for task_id in contained_tasks:
-                            task_template = task_templates.get(task_id)
+                        for task_id, task_template in contained_tasks:
                             if task_template:
                                 # --- Display Task Status ---
-                                current_status = utils.calculate_item_status(
-                                    task_id, 'task', mission_template, mission_assignment_data
-                                )
+                                current_status = mission_statuses.get(('task', task_id), 'locked')
                                 status_icon = "🔒" if current_status == "locked" else "✅" if current_status == "completed" else "▶️"
                                 task_name = task_template.get('name', task_template.get('description', 'Unknown Task'))
                                 task_emoji = task_template.get('emoji','📝')
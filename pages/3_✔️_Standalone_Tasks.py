@@ -1,5 +1,6 @@
 import streamlit as st
 import utils # Import shared utility functions
+import view_models
 from pathlib import Path
 from datetime import datetime
 import time
@@ -63,29 +64,13 @@ def kid_task_view():
         st.error("User username not found in session state.")
         st.stop()
 
-    user_assignments = assignments_data.get(username, {})
-
-    # --- Filter tasks by status ---
-    pending_assignments = {
-        assign_id: data for assign_id, data in user_assignments.items()
-        if data.get('status') == 'pending_acceptance' and data.get('type') == 'standalone'
-    }
-    active_assignments = {
-        assign_id: data for assign_id, data in user_assignments.items()
-        if data.get('status') == 'active' and data.get('type') == 'standalone'
-    }
-    assignments_awaiting_approval = {
-        assign_id: data for assign_id, data in user_assignments.items()
-        if data.get('status') == 'awaiting approval' and data.get('type') == 'standalone'
-    }
-    completed_assignments = {
-        assign_id: data for assign_id, data in user_assignments.items()
-        if data.get('status') == 'completed' and data.get('type') == 'standalone'
-    }
-    declined_assignments = {
-        assign_id: data for assign_id, data in user_assignments.items()
-        if data.get('status') == 'declined' and data.get('type') == 'standalone'
-    }
+    # --- Filter tasks by status (grouped once per data version in the shared board) ---
+    board = view_models.user_board(username, assignments_data, mission_templates, quest_templates, task_templates)
+    pending_assignments = view_models.board_group(board, 'standalone', 'pending_acceptance')
+    active_assignments = view_models.board_group(board, 'standalone', 'active')
+    assignments_awaiting_approval = view_models.board_group(board, 'standalone', 'awaiting approval')
+    completed_assignments = view_models.board_group(board, 'standalone', 'completed')
+    declined_assignments = view_models.board_group(board, 'standalone', 'declined')
 
 
     # --- Function to display tasks in columns ---
@@ -121,98 +106,104 @@ def kid_task_view():
                             with b_col1:
                                 if st.button("✅ Accept", key=f"accept_{assign_id}", use_container_width=True):
                                     # Get state
-                                    current_assignments_state = st.session_state["assignments"]
-                                    # Modify state
-                                    if username in current_assignments_state and assign_id in current_assignments_state[username]:
-                                        current_assignments_state[username][assign_id]['status'] = 'active'
-                                        # Save state
-                                        if utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE):
-                                            st.success(f"Task '{task_template.get('name')}' accepted!")
+                                    with utils.assignments_lock:
+                                        current_assignments_state = utils.load_assignments(ASSIGNMENTS_FILE) or {}
+                                        # Modify state
+                                        if username in current_assignments_state and assign_id in current_assignments_state[username]:
+                                            current_assignments_state[username][assign_id]['status'] = 'active'
+                                            # Save state
+                                            if utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE):
+                                                st.session_state['assignments'] = current_assignments_state
+                                                st.success(f"Task '{task_template.get('name')}' accepted!")
                                             
-                                            # --- Add History Logging ---
-                                            try:
-                                                accept_msg = f"User '{kid_username}' accepted standalone task '{task_name}'"
-                                                utils.log_into_history(
-                                                    event_type="standalone_accepted",
-                                                    message=accept_msg,
-                                                    affected_item=assign_id,
-                                                    username=kid_username # Kid performed the action
-                                                )
-                                            except Exception as e:
-                                                st.warning(f"Could not write to history log: {e}")
+                                                # --- Add History Logging ---
+                                                try:
+                                                    accept_msg = f"User '{kid_username}' accepted standalone task '{task_name}'"
+                                                    utils.log_into_history(
+                                                        event_type="standalone_accepted",
+                                                        message=accept_msg,
+                                                        affected_item=assign_id,
+                                                        username=kid_username # Kid performed the action
+                                                    )
+                                                except Exception as e:
+                                                    st.warning(f"Could not write to history log: {e}")
                                             
                                             
-                                            st.rerun()
+                                                st.rerun()
+                                            else:
+                                                st.error("Failed to save acceptance.")
                                         else:
-                                            st.error("Failed to save acceptance.")
-                                    else:
-                                        st.error("Assignment not found. Refreshing.")
-                                        st.rerun()
+                                            st.error("Assignment not found. Refreshing.")
+                                            st.rerun()
 
                             with b_col2:
                                 if st.button("❌ Decline", key=f"decline_{assign_id}", use_container_width=True):
                                      # Get state
-                                    current_assignments_state = st.session_state["assignments"]
+                                    with utils.assignments_lock:
+                                        current_assignments_state = utils.load_assignments(ASSIGNMENTS_FILE) or {}
+                                        # Modify state
+                                        if username in current_assignments_state and assign_id in current_assignments_state[username]:
+                                            current_assignments_state[username][assign_id]['status'] = 'declined'
+                                            # Save state
+                                            if utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE):
+                                                st.session_state['assignments'] = current_assignments_state
+                                                st.warning(f"Task '{task_template.get('name')}' declined.")
+                                            
+                                                # --- Add History Logging ---
+                                                try:
+                                                    decline_msg = f"User '{kid_username}' declined standalone task '{task_name}'"
+                                                    utils.log_into_history(
+                                                        event_type="standalone_declined",
+                                                        message=decline_msg,
+                                                        affected_item=assign_id,
+                                                        username=kid_username # Kid performed the action
+                                                    )
+                                                except Exception as e:
+                                                    st.warning(f"Could not write to history log: {e}")
+                                                # --- End History Logging ---
+
+                                            
+                                                st.rerun()
+                                            else:
+                                                st.error("Failed to save decline.")
+                                        else:
+                                            st.error("Assignment not found. Refreshing.")
+                                            st.rerun()
+
+                        elif show_buttons == 'complete':
+                            if st.button("🏁 Mark as Complete", key=f"complete_{assign_id}", use_container_width=True):
+                                # Get state
+                                with utils.assignments_lock:
+                                    current_assignments_state = utils.load_assignments(ASSIGNMENTS_FILE) or {}
                                     # Modify state
                                     if username in current_assignments_state and assign_id in current_assignments_state[username]:
-                                        current_assignments_state[username][assign_id]['status'] = 'declined'
-                                        # Save state
+                                        current_assignments_state[username][assign_id]['status'] = 'awaiting approval'
+                                         # Save state
                                         if utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE):
-                                            st.warning(f"Task '{task_template.get('name')}' declined.")
-                                            
+                                            st.session_state['assignments'] = current_assignments_state
+                                            st.success(f"Task '{task_template.get('name')}' submitted for approval!")
+                                            st.balloons()
+                                        
                                             # --- Add History Logging ---
                                             try:
-                                                decline_msg = f"User '{kid_username}' declined standalone task '{task_name}'"
+                                                submit_msg = f"User '{kid_username}' submitted standalone task '{task_name}' for approval"
                                                 utils.log_into_history(
-                                                    event_type="standalone_declined",
-                                                    message=decline_msg,
+                                                    event_type="standalone_submitted",
+                                                    message=submit_msg,
                                                     affected_item=assign_id,
                                                     username=kid_username # Kid performed the action
                                                 )
                                             except Exception as e:
                                                 st.warning(f"Could not write to history log: {e}")
                                             # --- End History Logging ---
-
-                                            
+                                        
                                             st.rerun()
                                         else:
-                                            st.error("Failed to save decline.")
+                                            st.error("Failed to submit task for approval.")
                                     else:
                                         st.error("Assignment not found. Refreshing.")
                                         st.rerun()
 
-                        elif show_buttons == 'complete':
-                            if st.button("🏁 Mark as Complete", key=f"complete_{assign_id}", use_container_width=True):
-                                # Get state
-                                current_assignments_state = st.session_state["assignments"]
-                                # Modify state
-                                if username in current_assignments_state and assign_id in current_assignments_state[username]:
-                                    current_assignments_state[username][assign_id]['status'] = 'awaiting approval'
-                                     # Save state
-                                    if utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE):
-                                        st.success(f"Task '{task_template.get('name')}' submitted for approval!")
-                                        st.balloons()
-                                        
-                                        # --- Add History Logging ---
-                                        try:
-                                            submit_msg = f"User '{kid_username}' submitted standalone task '{task_name}' for approval"
-                                            utils.log_into_history(
-                                                event_type="standalone_submitted",
-                                                message=submit_msg,
-                                                affected_item=assign_id,
-                                                username=kid_username # Kid performed the action
-                                            )
-                                        except Exception as e:
-                                            st.warning(f"Could not write to history log: {e}")
-                                        # --- End History Logging ---
-                                        
-                                        st.rerun()
-                                    else:
-                                        st.error("Failed to submit task for approval.")
-                                else:
-                                    st.error("Assignment not found. Refreshing.")
-                                    st.rerun()
-
                         elif show_buttons == 'awaiting':
                              st.info("⏳ Awaiting Parent Approval") # Indicate status clearly
 
@@ -276,144 +267,124 @@ def parental_task_view():
         st.stop()
     
     
+    # Set by approve() before its rerun
+    if 'approval_result' in st.session_state:
+        kind, message = st.session_state.pop('approval_result')
+        getattr(st, kind)(message)
+
     parent_config_details = config.get('credentials',{}).get('usernames',{}).get(username,{})
     parent_children_usernames = parent_config_details.get('children', [])
 
     if not parent_children_usernames:
         st.info("No children assigned to this account.")
-    else:
-        tasks_to_approve_found = False
-        for kid in parent_children_usernames:
-            kid_capitalized = kid.title()
-            kid_firstname_capitalized = kid_capitalized.split(maxsplit=1)[0]
-            kid_assignments = assignments_data.get(kid, {})
-            kid_tasks_awaiting = {
-                assign_id: assign_data for assign_id, assign_data in kid_assignments.items()
-                if assign_data.get('status') == 'awaiting approval' and assign_data.get('type') == 'standalone'
-            }
-
-            if kid_tasks_awaiting:
-                tasks_to_approve_found = True
-                with st.expander(f"Tasks Awaiting Approval for {kid_firstname_capitalized}", expanded=True):
-                    # Display in columns for better layout if many tasks
-                    num_tasks = len(kid_tasks_awaiting)
-                    max_cols = 3
-                    num_cols = min(num_tasks, max_cols)
-                    cols = st.columns(num_cols)
-                    col_index = 0
-
-                    for assign_id, assign_data in kid_tasks_awaiting.items():
-                        task_id = assign_data.get('task_id') or assign_data.get('template_id')
-                        task_template = task_templates.get(task_id)
-                        if not task_template:
-                             st.warning(f"Task template {task_id} not found for assignment {assign_id}. Skipping.")
-                             continue
-
-                        with cols[col_index % num_cols]:
-                            with st.container(border=True):
-                                
-                                task_name = task_template.get('name','Unnamed Task')
-                                task_points = task_template.get('points', 0)
-                                st.subheader(f"{task_template.get('emoji','❓')} {task_template.get('name','Unnamed Task')}")
-                                st.caption(task_template.get('description', 'No description.'))
-                                st.markdown(f"**Points:** {task_template.get('points', 0):,}") # Added formatting
-                                #You must define the columns where they will be displayed
-                                cols2 = st.columns([4,4])
-                                if cols2[0].button("✅ Approve & Award Points", key=f"approve_{kid}_{assign_id}", use_container_width=True):
-                                    # 1. Get current state from session_state (which holds the full data)
-                                    current_assignments_state = st.session_state["assignments"]
-                                    current_points_state = st.session_state["points"]
-
-                                    # 2. Modify state
-                                    if kid in current_assignments_state and assign_id in current_assignments_state[kid]:
-                                        current_assignments_state[kid][assign_id]['status'] = 'completed'
-                                        task_points = task_template.get('points', 0)
-                                        current_points_state[kid] = current_points_state.get(kid, 0) + task_points
-
-                                        # 3. Save updated state to persistent storage
-                                        save_assignments_ok = utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE)
-                                        save_points_ok = utils.save_points(current_points_state, POINTS_FILE)
-
-                                        if save_assignments_ok and save_points_ok:
-                                            # 4. Session state already modified in step 2, no need to reassign
-                                            # 5. Provide Feedback
-                                            st.success(f"Task '{task_template.get('name')}' approved for {kid_firstname_capitalized}!")
-                                            st.balloons()
-                                            
-                                            try:
-                                                # Log task approval
-                                                approve_msg = f"Parent '{parent_username}' approved standalone task '{task_name}' for {kid}"
-                                                utils.log_into_history(
-                                                    event_type="standalone_approved",
-                                                    message=approve_msg,
-                                                    affected_item=assign_id,
-                                                    username=parent_username # Parent performed the action
-                                                )
+        return
+
+    # Awaiting items come from the per-kid inbox index, which only changes when a kid's data does
+    inbox = view_models.approval_inbox(parent_children_usernames, assignments_data, task_templates)
+    if not inbox:
+        st.info("No tasks from any assigned children are currently awaiting approval.")
+        return
+
+    def kid_first_name(kid):
+        return kid.title().split(maxsplit=1)[0]
+
+    def approve(items):
+        """Approves the given inbox items as one batch, then reruns; the outcome is shown after the rerun."""
+        approved = utils.approve_standalone_tasks(
+            parent_username, items, ASSIGNMENTS_FILE, POINTS_FILE
+        )
+        if approved is None:
+            st.session_state['approval_result'] = ("error", "Failed to save changes. Please check file permissions or data integrity.")
+        elif not approved:
+            st.session_state['approval_result'] = ("info", "Those tasks were already handled, so nothing was changed.")
+        else:
+            st.session_state['approval_result'] = ("success", f"Approved {len(approved)} task(s)!")
+            st.balloons()
+            time.sleep(1)
+        st.rerun()
+
+    # --- Bulk approval ---
+    with st.container(border=True):
+        st.subheader(f"📥 Approval inbox ({len(inbox)})")
+        item_labels = {
+            (item['kid'], item['assign_id']): f"{kid_first_name(item['kid'])} · {item['emoji']} {item['name']} ({item['points']:,} pts)"
+            for item in inbox
+        }
+        selected_keys = st.multiselect(
+            "Select tasks to approve",
+            options=list(item_labels),
+            format_func=item_labels.get,
+            key="approval_inbox_selection"
+        )
+        bulk_cols = st.columns([2, 2, 4])
+        if bulk_cols[0].button(f"✅ Approve selected ({len(selected_keys)})", disabled=not selected_keys, use_container_width=True):
+            approve([item for item in inbox if (item['kid'], item['assign_id']) in set(selected_keys)])
+        if bulk_cols[1].button(f"✅ Approve all ({len(inbox)})", use_container_width=True):
+            approve(inbox)
+
+    # --- One card per task, grouped by kid ---
+    items_by_kid = {}
+    for item in inbox:
+        items_by_kid.setdefault(item['kid'], []).append(item)
+
+    for kid, kid_items in items_by_kid.items():
+        kid_firstname_capitalized = kid_first_name(kid)
+        with st.expander(f"Tasks Awaiting Approval for {kid_firstname_capitalized}", expanded=True):
+            # Display in columns for better layout if many tasks
+            num_cols = min(len(kid_items), 3)
+            cols = st.columns(num_cols)
 
-                                                # Log points awarded
-                                                points_msg = f"Parent '{parent_username}' awarded {task_points} points to {kid} for completing task '{task_name}'"
-                                                utils.log_into_history(
-                                                    event_type="points_awarded",
-                                                    message=points_msg,
-                                                    affected_item=kid, # The user receiving points
-                                                    username=parent_username # Parent performed the action
-                                                )
-                                                #Log into child history
-                                                child_message = f"Your guardian '{parent_username}' approved your task '{task_name}' and awarded you {task_points} points!"
-                                                utils.log_into_history(
-                                                    event_type="task_completed",
-                                                    message=child_message,
-                                                    affected_item=task_id, # The user receiving points
-                                                    username=kid # Parent performed the action
-                                                )
-                                            except Exception as e:
-                                                st.warning(f"Could not write to history log: {e}")
-                                            
-                                            
-                                            # 6. Trigger Rerun
-                                            st.rerun()
-                                        else:
-                                            st.error("Failed to save changes. Please check file permissions or data integrity.")
-                                            # Optionally revert changes in session state if save fails
-                                            # Or just let the user retry
-                                    else:
-                                        st.error(f"Assignment {assign_id} for {kid_firstname_capitalized} seems to have changed or been removed. Refreshing.")
-                                        st.rerun() # Rerun to show the current actual state
-
-                                if cols2[1].button(f"❌ Reject and send back to {kid_firstname_capitalized}", key=f"reject_{kid}_{assign_id}", use_container_width=True):
-                                    current_assignments_state = st.session_state["assignments"]
-                                    
-                                    if kid in current_assignments_state and assign_id in current_assignments_state[kid]:
-                                        current_assignments_state[kid][assign_id]['status'] = 'active'
-                                        save_assignments_ok = utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE)
-                                        if save_assignments_ok:
-                                            st.success(f"Task '{task_template.get('name')}' sent back to {kid_firstname_capitalized} to try again!")
-                                            
-                                            try:
-                                                # Log task approval
-                                                approve_msg = f"Parent '{parent_username}' rejected standalone task '{task_name}' for {kid}"
-                                                utils.log_into_history(
-                                                    event_type="standalone_rejected",
-                                                    message=approve_msg,
-                                                    affected_item=assign_id,
-                                                    username=parent_username
-                                                )
+            for col_index, item in enumerate(kid_items):
+                assign_id = item['assign_id']
+                task_id = item['task_id']
+                task_template = item['template']
+                task_name = item['name']
 
-                                                #Log into child history
-                                                child_message = f"Your guardian '{parent_username}' did not approve your task '{task_name}'!"
-                                                utils.log_into_history(
-                                                    event_type="task_rejected",
-                                                    message=child_message,
-                                                    affected_item=task_id,
-                                                    username=kid
-                                                )
-                                            except Exception as e:
-                                                st.warning(f"Could not write to history log: {e}")
+                with cols[col_index % num_cols]:
+                    with st.container(border=True):
+                        st.subheader(f"{item['emoji']} {task_name}")
+                        st.caption(task_template.get('description', 'No description.'))
+                        st.markdown(f"**Points:** {item['points']:,}") # Added formatting
+                        #You must define the columns where they will be displayed
+                        cols2 = st.columns([4,4])
+                        if cols2[0].button("✅ Approve & Award Points", key=f"approve_{kid}_{assign_id}", use_container_width=True):
+                            approve([item])
+
+                        if cols2[1].button(f"❌ Reject and send back to {kid_firstname_capitalized}", key=f"reject_{kid}_{assign_id}", use_container_width=True):
+                            with utils.assignments_lock:
+                                current_assignments_state = utils.load_assignments(ASSIGNMENTS_FILE) or {}
+
+                                if kid in current_assignments_state and assign_id in current_assignments_state[kid]:
+                                    current_assignments_state[kid][assign_id]['status'] = 'active'
+                                    save_assignments_ok = utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE)
+                                    if save_assignments_ok:
+                                        st.session_state['assignments'] = current_assignments_state
+                                        st.success(f"Task '{task_name}' sent back to {kid_firstname_capitalized} to try again!")
 
-                        col_index += 1
+                                        try:
+                                            # Log task rejection
+                                            reject_msg = f"Parent '{parent_username}' rejected standalone task '{task_name}' for {kid}"
+                                            utils.log_into_history(
+                                                event_type="standalone_rejected",
+                                                message=reject_msg,
+                                                affected_item=assign_id,
+                                                username=parent_username
+                                            )
 
-        if not tasks_to_approve_found:
-             st.info("No tasks from any assigned children are currently awaiting approval.")
+                                            #Log into child history
+                                            child_message = f"Your guardian '{parent_username}' did not approve your task '{task_name}'!"
+                                            utils.log_into_history(
+                                                event_type="task_rejected",
+                                                message=child_message,
+                                                affected_item=task_id,
+                                                username=kid
+                                            )
+                                        except Exception as e:
+                                            st.warning(f"Could not write to history log: {e}")
+                                        st.rerun()
+                                else:
+                                    st.error(f"Assignment {assign_id} for {kid_firstname_capitalized} seems to have changed or been removed. Refreshing.")
+                                    st.rerun()
 
 if st.session_state.get('role') == 'parent':
     parental_task_view()
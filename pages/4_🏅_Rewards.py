@@ -1,5 +1,7 @@
 import streamlit as st
 import utils # Import shared utility functions
+import daily_stats
+import rewards
 import time # For assignment ID generation
 
 
@@ -63,10 +65,104 @@ if task_templates is None or quest_templates is None or mission_templates is Non
     st.stop()
     
     
+
+def show_points_chart(chart_username, key_prefix):
+    """Points earned per day or week, split by where they came from, from the daily stats rows."""
+    period = st.radio("Points per", ["Day", "Week"], horizontal=True, key=f"{key_prefix}_period")
+    points_by_period = daily_stats.points_series(chart_username, period)
+    if points_by_period.empty:
+        st.info("No points have been earned yet.")
+        return
+    points_by_period = points_by_period.rename(columns={
+        'points_task': 'Tasks', 'points_standalone': 'Standalone tasks',
+        'points_quest_bonus': 'Quest bonuses', 'points_mission_reward': 'Mission rewards'
+    })
+    st.bar_chart(points_by_period, use_container_width=True)
+    st.caption(f"{int(points_by_period.to_numpy().sum()):,} points earned since {points_by_period.index[0]:%B %d, %Y}")
+
+
 if st.session_state.get('role') == 'parent' or st.session_state.get('role') == 'admin':
     st.title("🏅 Rewards!")
     st.write("Here are all your kids rewards!")
-    
+
+    parent_children_usernames = config['credentials']['usernames'].get(username, {}).get('children', [])
+    if not parent_children_usernames:
+        st.warning("You are not currently assigned any children to manage in the configuration.")
+    else:
+        chart_child = st.selectbox(
+            "Points over time for",
+            options=parent_children_usernames,
+            format_func=lambda kid_un: config['credentials']['usernames'].get(kid_un, {}).get('name', kid_un),
+            key="rewards_chart_child"
+        )
+        show_points_chart(chart_child, key_prefix="rewards_parent_chart")
+
+        st.divider()
+        st.subheader("🎁 Reward requests")
+        held_requests = rewards.redemptions_for(parent_children_usernames, statuses=("held",))
+        if not held_requests:
+            st.info("No reward requests are waiting for you.")
+        else:
+            for redemption_id, redemption in held_requests:
+                kid_name = config['credentials']['usernames'].get(redemption['kid'], {}).get('name', redemption['kid'])
+                request_cols = st.columns([5, 1, 1])
+                request_cols[0].write(f"**{utils.first_name(kid_name)}** wants **{redemption['name']}** ({redemption['points']:,} pts on hold)")
+                for col, approve, label in ((request_cols[1], True, "✅ Approve"), (request_cols[2], False, "❌ Reject")):
+                    if col.button(label, key=f"{'approve' if approve else 'reject'}_{redemption_id}"):
+                        try:
+                            rewards.decide_redemptions(username, [redemption_id], approve)
+                        except OSError as e:
+                            st.error(f"Could not save the decision: {e}")
+                            print(f"Error: Could not decide redemption {redemption_id}: {e}") # Server log
+                        else:
+                            st.rerun()
+
 if st.session_state.get('role') == 'kid' or st.session_state.get('role') == 'admin':
     st.title("🏅 Rewards!")
-    st.write("Here are your rewards!")
\ No newline at end of file
+    st.write("Here are your rewards!")
+
+    my_balance = rewards.balance(username)
+    balance_cols = st.columns(3)
+    balance_cols[0].metric("Available to spend", f"{my_balance['available']:,}", border=True)
+    balance_cols[1].metric("On hold", f"{my_balance['held']:,}", border=True)
+    balance_cols[2].metric("Spent", f"{my_balance['spent']:,}", border=True)
+
+    st.subheader("🎁 Rewards I can get now")
+    affordable_rewards = rewards.affordable(my_balance['available'])
+    if not affordable_rewards:
+        st.info("Keep going! You can't afford any rewards yet.")
+    for reward_id, reward in affordable_rewards:
+        with st.container(border=True):
+            reward_cols = st.columns([1, 4, 1])
+            if reward.get('image'):
+                reward_cols[0].image(reward['image'])
+            reward_cols[1].markdown(f"**{reward['name']}** · {reward['points']:,} pts")
+            reward_cols[1].caption(reward.get('description', ''))
+            if reward_cols[2].button("Redeem", key=f"redeem_{reward_id}"):
+                try:
+                    rewards.request_redemption(username, reward_id)
+                except ValueError as e:
+                    st.warning(str(e))
+                except OSError as e:
+                    st.error(f"Could not request the reward: {e}")
+                    print(f"Error: Could not request reward {reward_id} for {username}: {e}") # Server log
+                else:
+                    st.rerun()
+
+    goal = rewards.next_goal(my_balance['available'])
+    if goal:
+        _, goal_reward = goal
+        st.progress(
+            max(0.0, min(1.0, my_balance['available'] / goal_reward['points'])),
+            text=f"Next up: {goal_reward['name']} ({goal_reward['points'] - my_balance['available']:,} more points)"
+        )
+
+    my_requests = rewards.redemptions_for([username])
+    if my_requests:
+        with st.expander(f"My reward requests ({len(my_requests)})"):
+            for redemption_id, redemption in my_requests:
+                status_label = {"held": "⏳ Waiting for a parent", "approved": "✅ Approved", "rejected": "❌ Rejected"}[redemption['status']]
+                st.write(f"**{redemption['name']}** ({redemption['points']:,} pts) · {status_label}")
+
+    st.subheader("📈 My points over time")
+    show_points_chart(username, key_prefix="rewards_kid_chart")
\ No newline at end of file
@@ -1,5 +1,13 @@
 import streamlit as st
 import utils # Import shared utility functions
+import history
+import history_archive
+import history_search
+import rewards
+import template_search
+import deadlines
+import scheduler
+import view_models
 from datetime import datetime
 import time # For assignment ID generation
 from pathlib import Path
@@ -73,8 +81,6 @@ quest_templates = utils.load_quest_templates(QUESTS_TEMPLATE_FILE)
 mission_templates = utils.load_mission_templates(MISSIONS_TEMPLATE_FILE)
 assignments_data = utils.load_assignments(ASSIGNED_QUESTS_FILE)
 firstname = utils.first_name(name)
-safe_filename = f"{username}_history.json"
-history_file_path = HISTORY_FOLDER / safe_filename
 
 with st.sidebar:
     current_points_unformatted = st.session_state.get('points', {}).get(username, 0)
@@ -93,6 +99,398 @@ if task_templates is None or quest_templates is None or mission_templates is Non
     st.stop()
 
 
+HISTORY_PAGE_SIZES = [25, 50, 100]
+HISTORY_DISPLAY_COLUMNS = ['timestamp', 'event_type', 'message', 'affected_item', 'user']
+
+def format_history_page(events, user_timezone):
+    """Turns one page of history events into a display DataFrame in the user's timezone."""
+    df_history = pd.DataFrame(events)
+    if 'timestamp' in df_history.columns:
+        # errors='coerce' turns unparseable strings/None into NaT (Not a Time)
+        df_history['timestamp'] = pd.to_datetime(df_history['timestamp'], errors='coerce', utc=True)
+        try:
+            df_history['timestamp'] = df_history['timestamp'].dt.tz_convert(history.get_zone(user_timezone))
+        except Exception as tz_error:
+            st.error(f"Could not convert timestamps to timezone '{user_timezone}'. Displaying in UTC. Error: {tz_error}")
+            print(f"Timezone conversion error for user {username}, tz {user_timezone}: {tz_error}")
+        df_history['timestamp'] = df_history['timestamp'].dt.strftime('%d/%m/%y %H:%M:%S').fillna("N/A")
+    existing_columns = [col for col in HISTORY_DISPLAY_COLUMNS if col in df_history.columns]
+    return df_history[existing_columns]
+
+def show_history_full_table(history_username, user_timezone, selected_types, start, end, affected_filter, user_filter):
+    """
+    Whole-history table from the cached, incrementally tailed DataFrame. Filters are
+    vectorized masks over the cached frame; nothing is re-parsed unless new events were logged.
+    """
+    try:
+        df_history = history.load_history_frame(history_username, user_timezone)
+    except (OSError, ValueError) as e:
+        st.error(f"An error occurred while accessing history file: {e}")
+        print(f"Error: Could not load history frame for {history_username}: {e}") # Server log
+        return
+    if df_history.empty:
+        st.info(f"No history found for user '{history_username}'.")
+        return
+
+    mask = pd.Series(True, index=df_history.index)
+    if selected_types:
+        mask &= df_history['event_type'].isin(selected_types)
+    if affected_filter:
+        mask &= df_history['affected_item'].astype(str) == affected_filter
+    if user_filter:
+        mask &= df_history['user'] == user_filter
+    if start is not None:
+        mask &= df_history['epoch'] >= start.timestamp()
+    if end is not None:
+        mask &= df_history['epoch'] <= end.timestamp()
+
+    st.dataframe(
+        df_history.loc[mask, HISTORY_DISPLAY_COLUMNS].iloc[::-1], # Most recent first
+        use_container_width=True,
+        hide_index=True
+    )
+    st.caption(f"{int(mask.sum()):,} of {len(df_history):,} events")
+
+def paging_state(key_prefix, filters):
+    """
+    Cursor stack for a paginated view, kept in session state: the last entry is the cursor of
+    the page on screen (None for the first page). Changing any filter starts again from the
+    first page.
+    """
+    paging_key = f"{key_prefix}_paging"
+    paging = st.session_state.get(paging_key)
+    if not paging or paging["filters"] != filters:
+        paging = {"filters": filters, "cursors": [None]}
+        st.session_state[paging_key] = paging
+    return paging
+
+def show_page_nav(paging, next_cursor, key_prefix, caption, labels=("⬅️ Newer", "Older ➡️")):
+    """Back/forward buttons for a paging_state() view; next_cursor is None on the last page."""
+    nav_cols = st.columns([1, 1, 4])
+    if nav_cols[0].button(labels[0], key=f"{key_prefix}_back", disabled=len(paging["cursors"]) == 1, use_container_width=True):
+        paging["cursors"].pop()
+        st.rerun()
+    if nav_cols[1].button(labels[1], key=f"{key_prefix}_forward", disabled=next_cursor is None, use_container_width=True):
+        paging["cursors"].append(next_cursor)
+        st.rerun()
+    nav_cols[2].caption(caption)
+
+def show_history(history_username, user_timezone, key_prefix):
+    """
+    Filterable, paginated history table (newest first), with a word search on top. Only the
+    page being viewed (or the matching events) is read from the user's log.
+    """
+    search_query = st.text_input(
+        "🔎 Search history",
+        placeholder="e.g. fourth task",
+        key=f"{key_prefix}_search",
+        help="Finds events whose message, event type or affected item contain all of these words."
+    ).strip()
+    if search_query:
+        try:
+            events, total_matches = history_search.search_history(history_username, search_query, limit=max(HISTORY_PAGE_SIZES))
+        except (OSError, ValueError) as e:
+            st.error(f"An error occurred while searching history: {e}")
+            print(f"Error: Could not search history for {history_username}: {e}") # Server log
+            return
+        if not events:
+            st.info(f"No history events match '{search_query}'.")
+            return
+        st.dataframe(format_history_page(events, user_timezone), use_container_width=True, hide_index=True)
+        st.caption(f"{total_matches:,} matching events" + (f" · showing the newest {len(events)}" if total_matches > len(events) else ""))
+        return
+
+    view_mode = st.radio(
+        "View",
+        ["Pages", "Full table"],
+        horizontal=True,
+        key=f"{key_prefix}_view_mode",
+        help="Full table loads every event so you can sort and search the whole history at once."
+    )
+    filter_cols = st.columns([3, 2, 2, 2, 1])
+    selected_types = filter_cols[0].multiselect("Event type", options=history.EVENT_TYPES, key=f"{key_prefix}_types")
+    date_range = filter_cols[1].date_input("Date range", value=(), key=f"{key_prefix}_dates")
+    affected_filter = filter_cols[2].text_input("Affected item", key=f"{key_prefix}_affected").strip()
+    user_filter = filter_cols[3].text_input("User", key=f"{key_prefix}_user").strip()
+    page_size = filter_cols[4].selectbox("Rows", options=HISTORY_PAGE_SIZES, index=1, key=f"{key_prefix}_page_size")
+
+    # Dates are picked in the user's local time
+    start = end = None
+    local_tz = history.get_zone(user_timezone)
+    if len(date_range) >= 1:
+        start = datetime.combine(date_range[0], datetime.min.time(), tzinfo=local_tz)
+        end = datetime.combine(date_range[-1], datetime.max.time(), tzinfo=local_tz)
+
+    if view_mode == "Full table":
+        show_history_full_table(history_username, user_timezone, selected_types, start, end, affected_filter, user_filter)
+        return
+
+    paging = paging_state(key_prefix, (tuple(selected_types), tuple(date_range), affected_filter, user_filter, page_size))
+
+    try:
+        events, next_cursor = history.query_history(
+            history_username,
+            event_types=selected_types,
+            start=start,
+            end=end,
+            affected_item=affected_filter or None,
+            user=user_filter or None,
+            cursor=paging["cursors"][-1],
+            limit=page_size
+        )
+    except (OSError, ValueError) as e:
+        st.error(f"An error occurred while accessing history file: {e}")
+        print(f"Error: Could not query history for {history_username}: {e}") # Server log
+        return
+
+    if not events:
+        if not history.has_history(history_username):
+            st.info(f"No history found for user '{history_username}'.")
+        else:
+            st.info("No history events match these filters.")
+    else:
+        st.dataframe(
+            format_history_page(events, user_timezone),
+            use_container_width=True, # Make table use full tab width
+            hide_index=True # Hide the default numerical index
+        )
+
+    show_page_nav(
+        paging, next_cursor, key_prefix,
+        f"Page {len(paging['cursors'])} · {history.count_events(history_username):,} events in total"
+    )
+
+def show_family_feed(usernames, user_timezone, key_prefix):
+    """
+    One activity feed across several users' logs, newest first. Pages are merged lazily,
+    so only the events on screen are read from disk.
+    """
+    view_mode = st.radio(
+        "View",
+        ["Pages", "Full table"],
+        horizontal=True,
+        key=f"{key_prefix}_view_mode",
+        help="Full table loads every family member's history (in parallel) into one table."
+    )
+    if view_mode == "Full table":
+        try:
+            frames = history.load_history_frames(usernames, user_timezone)
+        except (OSError, ValueError) as e:
+            st.error(f"An error occurred while loading family history: {e}")
+            print(f"Error: Could not load history frames for {usernames}: {e}") # Server log
+            return
+        df_family = pd.concat(list(frames.values()), ignore_index=True) if frames else pd.DataFrame()
+        if df_family.empty:
+            st.info("No family activity has been logged yet.")
+            return
+        df_family = df_family.sort_values('epoch', ascending=False, kind='stable')
+        st.dataframe(df_family[HISTORY_DISPLAY_COLUMNS], use_container_width=True, hide_index=True)
+        st.caption(f"{len(df_family):,} events across {len(frames)} family members")
+        return
+
+    page_size = st.selectbox("Rows", options=HISTORY_PAGE_SIZES, index=1, key=f"{key_prefix}_page_size")
+
+    paging = paging_state(key_prefix, (tuple(usernames), page_size))
+
+    try:
+        events, next_cursor = history.family_feed(usernames, limit=page_size, cursor=paging["cursors"][-1])
+    except (OSError, ValueError) as e:
+        st.error(f"An error occurred while building the family feed: {e}")
+        print(f"Error: Could not build family feed for {usernames}: {e}") # Server log
+        return
+
+    if not events:
+        st.info("No family activity has been logged yet.")
+    else:
+        st.dataframe(format_history_page(events, user_timezone), use_container_width=True, hide_index=True)
+
+    show_page_nav(paging, next_cursor, key_prefix, f"Page {len(paging['cursors'])}")
+
+def format_duration(seconds):
+    """Short human duration, e.g. '2d 3h', '4h 10m' or '45m'."""
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+def show_assignment_timeline(children_usernames, user_timezone):
+    """
+    One assignment's lifecycle across the parent's and child's histories, with the time
+    between stages. Events are found through the affected-item index, not by scanning logs.
+    """
+    assignment_options = {} # assign_id -> (label, assigned epoch)
+    for kid_un in children_usernames:
+        kid_name = utils.first_name(config['credentials']['usernames'].get(kid_un, {}).get('name', kid_un)) or kid_un
+        for assign_id, assign_data in assignments_data.get(kid_un, {}).items():
+            template, default_emoji = view_models.template_for_assignment(assign_data, mission_templates, quest_templates, task_templates)
+            label = (
+                f"{kid_name} · {template.get('emoji', default_emoji)} {template.get('name', assign_data.get('template_id', assign_id))}"
+                f" ({assign_data.get('status', 'unknown')})"
+            )
+            assignment_options[assign_id] = (label, deadlines.assigned_epoch(assign_data))
+    if not assignment_options:
+        st.info("Your children don't have any assignments yet.")
+        return
+
+    selected_assignment = st.selectbox(
+        "Assignment",
+        options=list(assignment_options)[::-1], # Newest assignments are saved last, so list them first
+        format_func=lambda assign_id: assignment_options[assign_id][0],
+        key="timeline_assignment"
+    )
+    # Older assignments logged their template id when assigned, so fall back to assigned_on
+    stage_epochs, durations = history_search.turnaround_times(
+        selected_assignment, assigned_epoch=assignment_options[selected_assignment][1]
+    )
+
+    if durations:
+        duration_cols = st.columns(len(durations))
+        for col, ((earlier, later), seconds) in zip(duration_cols, durations.items()):
+            col.metric(f"{earlier.capitalize()} → {later}", format_duration(seconds))
+    timeline = history_search.item_timeline(selected_assignment)
+    if not timeline:
+        st.info("No history has been logged for this assignment yet.")
+        return
+    st.dataframe(
+        format_history_page([event for _, event in timeline], user_timezone),
+        use_container_width=True,
+        hide_index=True
+    )
+
+def show_monthly_activity(children_usernames):
+    """
+    How often each child logged one event type per month, read from the columnar history
+    archive: only the owner and month columns of the matching rows are loaded.
+    """
+    if not history_archive.is_available():
+        st.info("Monthly activity needs pyarrow, which is not installed on this server.")
+        return
+    event_type = st.selectbox(
+        "Event type", history.EVENT_TYPES,
+        index=history.EVENT_TYPES.index("task_completed"), key="monthly_activity_type"
+    )
+    events = history_archive.query_events(usernames=children_usernames, columns=['owner', 'month'], event_types=[event_type])
+    if events.empty:
+        st.info("None of your children have logged this yet.")
+        return
+    counts = events.groupby(['month', 'owner']).size().unstack(fill_value=0)
+    counts.index = pd.to_datetime(counts.index.astype(str), format='%Y%m')
+    st.bar_chart(counts)
+
+TEMPLATE_PAGE_SIZES = [10, 25, 50]
+
+def show_template_browser(type_prefix, templates, type_label, key_prefix):
+    """
+    Filterable, paginated list of one template type. Only the current page is rendered;
+    summaries and details come from the template-versioned view cache, and details are only
+    built once "See details" is ticked.
+    """
+    if not templates:
+        st.info(f"No {type_label} templates defined yet.")
+        return
+    filter_cols = st.columns([4, 1])
+    filter_query = filter_cols[0].text_input(f"🔎 Filter {type_label} templates", key=f"{key_prefix}_filter")
+    page_size = filter_cols[1].selectbox("Per page", TEMPLATE_PAGE_SIZES, key=f"{key_prefix}_page_size")
+
+    # The cursor is the offset of the page's first match
+    _, match_count = template_search.search(type_prefix, filter_query, templates, limit=0)
+    paging = paging_state(key_prefix, (filter_query, page_size, match_count))
+    offset = paging["cursors"][-1] or 0
+    page_ids, _ = template_search.search(type_prefix, filter_query, templates, limit=page_size, offset=offset)
+
+    if not page_ids:
+        st.info(f"No {type_label} templates match '{filter_query}'.")
+        return
+    for template_id in page_ids:
+        summary_col, details_col = st.columns([3, 1])
+        summary_col.write(view_models.template_summary(type_prefix, template_id, templates))
+        if type_prefix != "task" and details_col.checkbox("See details", key=f"{key_prefix}_details_{template_id}"):
+            with summary_col:
+                for kind, text in view_models.template_details(type_prefix, template_id, mission_templates, quest_templates, task_templates):
+                    if kind == "badge":
+                        st.badge(text, color="blue")
+                    elif kind == "warning":
+                        st.warning(text)
+                    else:
+                        st.write(text)
+
+    show_page_nav(
+        paging, offset + page_size if offset + page_size < match_count else None, key_prefix,
+        f"Page {len(paging['cursors'])} of {max(1, -(-match_count // page_size))} · {match_count:,} templates",
+        labels=("⬅️ Previous", "Next ➡️")
+    )
+
+def _editor_value(value):
+    """Turns a data_editor cell back into a plain JSON value (blank cells become None)."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value.item() if hasattr(value, 'item') else value
+
+def show_bulk_template_editor(type_prefix, templates, filename, type_label, key_prefix):
+    """
+    Spreadsheet-style editor for task or quest templates. Edits are diffed against the rows
+    the editor was opened with and saved in one write; nothing is saved until "Save changes".
+    """
+    base_key = f"{key_prefix}_base"
+    editor_version_key = f"{key_prefix}_editor_version"
+    if base_key not in st.session_state:
+        st.session_state[base_key] = utils.template_rows(type_prefix, templates)
+    original_rows = st.session_state[base_key]
+    columns = utils.TEMPLATE_EDITOR_COLUMNS[type_prefix]
+    base_frame = pd.DataFrame(
+        [{"id": template_id, **row} for template_id, row in original_rows.items()],
+        columns=["id"] + columns
+    )
+    edited_frame = st.data_editor(
+        base_frame,
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        key=f"{key_prefix}_editor_{st.session_state.get(editor_version_key, 0)}",
+        column_config={
+            "id": st.column_config.TextColumn("ID", required=True),
+            "points": st.column_config.NumberColumn("Points", min_value=0, step=1),
+            "completion_bonus_points": st.column_config.NumberColumn("Completion bonus", min_value=0, step=1),
+        }
+    )
+
+    edited_records = [{column: _editor_value(value) for column, value in record.items()} for record in edited_frame.to_dict('records')]
+    edited_ids = [str(record["id"] or "").strip() for record in edited_records]
+    duplicate_ids = sorted({template_id for template_id in edited_ids if edited_ids.count(template_id) > 1})
+    edited_rows = {
+        template_id: {column: record[column] if record[column] is not None or column in utils.TEMPLATE_EDITOR_INT_COLUMNS else "" for column in columns}
+        for template_id, record in zip(edited_ids, edited_records)
+    }
+    added, changed, removed = utils.diff_template_rows(original_rows, edited_rows)
+    st.caption(f"{len(added)} added · {len(changed)} changed · {len(removed)} removed")
+
+    action_cols = st.columns([1, 1, 3])
+    if action_cols[0].button("💾 Save changes", key=f"{key_prefix}_save", disabled=not (added or changed or removed), use_container_width=True):
+        if duplicate_ids:
+            st.error(f"IDs must be unique: {', '.join(duplicate_ids)}")
+            return
+        added, changed, removed, errors = utils.save_template_changes(username, type_prefix, original_rows, edited_rows, filename, mission_templates, scheduler.load_rules())
+        if errors:
+            for error in errors:
+                st.error(error)
+            return
+        st.success(f"Saved {len(added) + len(changed) + len(removed)} {type_label} template change(s) in one write.")
+        del st.session_state[base_key]
+        st.session_state[editor_version_key] = st.session_state.get(editor_version_key, 0) + 1
+        time.sleep(1)
+        st.rerun()
+    if action_cols[1].button("↩️ Discard", key=f"{key_prefix}_discard", use_container_width=True):
+        del st.session_state[base_key]
+        st.session_state[editor_version_key] = st.session_state.get(editor_version_key, 0) + 1
+        st.rerun()
+
+
 def manage_kid_view(user_timezone):
     tab_list = [
     "🗝️ History",
@@ -108,111 +506,12 @@ def manage_kid_view(user_timezone):
             # Ensure we have the user's username and timezone
             if not username:
                 st.warning("Cannot display history: User information not found.")
-            # Ensure the timezone variable exists and is not empty
-            elif not user_timezone:
-                st.warning(f"Cannot display history in local time for user '{username}': User timezone not set.")
-                user_timezone = "UTC"
-                st.info("Displaying timestamps in UTC.")
             else:
-                try:
-                    # Construct the path to the user's history file
-                    safe_filename = f"{username}_history.json"
-                    history_file_path = HISTORY_FOLDER / safe_filename
-
-                    # Check if the history file exists
-                    if history_file_path.is_file():
-                        # Read the content of the history file
-                        with open(history_file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-
-                        # Check if the file is empty before trying to parse JSON
-                        if not content:
-                            st.info("No history events recorded yet.")
-                        else:
-                            # Parse the JSON data
-                            history_data = json.loads(content)
-
-                            # Check if the loaded data is a list (expected format)
-                            if not isinstance(history_data, list):
-                                st.error("History file format is incorrect. Expected a list of events.")
-                                print(f"Error: History file {history_file_path} is not a list.") # Server log
-                            # Check if the list is empty
-                            elif not history_data:
-                                st.info("No history events recorded yet.")
-                            else:
-                                # --- Convert to Pandas DataFrame ---
-                                df_history = pd.DataFrame(history_data)
-
-                                # --- Data Cleaning and Formatting ---
-
-                                # Check if 'timestamp' column exists before processing
-                                if 'timestamp' in df_history.columns:
-
-                                    # 1. Convert timestamp string to datetime objects (make them UTC aware)
-                                    #    errors='coerce' turns unparseable strings/None into NaT (Not a Time)
-                                    #    utc=True ensures they are treated as UTC if no offset was present (though yours have it)
-                                    df_history['timestamp'] = pd.to_datetime(df_history['timestamp'], errors='coerce', utc=True)
-
-                                    # --- *** ADD TIMEZONE CONVERSION HERE *** ---
-                                    try:
-                                        # 2. Convert the UTC datetime objects to the user's local timezone
-                                        #    This operation only works on valid datetime objects (not NaT)
-                                        #    Use .loc to avoid SettingWithCopyWarning if df_history is a slice
-                                        valid_timestamps = df_history['timestamp'].notna()
-                                        df_history.loc[valid_timestamps, 'timestamp'] = df_history.loc[valid_timestamps, 'timestamp'].dt.tz_convert(user_timezone)
-                                        # Now the 'timestamp' column holds timezone-aware datetimes localized to user_timezone
-
-                                    except Exception as tz_error:
-                                        st.error(f"Could not convert timestamps to timezone '{user_timezone}'. Displaying in UTC. Error: {tz_error}")
-                                        print(f"Timezone conversion error for user {username}, tz {user_timezone}: {tz_error}")
-                                        # If conversion fails, timestamps remain UTC (from pd.to_datetime)
-
-
-                                    # 3. Sort by timestamp (most recent first). NaT values will be sorted last.
-                                    df_history = df_history.sort_values(by='timestamp', ascending=False, na_position='last')
-
-                                    # 4. Select and reorder columns for display
-                                    display_columns = ['timestamp', 'event_type', 'message', 'affected_item', 'user']
-                                    existing_columns = [col for col in display_columns if col in df_history.columns]
-                                    df_display = df_history[existing_columns].copy() # Create a copy for display modification
-                                    
-                                    if 'timestamp' in df_display.columns:
-                                        df_display['timestamp'] = df_display['timestamp'].dt.strftime('%d/%m/%y %H:%M:%S')
-                                        df_display['timestamp'] = df_display['timestamp'].fillna("N/A")
-
-
-                                    # --- Display the DataFrame ---
-                                    st.dataframe(
-                                        df_display,
-                                        use_container_width=True, # Make table use full tab width
-                                        hide_index=True # Hide the default numerical index
-                                    )
-                                else:
-                                    # Handle case where 'timestamp' column is missing entirely
-                                    st.warning("History data is missing the 'timestamp' column.")
-                                    # Display remaining data if useful
-                                    df_display = df_history[[col for col in df_history.columns if col != 'timestamp']]
-                                    if not df_display.empty:
-                                        st.dataframe(df_display, use_container_width=True, hide_index=True)
-
-
-                    else:
-                        # File doesn't exist for this user
-                        st.info(f"No history found for user '{username}'.") # Use username variable
-
-                except json.JSONDecodeError:
-                    st.error("Failed to read history file: Invalid format.")
-                    print(f"Error: JSONDecodeError reading {history_file_path}") # Server log
-                except FileNotFoundError:
-                    # This case is handled by the is_file() check above, but good practice
-                    st.info(f"No history found for user '{username}'.") # Use username variable
-                except OSError as e:
-                    st.error(f"An error occurred while accessing history file: {e}")
-                    print(f"Error: OSError accessing {history_file_path}: {e}") # Server log
-                except Exception as e:
-                    st.error(f"An unexpected error occurred while displaying history: {e}")
-                    # Use username in server log for clarity
-                    print(f"Error: Unexpected error displaying history for {username}: {e}") # Server log
+                if not user_timezone:
+                    st.warning(f"Cannot display history in local time for user '{username}': User timezone not set.")
+                    user_timezone = "UTC"
+                    st.info("Displaying timestamps in UTC.")
+                show_history(username, user_timezone, key_prefix="kid_history")
     
     with tab2:
         st.header("Hey, how'd you build this? 🤔")
@@ -357,13 +656,11 @@ def manage_parental_view(user_timezone):
         st.header("📝 Standalone Task Form")
         st.caption("Define individual tasks.")
 
-        # Display existing tasks (optional enhancement)
-        with st.expander("View Existing Task Templates"):
-            if not task_templates:
-                st.info("No standalone task templates defined yet.")
-            else:
-                for task_id, task_data in task_templates.items():
-                    st.write(f"**{task_data.get('name','')}** ({task_data.get('points',0)} pts): {task_data.get('emoji','')} {task_data.get('description','')}")
+        # An expander runs its body even while collapsed, so a toggle keeps the browser lazy
+        if st.toggle("View Existing Task Templates", key="task_browser_open"):
+            show_template_browser("task", task_templates, "task", key_prefix="task_browser")
+        if st.toggle("Bulk edit task templates", key="task_bulk_edit_open"):
+            show_bulk_template_editor("task", task_templates, TASKS_TEMPLATE_FILE, "task", key_prefix="task_bulk_edit")
 
         st.divider()
         st.subheader("Create New Task Template")
@@ -419,22 +716,12 @@ def manage_parental_view(user_timezone):
         st.header("⚔️ Quest Form")
         st.caption("Define quests composed of multiple steps (tasks defined within).")
 
-        with st.expander("View Existing Quest Templates"):
-            if not quest_templates:
-                st.info("No quest templates defined yet.")
-            else:
-                for quest_id, quest_data in quest_templates.items():
-                    col1, col2 = st.columns([3,1])
-                    with col1:
-                        st.write(f"**{quest_data.get('name','')}** ({quest_data.get('quest_combined_points','')} pts): {quest_data.get('emoji','')} {quest_data.get('description','')}")
-                        with col2:
-                            if st.checkbox ("See details", key=quest_id):
-                                with col1:
-                                    tasks = quest_data.get('tasks',[])
-                                    for task in tasks:
-                                        st.write(f"- {task.get('emoji','')} **{task.get('name','')}** ({task.get('points','')} pts): - {task.get('description','')}")
-                                    st.badge(f"**Completion points: {quest_data.get('completion_bonus_points')}**", color="blue")
-                    # Add delete button functionality here later if needed
+        # An expander runs its body even while collapsed, so a toggle keeps the browser lazy
+        if st.toggle("View Existing Quest Templates", key="quest_browser_open"):
+            show_template_browser("quest", quest_templates, "quest", key_prefix="quest_browser")
+        if st.toggle("Bulk edit quest templates", key="quest_bulk_edit_open"):
+            show_bulk_template_editor("quest", quest_templates, QUESTS_TEMPLATE_FILE, "quest", key_prefix="quest_bulk_edit")
+            st.caption("Quest steps are edited in the quest form; the combined points are recalculated when the bonus changes.")
 
         st.divider()
         st.subheader("Create New Quest Template") # Changed subheader slightly
@@ -553,43 +840,9 @@ def manage_parental_view(user_timezone):
         st.header("🗺️ Mission Templates")
         st.write("Define large goals containing Quests and/or standalone Tasks.")
 
-        with st.expander("View Existing Mission Templates"):
-            if not mission_templates:
-                st.info("No mission templates defined yet.")
-            else:
-                for mission_id, mission_data in mission_templates.items():
-                        col1, col2 = st.columns([3,1])
-                        quest_column, task_column = st.columns([3,3])
-                        with col1:
-                            rewards = mission_data.get('completion_reward', {})
-                            st.write(f"**{mission_data.get('name','')}** ({mission_data.get('mission_combined_points', '')} pts): {mission_data.get('emoji','')} {mission_data.get('description','')}")
-                            quests_in_mission = mission_data.get('contains_quests', [])
-                            tasks_in_mission = mission_data.get('contains_tasks', [])
-                            with col2:
-                                if st.checkbox("See details", key=mission_id):
-                                    with quest_column:
-                                        if quests_in_mission:
-                                            st.write("**Quests in this missions:**")
-                                            for quest_id in quests_in_mission:
-                                                quest_info = quest_templates.get(quest_id)
-                                                if quest_info:
-                                                    st.write(f"- {quest_info.get('name','')} ({quest_info.get('quest_combined_points', '')} pts)")
-                                                    st.write(f"- - {quest_info.get('description','')}")
-                                                else:
-                                                    st.warning(f"Quest ID {quest_id} not found in quest templates. This error should never exist - tell Andrew immeditely. lol")
-                                        else:
-                                            st.write("**This mission contains no quests**")
-                                        st.badge(f"Completion points: {rewards.get('points')}",)
-                                    with task_column:        
-                                        if tasks_in_mission:
-                                            st.write("**Standalone Tasks in this Mission**")
-                                            for task_id in tasks_in_mission:
-                                                task_info = task_templates.get(task_id)
-                                                if task_info:
-                                                        st.write(f"- {task_info.get('name','')} ({task_info.get('points', '')} pts)")
-                                                        st.write(f"- - {task_info.get('description','')}")
-                                                else:
-                                                    st.write(f"No standalone tasks in this mission")
+        # An expander runs its body even while collapsed, so a toggle keeps the browser lazy
+        if st.toggle("View Existing Mission Templates", key="mission_browser_open"):
+            show_template_browser("mission", mission_templates, "mission", key_prefix="mission_browser")
 
         st.divider()
         st.subheader("Create New Mission Template")
@@ -769,9 +1022,25 @@ def manage_parental_view(user_timezone):
             new_reward_image = st.text_input("Place the URL to the image here!", placeholder="https://picsum.photos/200/300")
             st.caption('''Why can't you upload a photo? Because image hosting is expensive and there are a trillion images on the internet which you can use that are already hosted. 😅 AI generate one and upload it to an image hosting site if you really want a custom image.''')
             submitted_reward = st.form_submit_button("Save Reward")
-    
+            if submitted_reward:
+                try:
+                    rewards.save_reward(new_reward_id, new_reward_name, new_reward_description, new_reward_points, new_reward_image, username)
+                    st.success(f"Reward '{new_reward_name}' saved!")
+                except ValueError as e:
+                    st.error(str(e))
+                except OSError as e:
+                    st.error(f"Could not save the reward: {e}")
+                    print(f"Error: Could not save reward {new_reward_id}: {e}") # Server log
+
+        reward_catalog = rewards.load_catalog()
+        with st.expander(f"View Existing Rewards ({len(reward_catalog)})"):
+            if not reward_catalog:
+                st.info("No rewards defined yet.")
+            for reward_id, reward in rewards.affordable(float('inf')):
+                st.write(f"**{reward['name']}** ({reward['points']:,} pts): {reward.get('description', '')}")
+
     with tab5:
-        st.header("🎯 Assign Activities to Your Child")
+        st.header("🎯 Assign Activities to Your Children")
 
         # --- Get Parent's Children ---
         try:
@@ -792,137 +1061,125 @@ def manage_parental_view(user_timezone):
             if not kid_display_names:
                 st.warning("Assigned children not found in user configuration.")
             else:
-                selected_kid_display_name = st.selectbox(
-                    "1. Select Your Child:",
-                    options=[""] + list(kid_display_names.values()),
-                    key="assign_select_child"
+                selected_kid_usernames = st.multiselect(
+                    "1. Select Your Children:",
+                    options=list(kid_display_names),
+                    format_func=kid_display_names.get,
+                    key="assign_select_children"
                 )
-                selected_kid_username = None
-                for un, display_name in kid_display_names.items():
-                    if display_name == selected_kid_display_name:
-                        selected_kid_username = un
-                        break
-
-                if selected_kid_username: # Only proceed if a child is selected
-                    # --- Activity Type Selection ---
-                    assign_type = st.radio(
-                        "2. Select Type to Assign:",
-                        ["Standalone Task", "Quest", "Mission"],
-                        horizontal=True,
-                        key="assign_type_radio"
-                    )
-
-                    # --- Template Selection (Conditional) ---
-                    selected_template_id = None
-                    template_options = {}
 
-                    if assign_type == "Standalone Task":
-                        if not task_templates:
-                            st.warning("No standalone task templates have been created yet.")
-                        else:
-                            template_options = {tid: f"{tdata.get('emoji','')} {tdata.get('name', tid)} ({tdata.get('points', tid)} pts) - {tdata.get('description', tid)} ({tid})" for tid, tdata in task_templates.items()}
-                            selected_template_display = st.selectbox(
-                                f"3. Select {assign_type}:",
-                                options=[""] + list(template_options.values()),
-                                key="assign_select_task"
-                            )
-                            for tid, display in template_options.items():
-                                if display == selected_template_display:
-                                    selected_template_id = tid
-                                    break
-
-                    elif assign_type == "Quest":
-                        if not quest_templates:
-                            st.warning("No quest templates have been created yet.")
-                        else:
-                            template_options = {qid: f"{qdata.get('emoji','')} {qdata.get('name', qid)} ({qdata.get('quest_combined_points', qid)} pts) - {qdata.get('description', qid)} ({qid})" for qid, qdata in quest_templates.items()}
-                            selected_template_display = st.selectbox(
-                                f"3. Select {assign_type}:",
-                                options=[""] + list(template_options.values()),
-                                key="assign_select_quest"
-                            )
-                            for qid, display in template_options.items():
-                                if display == selected_template_display:
-                                    selected_template_id = qid
-                                    break
-
-                    elif assign_type == "Mission":
-                        if not mission_templates:
-                            st.warning("No mission templates have been created yet.")
-                        else:
-                            template_options = {mid: f"{mdata.get('emoji','')} {mdata.get('name', mid)} ({mdata.get('mission_combined_points', mid)} pts) - {mdata.get('description', mid)} ({mid})" for mid, mdata in mission_templates.items()}
-                            selected_template_display = st.selectbox(
-                                f"3. Select {assign_type}:",
-                                options=[""] + list(template_options.values()),
-                                key="assign_select_mission"
-                            )
-                            for mid, display in template_options.items():
-                                if display == selected_template_display:
-                                    selected_template_id = mid
-                                    break
-
-                    # --- Assign Button ---
+                # --- Template Selection (any mix of tasks, quests and missions) ---
+                st.write("2. Select Activities:")
+                template_sources = [
+                    ("Standalone Task", "standalone", task_templates),
+                    ("Quest", "quest", quest_templates),
+                    ("Mission", "mission", mission_templates),
+                ]
+                selected_templates = []
+                type_cols = st.columns(len(template_sources))
+                for col, (assign_type, type_prefix, templates) in zip(type_cols, template_sources):
+                    with col:
+                        if not templates:
+                            st.caption(f"No {assign_type.lower()} templates have been created yet.")
+                            continue
+                        # Only the top matches are offered; earlier picks stay selected while searching
+                        search_query = st.text_input(f"🔎 Search {assign_type.lower()}s", key=f"assign_search_{type_prefix}s")
+                        matching_ids, match_count = template_search.search(type_prefix, search_query, templates)
+                        already_selected = st.session_state.get(f"assign_select_{type_prefix}s", [])
+                        options = list(dict.fromkeys(already_selected + [(type_prefix, template_id) for template_id in matching_ids]))
+                        selected_templates += st.multiselect(
+                            f"{assign_type}s",
+                            options=options,
+                            format_func=lambda option: template_search.label_for(*option),
+                            key=f"assign_select_{type_prefix}s"
+                        )
+                        if match_count > len(matching_ids):
+                            st.caption(f"Showing the top {len(matching_ids)} of {match_count:,} - type to narrow it down.")
+
+                # --- Repeat ---
+                repeat = st.radio(
+                    "3. Repeat:",
+                    ["Just once", "Every day", "Every weekday", "Every week"],
+                    horizontal=True,
+                    key="assign_repeat",
+                    help="Repeating activities are assigned automatically each day they are due, in each child's own timezone."
+                )
+                repeat_weekday = None
+                if repeat == "Every week":
+                    repeat_weekday = st.selectbox(
+                        "On", options=range(7), format_func=lambda day: scheduler.WEEKDAY_NAMES[day], key="assign_repeat_weekday"
+                    )
+                if repeat != "Just once":
                     st.divider()
-                    if st.button("Assign Activity", key="assign_button", disabled=(not selected_template_id)):
-                        if selected_kid_username and selected_template_id and assign_type:
-                            # Generate assignment ID
-                            type_prefix = assign_type.split()[0].lower() # task, quest, or mission
-                            assignment_id = utils.generate_assignment_id(f"{type_prefix}_{selected_template_id}")
-
-                            # Prepare base assignment data
-                            new_assignment_data = {
-                                "type": type_prefix,
-                                "template_id": selected_template_id,
-                                "assigned_by": username, # Logged-in parent username
-                                "assigned_on": datetime.now().isoformat(),
-                                "status": "pending_acceptance"
-                            }
-
-                            # Add type-specific data (task_status for quests)
-                            if type_prefix == "quest":
-                                quest_template_tasks = quest_templates.get(selected_template_id, {}).get('tasks', [])
-                                new_assignment_data["task_status"] = {
-                                    task['id']: "pending" for task in quest_template_tasks if 'id' in task
-                                }
-                            elif type_prefix == "mission":
-                                # For missions, initially no instances needed, just link the template
-                                new_assignment_data["quest_instances"] = {}
-                                new_assignment_data["task_instances"] = {}
-
-
-                            # --- Save the Assignment ---
-                            # Load fresh data just before saving
-                            current_assignments = utils.load_assignments(ASSIGNED_QUESTS_FILE)
-                            if current_assignments is None:
-                                st.error("Failed to load current assignments before saving.")
-                            else:
-                                # Ensure kid key exists
-                                if selected_kid_username not in current_assignments:
-                                    current_assignments[selected_kid_username] = {}
-
-                                # Add the new assignment
-                                current_assignments[selected_kid_username][assignment_id] = new_assignment_data
-
-                                # Attempt to save
-                                try:
-                                    utils.save_assignments(current_assignments, ASSIGNED_QUESTS_FILE)
-                                    print("DEBUG SAVED ASSIGNMENT")
-                                    st.session_state['assigned_quests'] = current_assignments # Update session state
-                                    print("SAVE NEW SESSION STATE")
-                                    utils.log_into_history(event_type=f"{type_prefix}_assigned", message=(f"{username} assigned new {type_prefix} to {selected_kid_username}"), affected_item=selected_template_id, username=username)
-                                    print("DEBUG: logged event")
-                                    st.success(f"{assign_type} '{template_options.get(selected_template_id, selected_template_id)}' assigned to {selected_kid_display_name} for acceptance!")
-                                    print("DEBUG: NOW WAIT...")
-                                    time.sleep(2)
-                                    st.rerun()
-                                except Exception as e:
-                                    st.error(f"Failed to create history file: {e}")
-                                    print("THERE'S AN EXCEPTION")
-                                    st.error("Failed to save assignment - please screenshot this and send it to Andrew.")
-                                    st.stop()
-
-                        else:
-                            st.warning("Please ensure a child and an activity template are selected.")
+                    if st.button("Start Repeating", key="assign_recurring_button", disabled=not (selected_kid_usernames and selected_templates)):
+                        frequency = {"Every day": "daily", "Every weekday": "weekdays", "Every week": "weekly"}[repeat]
+                        scheduler.add_rules(username, selected_kid_usernames, selected_templates, frequency, repeat_weekday)
+                        created_today = scheduler.tick() # Today's occurrences show up right away
+                        st.success(f"Saved {len(selected_kid_usernames) * len(selected_templates)} repeating activities ({created_today} assigned today).")
+                        time.sleep(2)
+                        st.rerun()
+
+                # --- Quantities ---
+                selections = []
+                if selected_templates and repeat == "Just once":
+                    st.write("4. How many of each?")
+                    quantity_cols = st.columns(min(len(selected_templates), 4))
+                    for i, (type_prefix, template_id) in enumerate(selected_templates):
+                        quantity = quantity_cols[i % len(quantity_cols)].number_input(
+                            template_search.label_for(type_prefix, template_id),
+                            min_value=1, max_value=20, value=1, step=1,
+                            key=f"assign_quantity_{type_prefix}_{template_id}"
+                        )
+                        selections.append((type_prefix, template_id, int(quantity)))
+
+                # --- Optional Due Date (in the parent's timezone) ---
+                due_on = None
+                if selections and st.checkbox("Set a due date", key="assign_has_due_date"):
+                    due_cols = st.columns(2)
+                    due_date = due_cols[0].date_input("Due date", key="assign_due_date")
+                    due_time = due_cols[1].time_input("Due time", value=datetime.strptime("20:00", "%H:%M").time(), key="assign_due_time")
+                    due_on = datetime.combine(due_date, due_time, tzinfo=history.get_zone(user_timezone or "UTC")).isoformat()
+
+                # --- Assign Button ---
+                total_assignments = len(selected_kid_usernames) * sum(quantity for _, _, quantity in selections)
+                if repeat == "Just once":
+                    st.divider()
+                if repeat == "Just once" and st.button(
+                    f"Assign {total_assignments} Activit{'y' if total_assignments == 1 else 'ies'}",
+                    key="assign_button",
+                    disabled=not total_assignments
+                ):
+                    # The whole batch is built in memory and saved with one write
+                    created = utils.assign_templates(
+                        username, selected_kid_usernames, selections, quest_templates, ASSIGNED_QUESTS_FILE, due_on
+                    )
+                    if created is None:
+                        st.error("Failed to save assignments - please screenshot this and send it to Andrew.")
+                    else:
+                        assigned_names = ", ".join(kid_display_names[kid_un] for kid_un in created)
+                        st.success(f"Assigned {total_assignments} activities to {assigned_names} for acceptance!")
+                        time.sleep(2)
+                        st.rerun()
+
+                # --- Existing repeating activities ---
+                family_rules = {
+                    rule_id: rule for rule_id, rule in scheduler.load_rules().items()
+                    if rule.get("kid") in kid_display_names
+                }
+                with st.expander(f"🔁 Repeating activities ({len(family_rules)})"):
+                    if not family_rules:
+                        st.caption("Nothing repeats yet.")
+                    template_lookup = {"task": task_templates, "standalone": task_templates, "quest": quest_templates, "mission": mission_templates}
+                    for rule_id, rule in family_rules.items():
+                        template = template_lookup.get(rule["type"], {}).get(rule["template_id"], {})
+                        rule_cols = st.columns([6, 1])
+                        rule_cols[0].write(
+                            f"{template.get('emoji', '')} {template.get('name', rule['template_id'])} → "
+                            f"{kid_display_names[rule['kid']]} · {scheduler.describe(rule)}"
+                        )
+                        if rule_cols[1].button("Stop", key=f"stop_rule_{rule_id}", use_container_width=True):
+                            scheduler.remove_rule(rule_id)
+                            st.rerun()
     
     with tab6:
         if st.session_state.get('role'):
@@ -931,113 +1188,21 @@ def manage_parental_view(user_timezone):
             # Ensure we have the user's username and timezone
             if not username:
                 st.warning("Cannot display history: User information not found.")
-            # Ensure the timezone variable exists and is not empty
-            elif not user_timezone:
-                st.warning(f"Cannot display history in local time for user '{username}': User timezone not set.")
-                # Decide how to proceed: Display in UTC? Show an error?
-                # Here we'll default to UTC if not set, or you could stop.
-                user_timezone = "UTC" # Fallback or handle error differently
-                st.info("Displaying timestamps in UTC.")
             else:
-                try:
-                    # Construct the path to the user's history file
-                    safe_filename = f"{username}_history.json"
-                    history_file_path = HISTORY_FOLDER / safe_filename
-
-                    # Check if the history file exists
-                    if history_file_path.is_file():
-                        # Read the content of the history file
-                        with open(history_file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-
-                        # Check if the file is empty before trying to parse JSON
-                        if not content:
-                            st.info("No history events recorded yet.")
-                        else:
-                            # Parse the JSON data
-                            history_data = json.loads(content)
-
-                            # Check if the loaded data is a list (expected format)
-                            if not isinstance(history_data, list):
-                                st.error("History file format is incorrect. Expected a list of events.")
-                                print(f"Error: History file {history_file_path} is not a list.") # Server log
-                            # Check if the list is empty
-                            elif not history_data:
-                                st.info("No history events recorded yet.")
-                            else:
-                                # --- Convert to Pandas DataFrame ---
-                                df_history = pd.DataFrame(history_data)
-
-                                # --- Data Cleaning and Formatting ---
-
-                                # Check if 'timestamp' column exists before processing
-                                if 'timestamp' in df_history.columns:
-
-                                    # 1. Convert timestamp string to datetime objects (make them UTC aware)
-                                    #    errors='coerce' turns unparseable strings/None into NaT (Not a Time)
-                                    #    utc=True ensures they are treated as UTC if no offset was present (though yours have it)
-                                    df_history['timestamp'] = pd.to_datetime(df_history['timestamp'], errors='coerce', utc=True)
-
-                                    # --- *** ADD TIMEZONE CONVERSION HERE *** ---
-                                    try:
-                                        # 2. Convert the UTC datetime objects to the user's local timezone
-                                        #    This operation only works on valid datetime objects (not NaT)
-                                        #    Use .loc to avoid SettingWithCopyWarning if df_history is a slice
-                                        valid_timestamps = df_history['timestamp'].notna()
-                                        df_history.loc[valid_timestamps, 'timestamp'] = df_history.loc[valid_timestamps, 'timestamp'].dt.tz_convert(user_timezone)
-                                        # Now the 'timestamp' column holds timezone-aware datetimes localized to user_timezone
-
-                                    except Exception as tz_error:
-                                        st.error(f"Could not convert timestamps to timezone '{user_timezone}'. Displaying in UTC. Error: {tz_error}")
-                                        print(f"Timezone conversion error for user {username}, tz {user_timezone}: {tz_error}")
-                                        # If conversion fails, timestamps remain UTC (from pd.to_datetime)
-
-
-                                    # 3. Sort by timestamp (most recent first). NaT values will be sorted last.
-                                    df_history = df_history.sort_values(by='timestamp', ascending=False, na_position='last')
-
-                                    # 4. Select and reorder columns for display
-                                    display_columns = ['timestamp', 'event_type', 'message', 'affected_item', 'user']
-                                    existing_columns = [col for col in display_columns if col in df_history.columns]
-                                    df_display = df_history[existing_columns].copy() # Create a copy for display modification
-                                    
-                                    if 'timestamp' in df_display.columns:
-                                        df_display['timestamp'] = df_display['timestamp'].dt.strftime('%d/%m/%y %H:%M:%S')
-                                        df_display['timestamp'] = df_display['timestamp'].fillna("N/A")
-
-
-                                    # --- Display the DataFrame ---
-                                    st.dataframe(
-                                        df_display,
-                                        use_container_width=True, # Make table use full tab width
-                                        hide_index=True # Hide the default numerical index
-                                    )
-                                else:
-                                    # Handle case where 'timestamp' column is missing entirely
-                                    st.warning("History data is missing the 'timestamp' column.")
-                                    # Display remaining data if useful
-                                    df_display = df_history[[col for col in df_history.columns if col != 'timestamp']]
-                                    if not df_display.empty:
-                                        st.dataframe(df_display, use_container_width=True, hide_index=True)
-
-
-                    else:
-                        # File doesn't exist for this user
-                        st.info(f"No history found for user '{username}'.") # Use username variable
-
-                except json.JSONDecodeError:
-                    st.error("Failed to read history file: Invalid format.")
-                    print(f"Error: JSONDecodeError reading {history_file_path}") # Server log
-                except FileNotFoundError:
-                    # This case is handled by the is_file() check above, but good practice
-                    st.info(f"No history found for user '{username}'.") # Use username variable
-                except OSError as e:
-                    st.error(f"An error occurred while accessing history file: {e}")
-                    print(f"Error: OSError accessing {history_file_path}: {e}") # Server log
-                except Exception as e:
-                    st.error(f"An unexpected error occurred while displaying history: {e}")
-                    # Use username in server log for clarity
-                    print(f"Error: Unexpected error displaying history for {username}: {e}") # Server log
+                if not user_timezone:
+                    st.warning(f"Cannot display history in local time for user '{username}': User timezone not set.")
+                    user_timezone = "UTC" # Fallback to UTC if not set
+                    st.info("Displaying timestamps in UTC.")
+                family_members = [username] + user_config_details.get('children', [])
+                history_scope = st.radio("Show", ["My history", "Family feed", "Assignment timeline", "Monthly activity"], horizontal=True, key="parent_history_scope")
+                if history_scope == "Family feed":
+                    show_family_feed(family_members, user_timezone, key_prefix="family_feed")
+                elif history_scope == "Assignment timeline":
+                    show_assignment_timeline(family_members[1:], user_timezone)
+                elif history_scope == "Monthly activity":
+                    show_monthly_activity(family_members[1:])
+                else:
+                    show_history(username, user_timezone, key_prefix="parent_history")
 
 
 
@@ -1111,6 +1276,28 @@ def manage_parental_view(user_timezone):
                     else:
                         st.info("No changes made to timezone.")
 
+                # --- Acceptance Window Setting ---
+                st.divider()
+                st.markdown("#### Acceptance window")
+                current_window = deadlines.acceptance_window_days(username)
+                new_window = st.number_input(
+                    "Days an activity you assign can wait to be accepted before it expires (0 = never):",
+                    min_value=0, max_value=365, value=int(current_window), step=1,
+                    key="acceptance_window_input"
+                )
+                if st.button("Save Acceptance Window", key="save_window_button"):
+                    if new_window != current_window:
+                        latest_config = utils.load_config(CONFIG_PATH)
+                        if latest_config and username in latest_config.get('credentials', {}).get('usernames', {}):
+                            latest_config['credentials']['usernames'][username]['acceptance_window_days'] = int(new_window)
+                            if utils.save_config(CONFIG_PATH, latest_config):
+                                st.success(f"Acceptance window set to {new_window} day(s).")
+                                st.rerun()
+                        else:
+                            st.error("Failed to reload configuration before saving. Please try again.")
+                    else:
+                        st.info("No changes made to the acceptance window.")
+
 # PARENTAL VIEW
 if st.session_state.get('role') == 'parent':
     manage_parental_view(user_timezone)
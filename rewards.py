@@ -0,0 +1,171 @@
+# rewards.py
+#
+# The rewards catalog and point redemptions. Parents add rewards (rewards.json); a kid asks
+# for one, its points are put on hold, and a parent approves (the points are spent) or
+# rejects (the hold is released).
+#
+# points.json keeps counting points earned. What a kid has spent or has on hold lives in
+# redemptions.json next to the redemptions themselves, in the same write:
+#     {"redemptions": {id: {...}}, "totals": {kid: {"held": n, "spent": n}}}
+# so a hold and the balance it is checked against change together. Every change runs under
+# one lock, re-reads points.json, checks earned - held - spent and swaps the whole file in
+# with os.replace, so two requests can never spend the same points and a crash leaves either
+# the old file or the new one. Award code that rewrites points.json cannot undo a hold.
+#
+# The catalog is kept sorted by cost, so "what can I afford" is one bisect on the
+# balance rather than a scan of every reward.
+
+import secrets
+import threading
+from bisect import bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+import history
+import json_store
+
+REWARDS_FILE = Path("rewards.json")
+REDEMPTIONS_FILE = Path("redemptions.json")
+POINTS_FILE = Path("points.json")
+REDEMPTION_STATUSES = ("held", "approved", "rejected")
+
+_rewards_lock = threading.RLock()
+_catalog_cache = {"mtime": None, "catalog": {}, "costs": [], "ids": []}
+
+# --- Catalog ---
+def load_catalog():
+    """{reward_id: {"name", "description", "points", "image", "created_by", "created_on"}}, cached until the file changes."""
+    with _rewards_lock:
+        mtime = REWARDS_FILE.stat().st_mtime_ns if REWARDS_FILE.is_file() else None
+        if _catalog_cache["mtime"] != mtime or mtime is None:
+            catalog = json_store.read_json(REWARDS_FILE, {})
+            by_cost = sorted((reward.get('points', 0), reward_id) for reward_id, reward in catalog.items())
+            _catalog_cache.update(
+                mtime=mtime, catalog=catalog,
+                costs=[cost for cost, _ in by_cost], ids=[reward_id for _, reward_id in by_cost]
+            )
+        return _catalog_cache["catalog"]
+
+def save_reward(reward_id, name, description, points, image, created_by):
+    """Adds a reward to the catalog. Raises ValueError if it is incomplete or the id is taken."""
+    reward_id, name = (reward_id or "").strip(), (name or "").strip()
+    if not reward_id or not name:
+        raise ValueError("Reward ID and name cannot be empty.")
+    if points <= 0:
+        raise ValueError("A reward has to cost at least 1 point.")
+    with _rewards_lock:
+        catalog = dict(load_catalog())
+        if reward_id in catalog:
+            raise ValueError(f"Reward ID '{reward_id}' already exists. Please choose a unique ID.")
+        catalog[reward_id] = {
+            "name": name, "description": description, "points": int(points), "image": image or "",
+            "created_by": created_by, "created_on": datetime.now(timezone.utc).isoformat(),
+        }
+        json_store.write_json(REWARDS_FILE, catalog)
+    history.append_event(created_by, history.new_event("reward_created", f"Reward '{name}' ({points} pts) created", reward_id, created_by))
+
+def affordable(balance):
+    """Rewards costing at most balance, cheapest first, as (reward_id, reward) pairs."""
+    with _rewards_lock:
+        catalog = load_catalog()
+        count = bisect_right(_catalog_cache["costs"], balance)
+        return [(reward_id, catalog[reward_id]) for reward_id in _catalog_cache["ids"][:count]]
+
+def next_goal(balance):
+    """The cheapest reward that costs more than balance, as (reward_id, reward), or None."""
+    with _rewards_lock:
+        catalog = load_catalog()
+        count = bisect_right(_catalog_cache["costs"], balance)
+        if count >= len(_catalog_cache["ids"]):
+            return None
+        reward_id = _catalog_cache["ids"][count]
+        return reward_id, catalog[reward_id]
+
+# --- Balances ---
+def _load_ledger():
+    ledger = json_store.read_json(REDEMPTIONS_FILE, {})
+    ledger.setdefault("redemptions", {})
+    ledger.setdefault("totals", {})
+    return ledger
+
+def _earned(kid):
+    return json_store.read_json(POINTS_FILE, {}).get(kid, 0)
+
+def balance(kid):
+    """{"earned", "held", "spent", "available"} for a kid."""
+    with _rewards_lock:
+        totals = _load_ledger()["totals"].get(kid, {})
+        earned = _earned(kid)
+    held, spent = totals.get("held", 0), totals.get("spent", 0)
+    return {"earned": earned, "held": held, "spent": spent, "available": earned - held - spent}
+
+# --- Redemptions ---
+def request_redemption(kid, reward_id):
+    """
+    Puts the reward's cost on hold for the kid and returns the redemption id.
+    Raises ValueError if the reward does not exist or the kid cannot afford it right now.
+    """
+    with _rewards_lock:
+        reward = load_catalog().get(reward_id)
+        if reward is None:
+            raise ValueError(f"Reward '{reward_id}' no longer exists.")
+        ledger = _load_ledger()
+        totals = ledger["totals"].setdefault(kid, {"held": 0, "spent": 0})
+        available = _earned(kid) - totals["held"] - totals["spent"]
+        if reward["points"] > available:
+            raise ValueError(f"'{reward['name']}' costs {reward['points']:,} points but only {available:,} are available.")
+        redemption_id = f"redeem_{int(datetime.now(timezone.utc).timestamp())}_{secrets.token_hex(3)}"
+        ledger["redemptions"][redemption_id] = {
+            "reward_id": reward_id, "name": reward["name"], "kid": kid, "points": reward["points"],
+            "status": "held", "requested_on": datetime.now(timezone.utc).isoformat(),
+        }
+        totals["held"] += reward["points"]
+        json_store.write_json(REDEMPTIONS_FILE, ledger)
+    history.append_event(kid, history.new_event(
+        "reward_requested", f"Asked for '{reward['name']}' ({reward['points']:,} pts on hold)", redemption_id, kid
+    ))
+    return redemption_id
+
+def decide_redemptions(parent, redemption_ids, approve):
+    """
+    Approves (spends the held points) or rejects (releases them) held redemptions in one
+    write. Redemptions that are no longer held are skipped. Returns the number decided.
+    """
+    decided = []
+    with _rewards_lock:
+        ledger = _load_ledger()
+        for redemption_id in redemption_ids:
+            redemption = ledger["redemptions"].get(redemption_id)
+            if not redemption or redemption["status"] != "held":
+                continue
+            totals = ledger["totals"].setdefault(redemption["kid"], {"held": 0, "spent": 0})
+            totals["held"] -= redemption["points"]
+            if approve:
+                totals["spent"] += redemption["points"]
+            redemption.update(
+                status="approved" if approve else "rejected",
+                decided_by=parent, decided_on=datetime.now(timezone.utc).isoformat()
+            )
+            decided.append((redemption_id, redemption))
+        if decided:
+            json_store.write_json(REDEMPTIONS_FILE, ledger)
+    event_type = "reward_approved" if approve else "reward_rejected"
+    history.append_events(parent, [
+        history.new_event(
+            event_type,
+            f"{'Approved' if approve else 'Rejected'} '{redemption['name']}' for {redemption['kid']} ({redemption['points']:,} pts)",
+            redemption_id, parent
+        )
+        for redemption_id, redemption in decided
+    ])
+    return len(decided)
+
+def redemptions_for(kids, statuses=REDEMPTION_STATUSES):
+    """[(redemption_id, redemption)] for these kids and statuses, newest first."""
+    kids = set(kids)
+    with _rewards_lock:
+        redemptions = _load_ledger()["redemptions"]
+    matches = [
+        (redemption_id, redemption) for redemption_id, redemption in redemptions.items()
+        if redemption["kid"] in kids and redemption["status"] in statuses
+    ]
+    return sorted(matches, key=lambda item: item[1]["requested_on"], reverse=True)
@@ -0,0 +1,185 @@
+# scheduler.py
+#
+# Recurring chores. Parents save recurrence rules (daily, weekdays or weekly) for a
+# template and a child in recurring.json; a background thread wakes up every
+# TICK_SECONDS and, in one pass over every family, materializes the occurrences that are
+# due "today" in each child's own timezone (from config.yaml).
+#
+# Occurrence ids are deterministic (recur_<rule id>_<YYYYMMDD>) and a tick only creates
+# today's occurrence if that id is not in assignments.json, so a tick can run any number of
+# times, or after a restart, without creating the same occurrence twice, and it puts back an
+# occurrence that an overwriting save dropped. Missed days are not back-filled.
+#
+# The thread only uses the Streamlit-free file helpers (utils.read_assignments and
+# utils.write_assignments) and reports problems with print.
+#
+# The same thread runs the deadline sweep (deadlines.py: overdue flags and expiry of
+# unaccepted assignments) and wakes up early when the next deadline comes before the next
+# tick. It also exports newly rotated history segments to the columnar archive
+# (history_archive.py).
+
+import secrets
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+import yaml
+import deadlines
+import history
+import history_archive
+import json_store
+import utils
+
+RULES_FILE = Path("recurring.json")
+CONFIG_FILE = 'config.yaml'
+ASSIGNMENTS_FILE = 'assignments.json'
+QUESTS_TEMPLATE_FILE = 'quests.json'
+TICK_SECONDS = 300
+FREQUENCIES = ["daily", "weekdays", "weekly"]
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+_rules_lock = threading.Lock()
+_tick_lock = threading.Lock()
+
+# --- Rules ---
+def load_rules():
+    """{rule_id: rule}. A rule is {"kid", "type", "template_id", "frequency", "weekday", "created_by", "created_on", "last_date"}."""
+    return json_store.read_json(RULES_FILE, {})
+
+def _save_rules(rules):
+    json_store.write_json(RULES_FILE, rules)
+
+def add_rules(parent_username, kid_usernames, selections, frequency, weekday=None):
+    """
+    Saves one rule per (kid, (type_prefix, template_id)) in one write. weekday (0 = Monday) is
+    only used for weekly rules. Returns the new rule ids.
+    """
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Unknown frequency '{frequency}'")
+    with _rules_lock:
+        rules = load_rules()
+        new_ids = []
+        for kid in kid_usernames:
+            for type_prefix, template_id in selections:
+                rule_id = secrets.token_hex(4)
+                rules[rule_id] = {
+                    "kid": kid, "type": type_prefix, "template_id": template_id,
+                    "frequency": frequency, "weekday": weekday if frequency == "weekly" else None,
+                    "created_by": parent_username, "created_on": datetime.now(timezone.utc).isoformat(),
+                    "last_date": None,
+                }
+                new_ids.append(rule_id)
+        _save_rules(rules)
+    return new_ids
+
+def remove_rule(rule_id):
+    """Stops a rule. Occurrences it already created are left alone."""
+    with _rules_lock:
+        rules = load_rules()
+        if rules.pop(rule_id, None) is not None:
+            _save_rules(rules)
+
+def is_due(rule, local_date):
+    frequency = rule.get("frequency")
+    if frequency == "daily":
+        return True
+    if frequency == "weekdays":
+        return local_date.weekday() < 5
+    if frequency == "weekly":
+        return local_date.weekday() == rule.get("weekday")
+    return False
+
+def occurrence_id(rule_id, local_date):
+    return f"recur_{rule_id}_{local_date:%Y%m%d}"
+
+def describe(rule):
+    if rule.get("frequency") == "weekly":
+        return f"Every {WEEKDAY_NAMES[rule.get('weekday') or 0]}"
+    return "Every weekday" if rule.get("frequency") == "weekdays" else "Every day"
+
+# --- Materializing ---
+def _load_timezones():
+    try:
+        with open(CONFIG_FILE, encoding='utf-8') as f:
+            config = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        print(f"Warning: Scheduler could not read {CONFIG_FILE}, using UTC: {e}")
+        return {}
+    users = config.get('credentials', {}).get('usernames', {}) or {}
+    return {user: data.get('timezone') or "UTC" for user, data in users.items() if isinstance(data, dict)}
+
+def tick(now=None):
+    """
+    One pass over every rule: creates the occurrences due today (in each kid's timezone) that
+    do not exist yet, saves assignments and rules once, and logs one history append per parent.
+    Returns the number of occurrences created.
+    """
+    now = now or datetime.now(timezone.utc)
+    with _tick_lock, _rules_lock, utils.assignments_lock: # The same lock page writers hold
+        rules = load_rules()
+        if not rules:
+            return 0
+        timezones = _load_timezones()
+        quest_templates = json_store.read_json(QUESTS_TEMPLATE_FILE, {})
+        assignments = utils.read_assignments(ASSIGNMENTS_FILE)
+        if assignments is None:
+            print("Warning: Scheduler could not load assignments; skipping this tick.")
+            return 0
+
+        events_by_parent = {}
+        touched_rules = []
+        for rule_id, rule in rules.items():
+            local_date = now.astimezone(history.get_zone(timezones.get(rule["kid"], "UTC"))).date()
+            if not is_due(rule, local_date):
+                continue
+            if rule.get("last_date") != local_date.isoformat():
+                touched_rules.append((rule, local_date.isoformat()))
+            assignment_id = occurrence_id(rule_id, local_date)
+            if assignment_id in assignments.get(rule["kid"], {}):
+                continue # The saved assignments decide, not last_date
+            type_prefix = "standalone" if rule["type"] == "task" else rule["type"] # Rules saved before the fix used "task"
+            assignment = utils.new_assignment_data(type_prefix, rule["template_id"], rule["created_by"], quest_templates)
+            assignment["recurrence_id"] = rule_id
+            assignment["occurrence_date"] = local_date.isoformat()
+            assignments.setdefault(rule["kid"], {})[assignment_id] = assignment
+            events_by_parent.setdefault(rule["created_by"], []).append(history.new_event(
+                f"{type_prefix}_assigned",
+                f"Recurring {type_prefix} '{rule['template_id']}' assigned to {rule['kid']} for {local_date:%A %d %B}",
+                assignment_id, rule["created_by"]
+            ))
+
+        created = sum(len(events) for events in events_by_parent.values())
+        if created:
+            try:
+                utils.write_assignments(assignments, ASSIGNMENTS_FILE)
+            except (OSError, TypeError) as e:
+                print(f"Error: Scheduler could not save assignments; will retry next tick: {e}")
+                return 0
+        if touched_rules:
+            for rule, local_date in touched_rules:
+                rule["last_date"] = local_date
+            try:
+                _save_rules(rules)
+            except OSError as e:
+                print(f"Warning: Scheduler could not save {RULES_FILE}: {e}")
+        for parent_username, events in events_by_parent.items():
+            history.append_events(parent_username, events)
+        if created:
+            print(f"Scheduler created {created} recurring assignment(s).")
+        return created
+
+def _run(stop_event):
+    while not stop_event.is_set():
+        for job in (tick, deadlines.sweep, history_archive.export_all):
+            try:
+                job()
+            except Exception as e: # The scheduler must keep running
+                print(f"Error: Scheduler job {job.__name__} failed: {e}")
+        next_deadline = deadlines.seconds_until_next()
+        stop_event.wait(TICK_SECONDS if next_deadline is None else min(TICK_SECONDS, next_deadline + 1))
+
+def start():
+    """Starts the scheduler thread and returns its stop event. Call once per server (see Home.py)."""
+    stop_event = threading.Event()
+    threading.Thread(target=_run, args=(stop_event,), daemon=True, name="chore-scheduler").start()
+    print(f"Chore scheduler started (every {TICK_SECONDS}s).")
+    return stop_event
@@ -0,0 +1,152 @@
+# template_search.py
+#
+# Search-as-you-type over task, quest and mission templates, for the Assign tab pickers
+# and the template browsers in Manage. Each template type has an in-memory index:
+#   - words: token -> {template_id: weight} (name words weigh more than description or id
+#     words), with a sorted vocabulary so a partly typed word is one bisect;
+#   - trigrams: 3-letter slice -> template ids, so "wash" also finds "dishwasher".
+# The index is built the first time a type is searched and after that is only touched for
+# the templates whose name, description, points or emoji changed when templates are saved
+# (utils.bump_templates_version), so a rerun costs a few set lookups instead of walking
+# every template.
+
+import heapq
+import re
+from itertools import islice
+import threading
+from bisect import bisect_left
+import utils
+
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_RESULTS = 25
+MAX_PREFIX_TERMS = 200 # Cap on vocabulary terms one prefix can expand to
+NAME_WEIGHT = 3
+OTHER_WEIGHT = 2
+TRIGRAM_WEIGHT = 1
+POINTS_FIELDS = {"task": "points", "standalone": "points", "quest": "quest_combined_points", "mission": "mission_combined_points"}
+INDEX_TYPES = {"standalone": "task"} # Standalone assignments are picked from the task templates
+
+_search_lock = threading.RLock()
+_indexes = {} # type_prefix -> {"templates", "fingerprints", "labels", "names", "words", "trigrams", "vocabulary"}
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower()) if text else []
+
+def trigrams(text):
+    text = str(text).lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def label(type_prefix, template_id, template):
+    """The picker label for a template: emoji, name and points."""
+    return f"{template.get('emoji', '')} {template.get('name', template_id)} ({template.get(POINTS_FIELDS[type_prefix], 0)} pts)"
+
+def _new_index():
+    return {"templates": {}, "fingerprints": {}, "labels": {}, "names": {}, "words": {}, "trigrams": {}, "vocabulary": None}
+
+def _fingerprint(template):
+    return tuple(str(template.get(field, "")) for field in ("name", "description", "emoji", "points", "quest_combined_points", "mission_combined_points"))
+
+def _template_words(template_id, template):
+    words = {}
+    for word in tokenize(template_id) + tokenize(template.get('description')):
+        words[word] = OTHER_WEIGHT
+    for word in tokenize(template.get('name')):
+        words[word] = NAME_WEIGHT
+    return words
+
+def _template_text(template_id, template):
+    return f"{template.get('name', template_id)} {template.get('description', '')}".lower()
+
+# --- Maintenance ---
+def _remove(index, template_id, template):
+    for word in _template_words(template_id, template):
+        postings = index["words"].get(word, {})
+        postings.pop(template_id, None)
+        if not postings:
+            index["words"].pop(word, None)
+            index["vocabulary"] = None
+    for trigram in trigrams(_template_text(template_id, template)):
+        index["trigrams"].get(trigram, set()).discard(template_id)
+    for field in ("fingerprints", "labels", "names"):
+        index[field].pop(template_id, None)
+
+def _add(index, type_prefix, template_id, template):
+    for word, weight in _template_words(template_id, template).items():
+        if word not in index["words"]:
+            index["vocabulary"] = None
+        index["words"].setdefault(word, {})[template_id] = weight
+    for trigram in trigrams(_template_text(template_id, template)):
+        index["trigrams"].setdefault(trigram, set()).add(template_id)
+    index["fingerprints"][template_id] = _fingerprint(template)
+    index["labels"][template_id] = label(type_prefix, template_id, template)
+    index["names"][template_id] = str(template.get('name', template_id)).lower()
+
+def sync(type_prefix, templates):
+    """Brings one type's index up to date with templates, re-indexing only what changed."""
+    templates = templates or {}
+    with _search_lock:
+        index = _indexes.setdefault(type_prefix, _new_index())
+        stored = index["templates"]
+        for template_id in [tid for tid in stored if tid not in templates]:
+            _remove(index, template_id, stored.pop(template_id))
+        for template_id, template in templates.items():
+            if index["fingerprints"].get(template_id) == _fingerprint(template):
+                continue
+            if template_id in stored:
+                _remove(index, template_id, stored[template_id])
+            stored[template_id] = dict(template)
+            _add(index, type_prefix, template_id, template)
+
+# --- Search ---
+def _token_scores(index, token):
+    """{template_id: best weight} for one query token: whole or partial words, then trigrams."""
+    scores = {}
+    if index["vocabulary"] is None:
+        index["vocabulary"] = sorted(index["words"])
+    vocabulary = index["vocabulary"]
+    start = bisect_left(vocabulary, token)
+    for word in vocabulary[start:start + MAX_PREFIX_TERMS]:
+        if not word.startswith(token):
+            break
+        for template_id, weight in index["words"][word].items():
+            scores[template_id] = max(scores.get(template_id, 0), weight)
+    if len(token) >= 3:
+        candidates = None
+        for trigram in trigrams(token):
+            matches = index["trigrams"].get(trigram, set())
+            candidates = set(matches) if candidates is None else candidates & matches
+            if not candidates:
+                break
+        for template_id in candidates or ():
+            scores.setdefault(template_id, TRIGRAM_WEIGHT)
+    return scores
+
+def search(type_prefix, query, templates, limit=MAX_RESULTS, offset=0):
+    """
+    Returns (template ids best match first, number of matches). Every word has to match;
+    the last one may be partly typed. An empty query lists templates in saved order.
+    offset skips that many results (for paging). templates only builds the index the
+    first time a type is searched.
+    """
+    type_prefix = INDEX_TYPES.get(type_prefix, type_prefix)
+    with _search_lock:
+        if type_prefix not in _indexes:
+            sync(type_prefix, templates)
+        index = _indexes[type_prefix]
+        tokens = tokenize(query)
+        if not tokens:
+            return list(islice(index["templates"], offset, offset + limit)), len(index["templates"])
+        totals = None
+        for token in tokens:
+            scores = _token_scores(index, token)
+            totals = scores if totals is None else {tid: totals[tid] + scores[tid] for tid in totals.keys() & scores.keys()}
+            if not totals:
+                return [], 0
+        best = heapq.nsmallest(offset + limit, totals, key=lambda tid: (-totals[tid], index["names"][tid]))
+        return best[offset:], len(totals)
+
+def label_for(type_prefix, template_id):
+    with _search_lock:
+        return _indexes.get(INDEX_TYPES.get(type_prefix, type_prefix), {}).get("labels", {}).get(template_id, template_id)
+
+utils.on_templates_saved(sync)
@@ -1,8 +1,17 @@
 import streamlit as st
 import json
 import time
+import copy
+import yaml
+import hashlib
+import secrets
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
+import history
+import daily_stats
+import deadlines
+import json_store
 import utils
 
 # --- File Constants (Define them here or pass as arguments) ---
@@ -65,11 +74,11 @@ def show_first_login(role):
     else:
         pass
 
-def check_and_complete_quest_instance(kid_username, assign_id, quest_id, assignments_data, points_data, quest_templates):
+def check_and_complete_quest_instance(kid_username, assign_id, quest_id, assignments_data, points_data, quest_templates, awards):
     """
     Checks if all tasks in a quest instance are done. If so, marks quest instance completed,
     adds bonus points, and returns True. Otherwise returns False.
-    Modifies assignments_data and points_data directly.
+    Modifies assignments_data and points_data directly; the bonus is added to awards (see award_points).
     """
     print(f"Checking quest completion for {kid_username}, assign_id={assign_id}, quest_id={quest_id}")
     # TODO: Implement detailed logic
@@ -95,7 +104,7 @@ def check_and_complete_quest_instance(kid_username, assign_id, quest_id, assignm
               # elif ... : assignments_data[kid_username][mission_assign_id]['quest_instances'][quest_id]['status'] = 'completed'
 
               bonus = quest_templates.get(quest_id, {}).get('completion_bonus_points', 0)
-              points_data[kid_username] = points_data.get(kid_username, 0) + bonus
+              award_points(points_data, kid_username, bonus, 'quest_bonus', awards, quests=1)
               print(f"Quest {quest_id} completed! Awarded {bonus} bonus points.")
               quest_completed = True
     except KeyError as e:
@@ -113,11 +122,11 @@ def first_name(name):
             return full_name[0]
         return ""
 
-def check_and_complete_mission_instance(kid_username, mission_assign_id, assignments_data, points_data, mission_templates, quest_templates, task_templates):
+def check_and_complete_mission_instance(kid_username, mission_assign_id, assignments_data, points_data, mission_templates, quest_templates, task_templates, awards):
     """
     Checks if all components (quest instances, task instances) within a mission are done.
     If so, marks mission completed, adds reward points, and returns True. Otherwise returns False.
-    Modifies assignments_data and points_data directly.
+    Modifies assignments_data and points_data directly; the reward is added to awards (see award_points).
     """
     print(f"Checking mission completion for {kid_username}, mission_assign_id={mission_assign_id}")
     # TODO: Implement detailed logic
@@ -141,7 +150,7 @@ def check_and_complete_mission_instance(kid_username, mission_assign_id, assignm
               mission_template_id = mission_assignment.get('template_id')
               reward = mission_templates.get(mission_template_id, {}).get('completion_reward', {})
               points = reward.get('points', 0)
-              points_data[kid_username] = points_data.get(kid_username, 0) + points
+              award_points(points_data, kid_username, points, 'mission_reward', awards, missions=1)
               print(f"Mission {mission_template_id} completed! Awarded {points} reward points.")
               mission_completed = True
     except KeyError as e:
@@ -212,18 +221,41 @@ def load_points(filename):
         points_data = None
     return points_data
 
-def save_points(data, filename):
-    """Saves points data to the JSON file."""
+def save_points(data, filename, awards=()):
+    """Saves points data to the JSON file. awards (from award_points) reach daily stats only once it is saved."""
     try:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2)
-        return True
     except IOError as e:
         st.error(f"❌ Error saving points to `{filename}`: Check permissions. Details: {e}")
         return False
     except Exception as e:
         st.error(f"❌ An unexpected error occurred saving points: {e}")
         return False
+    record_awards(awards)
+    return True
+
+def user_timezone_name(username):
+    """The user's configured timezone name, or UTC if it is not set."""
+    config = st.session_state.get('config') or {}
+    return config.get('credentials', {}).get('usernames', {}).get(username, {}).get('timezone') or "UTC"
+
+def award_points(points_data, username, amount, source, awards, tasks=0, quests=0, missions=0):
+    """
+    Adds points to points_data (in place). source is one of daily_stats.POINT_SOURCES.
+    The award is appended to the caller's awards list; pass that list to save_points (or
+    record_awards once everything is saved) so daily stats only count saved points.
+    """
+    points_data[username] = points_data.get(username, 0) + amount
+    awards.append((username, dict(
+        points=amount, source=source, tasks=tasks, quests=quests, missions=missions,
+        tz_name=user_timezone_name(username), when=datetime.now(timezone.utc)
+    )))
+
+def record_awards(awards):
+    """Adds awards made by award_points to the users' daily stats."""
+    for username, record in awards:
+        daily_stats.record(username, **record)
 
 def calculate_item_status(item_id, item_type, mission_template, mission_assignment_data):
     """
@@ -308,6 +340,7 @@ def save_task_templates(data, filename):
     try:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2)
+        bump_templates_version("task", data)
         return True
     except IOError as e:
         st.error(f"❌ Error saving to `{filename}`: Check permissions. Details: {e}")
@@ -387,68 +420,74 @@ def display_duties(
                         b_col1, b_col2 = st.columns(2)
                         with b_col1:
                             if st.button("✅ Accept", key=f"accept_{button_key_prefix}", use_container_width=True):
-                                current_assignments_state = st.session_state.get("assignments", {})
-                                if current_user_id in current_assignments_state and \
-                                   assign_id in current_assignments_state[current_user_id]:
-                                    current_assignments_state[current_user_id][assign_id]['status'] = 'active'
-                                    if save_assignments(current_assignments_state, assignments_file_path):
-                                        st.success(f"{duty_type_singular} '{duty_name}' accepted!")
-                                        log_into_history(
-                                            event_type=f"{duty_type_singular.lower()}_accepted",
-                                            message=f"User '{current_user_id}' accepted {duty_type_singular.lower()} '{duty_name}' (ID: {assign_id})",
-                                            affected_item=assign_id,
-                                            username=current_user_id,
-                                            history_file_path=history_file_path
-                                        )
-                                        st.rerun()
+                                with assignments_lock:
+                                    current_assignments_state = load_assignments(assignments_file_path) or {}
+                                    if current_user_id in current_assignments_state and \
+                                       assign_id in current_assignments_state[current_user_id]:
+                                        current_assignments_state[current_user_id][assign_id]['status'] = 'active'
+                                        if save_assignments(current_assignments_state, assignments_file_path):
+                                            st.session_state['assignments'] = current_assignments_state
+                                            st.success(f"{duty_type_singular} '{duty_name}' accepted!")
+                                            log_into_history(
+                                                event_type=f"{duty_type_singular.lower()}_accepted",
+                                                message=f"User '{current_user_id}' accepted {duty_type_singular.lower()} '{duty_name}' (ID: {assign_id})",
+                                                affected_item=assign_id,
+                                                username=current_user_id,
+                                                history_file_path=history_file_path
+                                            )
+                                            st.rerun()
+                                        else:
+                                            st.error(f"Failed to save acceptance for {duty_type_singular.lower()}.")
                                     else:
-                                        st.error(f"Failed to save acceptance for {duty_type_singular.lower()}.")
-                                else:
-                                    st.error(f"Assignment '{assign_id}' not found for user '{current_user_id}'. Please refresh.")
-                                    # Potentially st.rerun() or just let the user see the error
+                                        st.error(f"Assignment '{assign_id}' not found for user '{current_user_id}'. Please refresh.")
+                                        # Potentially st.rerun() or just let the user see the error
                         with b_col2:
                             if st.button("❌ Decline", key=f"decline_{button_key_prefix}", use_container_width=True):
-                                current_assignments_state = st.session_state.get("assignments", {})
+                                with assignments_lock:
+                                    current_assignments_state = load_assignments(assignments_file_path) or {}
+                                    if current_user_id in current_assignments_state and \
+                                       assign_id in current_assignments_state[current_user_id]:
+                                        current_assignments_state[current_user_id][assign_id]['status'] = 'declined'
+                                        if save_assignments(current_assignments_state, assignments_file_path):
+                                            st.session_state['assignments'] = current_assignments_state
+                                            st.warning(f"{duty_type_singular} '{duty_name}' declined.")
+                                            log_into_history(
+                                                event_type=f"{duty_type_singular.lower()}_declined",
+                                                message=f"User '{current_user_id}' declined {duty_type_singular.lower()} '{duty_name}' (ID: {assign_id})",
+                                                affected_item=assign_id,
+                                                username=current_user_id,
+                                                history_file_path=history_file_path
+                                            )
+                                            st.rerun()
+                                        else:
+                                            st.error(f"Failed to save decline for {duty_type_singular.lower()}.")
+                                    else:
+                                        st.error(f"Assignment '{assign_id}' not found for user '{current_user_id}'. Please refresh.")
+
+                    elif show_buttons == 'complete':
+                        if st.button(f"🏁 Mark as Complete", key=f"complete_{button_key_prefix}", use_container_width=True):
+                            with assignments_lock:
+                                current_assignments_state = load_assignments(assignments_file_path) or {}
                                 if current_user_id in current_assignments_state and \
                                    assign_id in current_assignments_state[current_user_id]:
-                                    current_assignments_state[current_user_id][assign_id]['status'] = 'declined'
+                                    current_assignments_state[current_user_id][assign_id]['status'] = 'awaiting approval'
                                     if save_assignments(current_assignments_state, assignments_file_path):
-                                        st.warning(f"{duty_type_singular} '{duty_name}' declined.")
+                                        st.session_state['assignments'] = current_assignments_state
+                                        st.success(f"{duty_type_singular} '{duty_name}' submitted for approval!")
+                                        st.balloons()
                                         log_into_history(
-                                            event_type=f"{duty_type_singular.lower()}_declined",
-                                            message=f"User '{current_user_id}' declined {duty_type_singular.lower()} '{duty_name}' (ID: {assign_id})",
+                                            event_type=f"{duty_type_singular.lower()}_submitted",
+                                            message=f"User '{current_user_id}' submitted {duty_type_singular.lower()} '{duty_name}' (ID: {assign_id}) for approval",
                                             affected_item=assign_id,
                                             username=current_user_id,
                                             history_file_path=history_file_path
                                         )
                                         st.rerun()
                                     else:
-                                        st.error(f"Failed to save decline for {duty_type_singular.lower()}.")
+                                        st.error(f"Failed to submit {duty_type_singular.lower()} for approval.")
                                 else:
                                     st.error(f"Assignment '{assign_id}' not found for user '{current_user_id}'. Please refresh.")
 
-                    elif show_buttons == 'complete':
-                        if st.button(f"🏁 Mark as Complete", key=f"complete_{button_key_prefix}", use_container_width=True):
-                            current_assignments_state = st.session_state.get("assignments", {})
-                            if current_user_id in current_assignments_state and \
-                               assign_id in current_assignments_state[current_user_id]:
-                                current_assignments_state[current_user_id][assign_id]['status'] = 'awaiting approval'
-                                if save_assignments(current_assignments_state, assignments_file_path):
-                                    st.success(f"{duty_type_singular} '{duty_name}' submitted for approval!")
-                                    st.balloons()
-                                    log_into_history(
-                                        event_type=f"{duty_type_singular.lower()}_submitted",
-                                        message=f"User '{current_user_id}' submitted {duty_type_singular.lower()} '{duty_name}' (ID: {assign_id}) for approval",
-                                        affected_item=assign_id,
-                                        username=current_user_id,
-                                        history_file_path=history_file_path
-                                    )
-                                    st.rerun()
-                                else:
-                                    st.error(f"Failed to submit {duty_type_singular.lower()} for approval.")
-                            else:
-                                st.error(f"Assignment '{assign_id}' not found for user '{current_user_id}'. Please refresh.")
-
                     elif show_buttons == 'awaiting':
                         st.info("⏳ Awaiting Parent Approval")
 
@@ -506,98 +545,104 @@ def display_tasks(task_dict, section_title, empty_message, show_buttons=None):
                         with b_col1:
                             if st.button("✅ Accept", key=f"accept_{assign_id}", use_container_width=True):
                                 # Get state
-                                current_assignments_state = st.session_state["assignments"]
-                                # Modify state
-                                if username in current_assignments_state and assign_id in current_assignments_state[username]:
-                                    current_assignments_state[username][assign_id]['status'] = 'active'
-                                    # Save state
-                                    if utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE):
-                                        st.success(f"Task '{task_template.get('name')}' accepted!")
+                                with assignments_lock:
+                                    current_assignments_state = load_assignments(ASSIGNMENTS_FILE) or {}
+                                    # Modify state
+                                    if username in current_assignments_state and assign_id in current_assignments_state[username]:
+                                        current_assignments_state[username][assign_id]['status'] = 'active'
+                                        # Save state
+                                        if utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE):
+                                            st.session_state['assignments'] = current_assignments_state
+                                            st.success(f"Task '{task_template.get('name')}' accepted!")
                                         
-                                        # --- Add History Logging ---
-                                        try:
-                                            accept_msg = f"User '{kid_username}' accepted standalone task '{task_name}'"
-                                            utils.log_into_history(
-                                                event_type="standalone_accepted",
-                                                message=accept_msg,
-                                                affected_item=assign_id,
-                                                username=kid_username # Kid performed the action
-                                            )
-                                        except Exception as e:
-                                            st.warning(f"Could not write to history log: {e}")
+                                            # --- Add History Logging ---
+                                            try:
+                                                accept_msg = f"User '{kid_username}' accepted standalone task '{task_name}'"
+                                                utils.log_into_history(
+                                                    event_type="standalone_accepted",
+                                                    message=accept_msg,
+                                                    affected_item=assign_id,
+                                                    username=kid_username # Kid performed the action
+                                                )
+                                            except Exception as e:
+                                                st.warning(f"Could not write to history log: {e}")
                                         
                                         
-                                        st.rerun()
+                                            st.rerun()
+                                        else:
+                                            st.error("Failed to save acceptance.")
                                     else:
-                                        st.error("Failed to save acceptance.")
-                                else:
-                                    st.error("Assignment not found. Refreshing.")
-                                    st.rerun()
+                                        st.error("Assignment not found. Refreshing.")
+                                        st.rerun()
 
                         with b_col2:
                             if st.button("❌ Decline", key=f"decline_{assign_id}", use_container_width=True):
                                     # Get state
-                                current_assignments_state = st.session_state["assignments"]
+                                with assignments_lock:
+                                    current_assignments_state = load_assignments(ASSIGNMENTS_FILE) or {}
+                                    # Modify state
+                                    if username in current_assignments_state and assign_id in current_assignments_state[username]:
+                                        current_assignments_state[username][assign_id]['status'] = 'declined'
+                                        # Save state
+                                        if utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE):
+                                            st.session_state['assignments'] = current_assignments_state
+                                            st.warning(f"Task '{task_template.get('name')}' declined.")
+                                        
+                                            # --- Add History Logging ---
+                                            try:
+                                                decline_msg = f"User '{kid_username}' declined standalone task '{task_name}'"
+                                                utils.log_into_history(
+                                                    event_type="standalone_declined",
+                                                    message=decline_msg,
+                                                    affected_item=assign_id,
+                                                    username=kid_username # Kid performed the action
+                                                )
+                                            except Exception as e:
+                                                st.warning(f"Could not write to history log: {e}")
+                                            # --- End History Logging ---
+
+                                        
+                                            st.rerun()
+                                        else:
+                                            st.error("Failed to save decline.")
+                                    else:
+                                        st.error("Assignment not found. Refreshing.")
+                                        st.rerun()
+
+                    elif show_buttons == 'complete':
+                        if st.button("🏁 Mark as Complete", key=f"complete_{assign_id}", use_container_width=True):
+                            # Get state
+                            with assignments_lock:
+                                current_assignments_state = load_assignments(ASSIGNMENTS_FILE) or {}
                                 # Modify state
                                 if username in current_assignments_state and assign_id in current_assignments_state[username]:
-                                    current_assignments_state[username][assign_id]['status'] = 'declined'
-                                    # Save state
+                                    current_assignments_state[username][assign_id]['status'] = 'awaiting approval'
+                                        # Save state
                                     if utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE):
-                                        st.warning(f"Task '{task_template.get('name')}' declined.")
-                                        
+                                        st.session_state['assignments'] = current_assignments_state
+                                        st.success(f"Task '{task_template.get('name')}' submitted for approval!")
+                                        st.balloons()
+                                    
                                         # --- Add History Logging ---
                                         try:
-                                            decline_msg = f"User '{kid_username}' declined standalone task '{task_name}'"
+                                            submit_msg = f"User '{kid_username}' submitted standalone task '{task_name}' for approval"
                                             utils.log_into_history(
-                                                event_type="standalone_declined",
-                                                message=decline_msg,
+                                                event_type="standalone_submitted",
+                                                message=submit_msg,
                                                 affected_item=assign_id,
                                                 username=kid_username # Kid performed the action
                                             )
                                         except Exception as e:
                                             st.warning(f"Could not write to history log: {e}")
                                         # --- End History Logging ---
-
-                                        
+                                    
                                         st.rerun()
                                     else:
-                                        st.error("Failed to save decline.")
+                                        st.error("Failed to submit task for approval.")
                                 else:
                                     st.error("Assignment not found. Refreshing.")
                                     st.rerun()
 
-                    elif show_buttons == 'complete':
-                        if st.button("🏁 Mark as Complete", key=f"complete_{assign_id}", use_container_width=True):
-                            # Get state
-                            current_assignments_state = st.session_state["assignments"]
-                            # Modify state
-                            if username in current_assignments_state and assign_id in current_assignments_state[username]:
-                                current_assignments_state[username][assign_id]['status'] = 'awaiting approval'
-                                    # Save state
-                                if utils.save_assignments(current_assignments_state, ASSIGNMENTS_FILE):
-                                    st.success(f"Task '{task_template.get('name')}' submitted for approval!")
-                                    st.balloons()
-                                    
-                                    # --- Add History Logging ---
-                                    try:
-                                        submit_msg = f"User '{kid_username}' submitted standalone task '{task_name}' for approval"
-                                        utils.log_into_history(
-                                            event_type="standalone_submitted",
-                                            message=submit_msg,
-                                            affected_item=assign_id,
-                                            username=kid_username # Kid performed the action
-                                        )
-                                    except Exception as e:
-                                        st.warning(f"Could not write to history log: {e}")
-                                    # --- End History Logging ---
-                                    
-                                    st.rerun()
-                                else:
-                                    st.error("Failed to submit task for approval.")
-                            else:
-                                st.error("Assignment not found. Refreshing.")
-                                st.rerun()
-
                     elif show_buttons == 'awaiting':
                             st.info("⏳ Awaiting Parent Approval") # Indicate status clearly
 
@@ -639,6 +684,7 @@ def save_quest_templates(data, filename):
     try:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2)
+        bump_templates_version("quest", data)
         return True
     except IOError as e:
         st.error(f"❌ Error saving to `{filename}`: Check permissions. Details: {e}")
@@ -669,6 +715,7 @@ def save_mission_templates(data, filename):
     try:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2)
+        bump_templates_version("mission", data)
         return True
     except IOError as e:
         st.error(f"❌ Error saving to `{filename}`: Check permissions. Details: {e}")
@@ -678,6 +725,11 @@ def save_mission_templates(data, filename):
         return False
 
 # --- Assigned Quest Functions ---
+# Every session and the scheduler thread rewrite the whole assignments file, so anything that
+# loads, changes and saves it holds this lock from the load to the save. Otherwise a save made
+# in between would be overwritten.
+assignments_lock = threading.RLock()
+
 def load_assignments(filename): # Renamed function
     """Loads assignment data (missions, quests, tasks) from the JSON file."""
     try:
@@ -698,11 +750,28 @@ def load_assignments(filename): # Renamed function
          assigned = None
     return assigned
 
+def read_assignments(filename):
+    """
+    load_assignments for background threads (no Streamlit messages): {} if the file does not
+    exist yet, None if it cannot be read.
+    """
+    if not Path(filename).is_file():
+        return {}
+    return json_store.read_json(filename, None)
+
+def write_assignments(data, filename):
+    """
+    save_assignments for background threads (no Streamlit messages). Raises OSError or
+    TypeError if the data cannot be written.
+    """
+    json_store.write_json(filename, data)
+    changed_users = record_assignments_saved(data)
+    deadlines.track_saved(data, changed_users) # Keeps the deadline heap current without rescanning
+
 def save_assignments(data, filename): # Renamed function
     """Saves assignment data (missions, quests, tasks) to the JSON file."""
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        write_assignments(data, filename)
         return True
     except IOError as e:
         st.error(f"❌ Error saving assignments to `{filename}`: Check permissions. Details: {e}")
@@ -711,58 +780,332 @@ def save_assignments(data, filename): # Renamed function
         st.error(f"❌ An unexpected error occurred saving assignments: {e}")
         return False
 
+# --- Data Versions ---
+# Every session on this server imports the same utils module, so these stamps are
+# shared the same way st.cache_data is. A user's version only changes when their
+# saved assignments actually change, which lets views cache per (user, version).
+_assignment_versions = {} # username -> (version, snapshot of that user's assignments)
+_templates_version = 0
+_templates_listeners = [] # Called with (type_prefix, templates) after templates are saved
+_versions_lock = threading.Lock()
+
+def assignments_version(user_assignments):
+    """Returns a short content hash for one user's assignments."""
+    encoded = json.dumps(user_assignments, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+def record_assignments_saved(assignments_data):
+    """
+    Re-stamps the version of every user whose assignments changed in this save.
+    Called by save_assignments. Returns the list of usernames that changed.
+    """
+    changed_users = []
+    if not isinstance(assignments_data, dict):
+        return changed_users
+    with _versions_lock:
+        for user, user_assignments in assignments_data.items():
+            version = assignments_version(user_assignments)
+            current = _assignment_versions.get(user)
+            if current is None or current[0] != version:
+                _assignment_versions[user] = (version, copy.deepcopy(user_assignments))
+                changed_users.append(user)
+    return changed_users
+
+def get_assignments_snapshot(username, fallback_assignments=None):
+    """
+    Returns (version, assignments) for a user from the last save seen by this server.
+    If nothing has been saved since startup, the fallback (usually the session copy)
+    is stamped and used instead.
+    """
+    with _versions_lock:
+        entry = _assignment_versions.get(username)
+    if entry is None:
+        # Copied, since pages edit the session's assignments in place before saving
+        user_assignments = copy.deepcopy(fallback_assignments or {})
+        entry = (assignments_version(user_assignments), user_assignments)
+        with _versions_lock:
+            entry = _assignment_versions.setdefault(username, entry)
+    return entry
+
+def on_templates_saved(listener):
+    """Registers a callable run with (type_prefix, templates) after templates are saved (see template_search.py)."""
+    _templates_listeners.append(listener)
+
+def bump_templates_version(type_prefix=None, templates=None):
+    """Marks every cached view built from templates as stale (names, emojis, points)."""
+    global _templates_version
+    with _versions_lock:
+        _templates_version += 1
+    if type_prefix is not None:
+        for listener in _templates_listeners:
+            try:
+                listener(type_prefix, templates)
+            except Exception as e: # A listener must never fail a save
+                print(f"Warning: Templates listener {listener.__name__} failed for {type_prefix}: {e}")
+
+def get_templates_version():
+    return _templates_version
+
 def generate_assignment_id(quest_id):
     """Generates a unique ID for a quest assignment."""
     timestamp = int(time.time())
     short_quest_id = quest_id.replace("quest_", "")[:10]
-    return f"assign_{timestamp}_{short_quest_id}"
+    # The random suffix keeps ids unique when several are generated in the same second
+    return f"assign_{timestamp}_{short_quest_id}_{secrets.token_hex(3)}"
+
+def new_assignment_data(type_prefix, template_id, assigned_by, quest_templates, due_on=None):
+    """
+    Builds a fresh assignment (pending acceptance) for a task, quest or mission template.
+    due_on is an optional ISO timestamp (with timezone) after which it is flagged overdue.
+    """
+    assignment = {
+        "type": type_prefix,
+        "template_id": template_id,
+        "assigned_by": assigned_by,
+        "assigned_on": datetime.now(timezone.utc).isoformat(),
+        "status": "pending_acceptance"
+    }
+    if due_on:
+        assignment["due_on"] = due_on
+    if type_prefix == "quest":
+        quest_template_tasks = quest_templates.get(template_id, {}).get('tasks', [])
+        assignment["task_status"] = {task['id']: "pending" for task in quest_template_tasks if 'id' in task}
+    elif type_prefix == "mission":
+        # For missions, initially no instances needed, just link the template
+        assignment["quest_instances"] = {}
+        assignment["task_instances"] = {}
+    return assignment
+
+def assign_templates(parent_username, kid_usernames, selections, quest_templates, assignments_file, due_on=None):
+    """
+    Assigns every (type_prefix, template_id, quantity) in selections to every kid as one batch:
+    assignments are loaded and saved once and the parent's history gets a single append.
+    due_on (optional ISO timestamp) applies to every new assignment.
+    Returns the new assignments as {kid: {assignment_id: data}}, or None if saving failed.
+    """
+    with assignments_lock:
+        current_assignments = load_assignments(assignments_file)
+        if current_assignments is None:
+            st.error("Failed to load current assignments before saving.")
+            return None
+
+        created = {}
+        events = []
+        for kid in kid_usernames:
+            for type_prefix, template_id, quantity in selections:
+                for _ in range(quantity):
+                    assignment_id = generate_assignment_id(f"{type_prefix}_{template_id}")
+                    assignment = new_assignment_data(type_prefix, template_id, parent_username, quest_templates, due_on)
+                    current_assignments.setdefault(kid, {})[assignment_id] = assignment
+                    created.setdefault(kid, {})[assignment_id] = assignment
+                    events.append(history.new_event(
+                        f"{type_prefix}_assigned",
+                        f"{parent_username} assigned new {type_prefix} '{template_id}' to {kid}",
+                        assignment_id, parent_username
+                    ))
+        if not created:
+            return {}
+        if not save_assignments(current_assignments, assignments_file):
+            return None
+        st.session_state['assignments'] = current_assignments
+        if not history.append_events(parent_username, events):
+            st.warning("Could not write the new assignments to your history log.")
+        return created
 
 def log_into_history(event_type, message, affected_item, username):
-    safe_filename = f"{username}_history.json"
-    HISTORY_FOLDER = Path("user_history")
-    HISTORY_FOLDER.mkdir(parents=True, exist_ok=True)
-    history_file_path = HISTORY_FOLDER / safe_filename
+    """Appends one event to the user's history log. Returns True on success."""
     try:
         if not username:
             st.warning("Could not log assignment event: User Information not found. Please screenshot and tell Andrew.")
         else:
-            now_utc = datetime.now(timezone.utc)
-            timestamp_iso = now_utc.isoformat()
-            assignment_event = {
-                "timestamp": timestamp_iso,
-                "event_type": event_type,
-                "user": username,
-                "affected_item": affected_item,
-                "message": message,
-            }
-            
-            current_history = []
-            if history_file_path.is_file():
-                try:
-                    with open(history_file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        if content:
-                            current_history = json.loads(content)
-                            if not isinstance(current_history, list):
-                                print(f"Warning: History file {history_file_path} was not a list. Resetting for append.")
-                                current_history = []
-                except json.JSONDecodeError:
-                    print(f"Warning: History file {history_file_path} was not a list. Resetting for append.")
-                    current_history = []
-                except OSError as e:
-                    st.warning(f"Could not read history file to log assignment: {e}")
-                    current_history = None
-            else:
-                st.error("History file not found!")
-            if current_history is not None:
-                current_history.append(assignment_event)
-                try:
-                    with open(history_file_path, 'w', encoding='utf-8') as f:
-                        json.dump(current_history, f, indent=4)
-                        return True
-                except OSError as e:
-                    st.warning(f"Could not write history file to log mission creation: {e}")
-            else:
-                st.error("Current history is none.")
+            assignment_event = history.new_event(event_type, message, affected_item, username)
+            if history.append_event(username, assignment_event):
+                return True
+            st.warning("Could not write history file to log this event.")
     except Exception as e:
-        st.warning(f"An error occured while logging assignment to history: {e}")
\ No newline at end of file
+        st.warning(f"An error occured while logging assignment to history: {e}")
+    return False
+
+def approve_standalone_tasks(parent_username, inbox_items, assignments_file, points_file):
+    """
+    Approves a batch of standalone tasks from the approval inbox in one go: each child's points
+    are updated once, points and then assignments are each saved once, and every affected
+    history log gets a single append. Works on fresh copies of both files (the session's can
+    be stale) and puts them in session state once saved.
+    Returns the inbox items that were approved ([] if none were still awaiting approval), or
+    None if the files could not be loaded or saved.
+    """
+    with assignments_lock:
+        assignments_data = load_assignments(assignments_file)
+        points_data = load_points(points_file)
+        if assignments_data is None or points_data is None:
+            return None
+        approved = [
+            item for item in inbox_items
+            if assignments_data.get(item['kid'], {}).get(item['assign_id'], {}).get('status') == 'awaiting approval'
+        ]
+        if not approved:
+            return []
+
+        approved_on = datetime.now().isoformat()
+        points_before = dict(points_data)
+        awards = []
+        points_by_kid = {}
+        for item in approved:
+            assignment = assignments_data[item['kid']][item['assign_id']]
+            assignment['status'] = 'completed'
+            assignment['completed_on'] = approved_on
+            kid_points, kid_tasks = points_by_kid.get(item['kid'], (0, 0))
+            points_by_kid[item['kid']] = (kid_points + item['points'], kid_tasks + 1)
+        for kid, (kid_points, kid_tasks) in points_by_kid.items():
+            award_points(points_data, kid, kid_points, 'standalone', awards, tasks=kid_tasks)
+
+        # Points first: if the assignments then fail to save, the award is undone so approving
+        # the same tasks again does not pay twice
+        if not save_points(points_data, points_file):
+            return None
+        if not save_assignments(assignments_data, assignments_file):
+            save_points(points_before, points_file)
+            return None
+        record_awards(awards)
+        st.session_state['assignments'] = assignments_data
+        st.session_state['points'] = points_data
+
+        # One history append per log: the parent's, then each child's
+        parent_events = []
+        child_events = {}
+        for item in approved:
+            kid = item['kid']
+            parent_events.append(history.new_event(
+                "standalone_approved",
+                f"Parent '{parent_username}' approved standalone task '{item['name']}' for {kid}",
+                item['assign_id'], parent_username
+            ))
+            child_events.setdefault(kid, []).append(history.new_event(
+                "task_completed",
+                f"Your guardian '{parent_username}' approved your task '{item['name']}' and awarded you {item['points']} points!",
+                item['task_id'], kid
+            ))
+        for kid, (kid_points, kid_tasks) in points_by_kid.items():
+            parent_events.append(history.new_event(
+                "points_awarded",
+                f"Parent '{parent_username}' awarded {kid_points} points to {kid} for completing {kid_tasks} task(s)",
+                kid, parent_username
+            ))
+        if not history.append_events(parent_username, parent_events):
+            st.warning("Could not write the approvals to your history log.")
+        for kid, events in child_events.items():
+            if not history.append_events(kid, events):
+                st.warning(f"Could not write the approvals to {kid}'s history log.")
+        return approved
+
+# --- Bulk Template Editing ---
+TEMPLATE_EDITOR_COLUMNS = {
+    "task": ["name", "description", "points", "emoji"],
+    "quest": ["name", "description", "emoji", "completion_bonus_points"],
+}
+TEMPLATE_EDITOR_INT_COLUMNS = ("points", "completion_bonus_points")
+
+def template_rows(type_prefix, templates):
+    """{template_id: {column: value}} for the editable columns of every template of one type."""
+    return {
+        template_id: {column: template.get(column, 0 if column in TEMPLATE_EDITOR_INT_COLUMNS else "") for column in TEMPLATE_EDITOR_COLUMNS[type_prefix]}
+        for template_id, template in (templates or {}).items()
+    }
+
+def diff_template_rows(original_rows, edited_rows):
+    """
+    Compares editor rows with the rows the editor started from. Returns (added, changed,
+    removed): added and changed map ids to {column: value} (only the edited columns for
+    changed rows), removed is a list of ids.
+    """
+    added = {template_id: row for template_id, row in edited_rows.items() if template_id not in original_rows}
+    changed = {}
+    for template_id, row in edited_rows.items():
+        if template_id in original_rows:
+            edits = {column: value for column, value in row.items() if original_rows[template_id].get(column) != value}
+            if edits:
+                changed[template_id] = edits
+    removed = [template_id for template_id in original_rows if template_id not in edited_rows]
+    return added, changed, removed
+
+def validate_template_changes(type_prefix, added, changed, removed, edited_rows, mission_templates, assignments, rules, conflicts):
+    """
+    Checks a whole diff in one pass and returns every problem found (empty if it can be saved).
+    A renamed ID shows up as a removal plus an addition, so it is blocked the same way as a delete.
+    """
+    errors = [f"'{template_id}' was changed by someone else since you opened the editor." for template_id in conflicts]
+    if type_prefix == "quest":
+        errors += [f"New quest '{template_id}' needs its steps - please use the quest form to create quests." for template_id in added]
+    for template_id in list(added) + list(changed):
+        row = edited_rows[template_id]
+        if not template_id:
+            errors.append("Every row needs an ID.")
+        if not str(row.get("name") or "").strip():
+            errors.append(f"'{template_id}': name cannot be empty.")
+        if type_prefix == "task" and not str(row.get("description") or "").strip():
+            errors.append(f"'{template_id}': description cannot be empty.")
+        for column in TEMPLATE_EDITOR_INT_COLUMNS:
+            if column in row and (not isinstance(row[column], int) or row[column] < 0):
+                errors.append(f"'{template_id}': {column.replace('_', ' ')} must be a whole number of at least 0.")
+    contains_key = "contains_tasks" if type_prefix == "task" else "contains_quests"
+    for template_id in removed:
+        using = [mission.get('name', mission_id) for mission_id, mission in (mission_templates or {}).items() if template_id in mission.get(contains_key, [])]
+        if using:
+            errors.append(f"'{template_id}' cannot be deleted or renamed while missions use it: {', '.join(using)}.")
+        assigned_to = sorted(
+            kid for kid, kid_assignments in (assignments or {}).items()
+            if any(assign_data.get('type') == type_prefix and assign_data.get('template_id') == template_id for assign_data in (kid_assignments or {}).values())
+        )
+        if assigned_to:
+            errors.append(f"'{template_id}' cannot be deleted or renamed while it is assigned to: {', '.join(assigned_to)}.")
+        if any(rule.get('type') == type_prefix and rule.get('template_id') == template_id for rule in (rules or {}).values()):
+            errors.append(f"'{template_id}' cannot be deleted or renamed while a repeat schedule uses it.")
+    return errors
+
+def save_template_changes(parent_username, type_prefix, original_rows, edited_rows, filename, mission_templates, rules):
+    """
+    Applies a bulk edit of task or quest templates: diffs edited_rows against original_rows,
+    validates the diff in one pass, then applies only the changed rows to a fresh copy of the
+    file and saves it once, with one summary history event.
+    Returns (added, changed, removed, errors); nothing is saved if there are errors.
+    """
+    load, save = (load_task_templates, save_task_templates) if type_prefix == "task" else (load_quest_templates, save_quest_templates)
+    added, changed, removed = diff_template_rows(original_rows, edited_rows)
+    if not (added or changed or removed):
+        return added, changed, removed, []
+
+    # Held until the save, so nothing can be assigned from a template between the check and its removal
+    with assignments_lock:
+        templates = load(filename)
+        if templates is None:
+            return added, changed, removed, [f"Could not load {filename}."]
+        current_rows = template_rows(type_prefix, templates)
+        # A row someone else edited (or deleted) since the editor opened is not overwritten
+        conflicts = [template_id for template_id in list(changed) + removed if current_rows.get(template_id) != original_rows[template_id]]
+        conflicts += [template_id for template_id in added if template_id in templates]
+        assignments = read_assignments(ASSIGNMENTS_FILE) if removed else {}
+        if assignments is None:
+            return added, changed, removed, [f"Could not load {ASSIGNMENTS_FILE} to check what uses the removed templates."]
+        errors = validate_template_changes(type_prefix, added, changed, removed, edited_rows, mission_templates, assignments, rules, conflicts)
+        if errors:
+            return added, changed, removed, errors
+
+        for template_id, row in added.items():
+            templates[template_id] = {**row, "created_by": parent_username}
+        for template_id, edits in changed.items():
+            templates[template_id].update(edits)
+            if type_prefix == "quest":
+                quest = templates[template_id]
+                quest["quest_combined_points"] = sum(task.get('points', 0) for task in quest.get('tasks', [])) + quest.get('completion_bonus_points', 0)
+        for template_id in removed:
+            del templates[template_id]
+        if not save(templates, filename):
+            return added, changed, removed, [f"Could not save {filename}."]
+
+    summary = ", ".join(
+        f"{label} {len(ids)} ({', '.join(list(ids)[:5])}{'…' if len(ids) > 5 else ''})"
+        for label, ids in (("added", added), ("changed", changed), ("removed", removed)) if ids
+    )
+    log_into_history("templates_edited", f"{parent_username} bulk edited {type_prefix} templates: {summary}", type_prefix, parent_username)
+    return added, changed, removed, []
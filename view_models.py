@@ -0,0 +1,456 @@
+# view_models.py
+#
+# Joined, display-ready structures built once per (user, data version) and shared by
+# every page and every session on this server. Nothing in here draws widgets - the
+# pages only render what these functions return.
+#
+# Versions come from utils: a user's assignments version changes only when their
+# saved assignments change, and the templates version changes on every template save.
+
+import threading
+import utils
+
+OVERVIEW_ACTIVE_STATUSES = ('active', 'accepted')
+OVERVIEW_AWAITING_STATUSES = ('awaiting approval', 'pending_approval')
+COMPLETED_COUNT_TYPES = {'mission': 'missions', 'quest': 'quests', 'task': 'tasks', 'standalone': 'tasks'}
+
+_view_cache = {} # (view name, key) -> (assignments version, templates version, value)
+_view_cache_lock = threading.Lock()
+
+def _cached_user_view(view_name, username, assignments_data, builder):
+    """
+    Returns builder(user_assignments) for a user, rebuilding it only when the user's
+    assignments version or the templates version has moved on.
+    """
+    templates_version = utils.get_templates_version()
+    version, user_assignments = utils.get_assignments_snapshot(username, (assignments_data or {}).get(username, {}))
+    cache_key = (view_name, username)
+    with _view_cache_lock:
+        cached = _view_cache.get(cache_key)
+    if cached and cached[0] == version and cached[1] == templates_version:
+        return cached[2]
+    value = builder(user_assignments)
+    with _view_cache_lock:
+        _view_cache[cache_key] = (version, templates_version, value)
+    return value
+
+def _cached_template_view(view_name, key, builder):
+    """Same as _cached_user_view, for views that only depend on templates."""
+    templates_version = utils.get_templates_version()
+    cache_key = (view_name, key)
+    with _view_cache_lock:
+        cached = _view_cache.get(cache_key)
+    if cached and cached[1] == templates_version:
+        return cached[2]
+    value = builder()
+    with _view_cache_lock:
+        _view_cache[cache_key] = (None, templates_version, value)
+    return value
+
+def template_for_assignment(assign_data, mission_templates, quest_templates, task_templates):
+    """Finds the template dict and a default emoji for an assignment, based on its type."""
+    item_type = assign_data.get('type')
+    template_id = assign_data.get('template_id')
+    if item_type == 'mission':
+        return mission_templates.get(template_id, {}), "🗺️"
+    if item_type == 'quest':
+        return quest_templates.get(template_id, {}), "⚔️"
+    return task_templates.get(template_id, {}), "📝"
+
+# --- Family Overview (Parent Home) ---
+def build_child_overview(child_assignments, mission_templates, quest_templates, task_templates, top_n=3):
+    """
+    Builds one child's overview row: status counts (plus how many are overdue) and the top
+    items waiting on a parent (awaiting approval first, then pending acceptance). Points are not included here
+    because they change without the assignments changing.
+    """
+    counts = {"active": 0, "awaiting": 0, "completed": 0, "pending": 0, "overdue": 0, "total": 0}
+    awaiting_items = []
+    pending_items = []
+    for assign_id, assign_data in child_assignments.items():
+        status = assign_data.get('status', 'Unknown')
+        counts["total"] += 1
+        if assign_data.get('overdue') and status != 'completed':
+            counts["overdue"] += 1
+        if status in OVERVIEW_ACTIVE_STATUSES:
+            counts["active"] += 1
+        elif status in OVERVIEW_AWAITING_STATUSES:
+            counts["awaiting"] += 1
+            awaiting_items.append((assign_id, assign_data))
+        elif status == 'completed':
+            counts["completed"] += 1
+        elif status == 'pending_acceptance':
+            counts["pending"] += 1
+            pending_items.append((assign_id, assign_data))
+
+    top_pending = []
+    for assign_id, assign_data in (awaiting_items + pending_items)[:top_n]:
+        template, default_emoji = template_for_assignment(assign_data, mission_templates, quest_templates, task_templates)
+        top_pending.append({
+            "assign_id": assign_id,
+            "name": template.get('name', assign_data.get('template_id', assign_id)),
+            "emoji": template.get('emoji') or default_emoji,
+            "status": assign_data.get('status', 'Unknown').replace('_', ' ').capitalize(),
+        })
+
+    return {**counts, "top_pending": top_pending}
+
+def family_overview(children_usernames, assignments_data, points_data, mission_templates, quest_templates, task_templates):
+    """
+    Returns {child_username: overview row} for a parent's children.
+    An unchanged family costs one cache lookup per child.
+    """
+    overview = {}
+    for child_username in children_usernames:
+        row = _cached_user_view(
+            "child_overview", child_username, assignments_data,
+            lambda child_assignments: build_child_overview(child_assignments, mission_templates, quest_templates, task_templates)
+        )
+        overview[child_username] = {**row, "points": (points_data or {}).get(child_username, 0)}
+    return overview
+
+# --- Child Activity Lists (Parent Home) ---
+def build_child_activity_lists(child_assignments, mission_templates, quest_templates, task_templates):
+    """Sorts a child's assignments into display-ready mission, quest and task lists."""
+    activity_lists = {"missions": [], "quests": [], "tasks": []}
+    for assign_id, assign_data in child_assignments.items():
+        item_type = assign_data.get("type")
+        template_id = assign_data.get("template_id")
+        status = assign_data.get("status", "Unknown")
+        info = {"id": template_id, "status": status.replace('_',' ').capitalize()} # Basic info
+
+        if item_type == "mission" and template_id:
+            template = mission_templates.get(template_id, {})
+            info["name"] = template.get("name", template_id)
+            info["emoji"] = template.get("emoji", "🗺️")
+            activity_lists["missions"].append(info)
+        elif item_type == "quest" and template_id:
+            template = quest_templates.get(template_id, {})
+            info["name"] = template.get("name", template_id)
+            info["emoji"] = template.get("emoji", "⚔️")
+            activity_lists["quests"].append(info)
+        elif item_type in ("task", "standalone") and template_id:
+            template = task_templates.get(template_id, {})
+            info["name"] = template.get("description", template_id) # Use description for task name
+            info["emoji"] = template.get("emoji", "📝")
+            activity_lists["tasks"].append(info)
+    return activity_lists
+
+def child_activity_lists(child_username, assignments_data, mission_templates, quest_templates, task_templates):
+    """Cached build_child_activity_lists for one child."""
+    return _cached_user_view(
+        "child_activity_lists", child_username, assignments_data,
+        lambda child_assignments: build_child_activity_lists(child_assignments, mission_templates, quest_templates, task_templates)
+    )
+
+# --- User Board (Quest Board, Standalone Tasks, Home kid view) ---
+def build_user_board(user_assignments, mission_templates, quest_templates, task_templates):
+    """
+    Joins every assignment of one user with its template in a single pass.
+
+    Returns a dict with:
+        groups: {(type, status): {assign_id: assignment data}}
+        details: {assign_id: {"template", "mission_name", "sub_tasks", ...}}
+        completed_counts: {"missions": n, "quests": n, "tasks": n}
+    """
+    # Sub-tasks point at their quest assignment, so index them first instead of
+    # rescanning every assignment for every quest.
+    sub_tasks_by_quest = {}
+    for assign_id, assign_data in user_assignments.items():
+        if assign_data.get('type') == 'task' and assign_data.get('quest_id'):
+            sub_tasks_by_quest.setdefault(assign_data['quest_id'], []).append(assign_data)
+
+    groups = {}
+    details = {}
+    completed_counts = {"missions": 0, "quests": 0, "tasks": 0}
+    for assign_id, assign_data in user_assignments.items():
+        item_type = assign_data.get('type')
+        status = assign_data.get('status')
+        groups.setdefault((item_type, status), {})[assign_id] = assign_data
+        if status == 'completed' and item_type in COMPLETED_COUNT_TYPES:
+            completed_counts[COMPLETED_COUNT_TYPES[item_type]] += 1
+
+        template, default_emoji = template_for_assignment(assign_data, mission_templates, quest_templates, task_templates)
+        detail = {"template": template, "default_emoji": default_emoji, "mission_name": None, "sub_tasks": None}
+
+        mission_id = assign_data.get('mission_id')
+        if mission_id:
+            mission_template_id = user_assignments.get(mission_id, {}).get('template_id')
+            detail["mission_name"] = mission_templates.get(mission_template_id, {}).get('name', 'Unknown Mission')
+
+        if item_type == 'quest':
+            sub_task_details = []
+            completed_sub_tasks = 0
+            # No sub-tasks defined in the template means nothing to roll up
+            linked_sub_tasks = sub_tasks_by_quest.get(assign_id, []) if template.get('tasks') else []
+            for task_data in linked_sub_tasks:
+                task_template = task_templates.get(task_data.get('template_id'), {})
+                task_status = task_data.get('status', 'unknown')
+                sub_task_details.append({
+                    "name": task_template.get('name', 'Unknown Task'),
+                    "status": task_status,
+                    "points": task_template.get('points', 0)
+                })
+                if task_status == 'completed':
+                    completed_sub_tasks += 1
+            # The template's task list is the total, whether or not every sub-task was assigned
+            detail["sub_tasks"] = (sub_task_details, completed_sub_tasks, len(template.get('tasks', [])))
+
+        details[assign_id] = detail
+
+    return {"groups": groups, "details": details, "completed_counts": completed_counts}
+
+def user_board(username, assignments_data, mission_templates, quest_templates, task_templates):
+    """Cached build_user_board for one user."""
+    return _cached_user_view(
+        "user_board", username, assignments_data,
+        lambda user_assignments: build_user_board(user_assignments, mission_templates, quest_templates, task_templates)
+    )
+
+def board_group(board, item_type, status):
+    """Returns {assign_id: assignment data} for one (type, status) group of a board."""
+    return board["groups"].get((item_type, status), {})
+
+# --- Mission Template Components (Manage) ---
+def mission_components(mission_id, mission_templates, quest_templates, task_templates):
+    """Resolves a mission template's quests and tasks to (id, template or None) pairs."""
+    def build():
+        mission_data = mission_templates.get(mission_id, {})
+        return {
+            "quests": [(quest_id, quest_templates.get(quest_id)) for quest_id in mission_data.get('contains_quests', [])],
+            "tasks": [(task_id, task_templates.get(task_id)) for task_id in mission_data.get('contains_tasks', [])],
+        }
+    return _cached_template_view("mission_components", mission_id, build)
+
+# --- Template Browser (Manage) ---
+def template_summary(type_prefix, template_id, templates):
+    """The one-line markdown summary of a template in the Manage browser."""
+    def build():
+        template = templates.get(template_id, {})
+        points = template.get({"task": "points", "quest": "quest_combined_points", "mission": "mission_combined_points"}[type_prefix], '')
+        return f"**{template.get('name', '')}** ({points} pts): {template.get('emoji', '')} {template.get('description', '')}"
+    return _cached_template_view("template_summary", (type_prefix, template_id), build)
+
+def template_details(type_prefix, template_id, mission_templates, quest_templates, task_templates):
+    """
+    A template's detail lines for the Manage browser, as (kind, text) pairs where kind is
+    "write", "warning" or "badge": a quest's tasks and bonus, a mission's quests, tasks and reward.
+    """
+    def build():
+        lines = []
+        if type_prefix == "quest":
+            quest_data = quest_templates.get(template_id, {})
+            for task in quest_data.get('tasks', []):
+                lines.append(("write", f"- {task.get('emoji','')} **{task.get('name','')}** ({task.get('points','')} pts): - {task.get('description','')}"))
+            lines.append(("badge", f"**Completion points: {quest_data.get('completion_bonus_points')}**"))
+        elif type_prefix == "mission":
+            components = mission_components(template_id, mission_templates, quest_templates, task_templates)
+            lines.append(("write", "**Quests in this mission:**" if components["quests"] else "**This mission contains no quests**"))
+            for quest_id, quest_info in components["quests"]:
+                if quest_info:
+                    lines.append(("write", f"- {quest_info.get('name','')} ({quest_info.get('quest_combined_points', '')} pts): {quest_info.get('description','')}"))
+                else:
+                    lines.append(("warning", f"Quest ID {quest_id} not found in quest templates."))
+            lines.append(("write", "**Standalone Tasks in this Mission**" if components["tasks"] else "No standalone tasks in this mission"))
+            for task_id, task_info in components["tasks"]:
+                if task_info:
+                    lines.append(("write", f"- {task_info.get('name','')} ({task_info.get('points', '')} pts): {task_info.get('description','')}"))
+                else:
+                    lines.append(("warning", f"Task ID {task_id} not found in task templates."))
+            completion_reward = mission_templates.get(template_id, {}).get('completion_reward', {})
+            lines.append(("badge", f"Completion points: {completion_reward.get('points')}"))
+        return lines
+    return _cached_template_view("template_details", (type_prefix, template_id), build)
+
+# --- Missions Page ---
+def mission_preview(mission_template_id, mission_templates, quest_templates, task_templates):
+    """
+    Resolves a mission template into its full preview tree: contained quests (with the
+    tasks defined inside each quest) and contained standalone tasks. A missing quest or
+    task template is kept as None so the page can warn about it.
+    """
+    def build():
+        mission_template = mission_templates.get(mission_template_id)
+        if not mission_template:
+            return None
+        return {
+            "template": mission_template,
+            "quests": [
+                {"id": quest_id, "template": quest_templates.get(quest_id),
+                 "tasks": (quest_templates.get(quest_id) or {}).get('tasks', [])}
+                for quest_id in mission_template.get('contains_quests', [])
+            ],
+            "tasks": [(task_id, task_templates.get(task_id)) for task_id in mission_template.get('contains_tasks', [])],
+        }
+    return _cached_template_view("mission_preview", mission_template_id, build)
+
+def build_mission_item_statuses(user_assignments, mission_templates):
+    """
+    Returns {mission_assign_id: {(item_type, item_id): status}} for every accepted mission,
+    using utils.calculate_item_status for each contained quest and task.
+    """
+    statuses = {}
+    for assign_id, assign_data in user_assignments.items():
+        if assign_data.get('type') != 'mission' or assign_data.get('status') != 'accepted':
+            continue
+        mission_template = mission_templates.get(assign_data.get('template_id'))
+        if not mission_template:
+            continue
+        item_statuses = {}
+        for quest_id in mission_template.get('contains_quests', []):
+            item_statuses[('quest', quest_id)] = utils.calculate_item_status(quest_id, 'quest', mission_template, assign_data)
+        for task_id in mission_template.get('contains_tasks', []):
+            item_statuses[('task', task_id)] = utils.calculate_item_status(task_id, 'task', mission_template, assign_data)
+        statuses[assign_id] = item_statuses
+    return statuses
+
+def mission_item_statuses(username, assignments_data, mission_templates):
+    """Cached build_mission_item_statuses for one user."""
+    return _cached_user_view(
+        "mission_item_statuses", username, assignments_data,
+        lambda user_assignments: build_mission_item_statuses(user_assignments, mission_templates)
+    )
+
+# --- Active Quests: what a kid can act on right now ---
+_actionable_state = {} # username -> {"version", "templates_version", "snapshot", "entries", "items"}
+_actionable_lock = threading.Lock()
+
+def build_actionable_entries(assign_id, assign_data, mission_templates, quest_templates, task_templates):
+    """
+    Returns the actionable items contributed by one assignment: an active standalone quest,
+    or the active quests/tasks inside an accepted mission. Anything else contributes nothing.
+    """
+    item_type = assign_data.get('type')
+    status = assign_data.get('status')
+    entries = []
+
+    if item_type == 'quest' and status == 'active':
+        quest_id = assign_data.get('quest_id') or assign_data.get('template_id')
+        quest_template = quest_templates.get(quest_id)
+        if quest_template:
+            entries.append({
+                "item_type": "standalone_quest", "assign_id": assign_id,
+                "quest_id": quest_id, "template": quest_template,
+                "task_statuses": assign_data.get('task_status', {})
+            })
+
+    elif item_type == 'mission' and status == 'accepted':
+        mission_template = mission_templates.get(assign_data.get('template_id'))
+        if not mission_template:
+            return entries
+        for quest_id in mission_template.get('contains_quests', []):
+            if utils.calculate_item_status(quest_id, 'quest', mission_template, assign_data) != 'active':
+                continue
+            quest_template = quest_templates.get(quest_id)
+            if quest_template:
+                entries.append({
+                    "item_type": "mission_quest", "assign_id": assign_id, # Mission's assignment ID
+                    "quest_id": quest_id, "template": quest_template,
+                    "task_statuses": assign_data.get('quest_instances', {}).get(quest_id, {}).get('task_status', {}),
+                    "mission_template": mission_template # Keep for context display
+                })
+            else:
+                print(f"Warning: Mission '{assign_data.get('template_id')}' lists quest '{quest_id}', which has no template; skipping it.")
+        for task_id in mission_template.get('contains_tasks', []):
+            if utils.calculate_item_status(task_id, 'task', mission_template, assign_data) != 'active':
+                continue
+            task_template = task_templates.get(task_id)
+            if task_template:
+                entries.append({
+                    "item_type": "mission_task", "assign_id": assign_id, # Mission assignment ID
+                    "task_id": task_id, "template": task_template,
+                    "mission_template": mission_template # Pass mission template for context
+                })
+            else:
+                print(f"Warning: Mission '{assign_data.get('template_id')}' lists task '{task_id}', which has no template; skipping it.")
+
+    return entries
+
+def actionable_items(username, assignments_data, mission_templates, quest_templates, task_templates):
+    """
+    Returns the list of items a kid can act on now (standalone quests first, then mission items).
+
+    The list is maintained per user: when the user's data version moves on, only the
+    assignments that actually changed (completed, unlocked, accepted, added or removed)
+    are re-evaluated against the previous snapshot. A template change rebuilds everything.
+    """
+    templates_version = utils.get_templates_version()
+    version, user_assignments = utils.get_assignments_snapshot(username, (assignments_data or {}).get(username, {}))
+    with _actionable_lock:
+        state = _actionable_state.get(username)
+        if state and state["version"] == version and state["templates_version"] == templates_version:
+            return state["items"]
+
+        if state and state["templates_version"] == templates_version:
+            previous_snapshot = state["snapshot"]
+            entries = {assign_id: items for assign_id, items in state["entries"].items() if assign_id in user_assignments}
+        else:
+            previous_snapshot = {}
+            entries = {}
+
+        for assign_id, assign_data in user_assignments.items():
+            if assign_id in previous_snapshot and previous_snapshot[assign_id] == assign_data:
+                continue # Unchanged since the last build
+            assign_entries = build_actionable_entries(assign_id, assign_data, mission_templates, quest_templates, task_templates)
+            if assign_entries:
+                entries[assign_id] = assign_entries
+            else:
+                entries.pop(assign_id, None)
+
+        # Only assignments with something to do are kept, so this is proportional to actionable work
+        items = [item for assign_entries in entries.values() for item in assign_entries if item["item_type"] == "standalone_quest"]
+        items += [item for assign_entries in entries.values() for item in assign_entries if item["item_type"] != "standalone_quest"]
+
+        _actionable_state[username] = {
+            "version": version, "templates_version": templates_version,
+            "snapshot": user_assignments, "entries": entries, "items": items,
+        }
+        return items
+
+# --- Approval Inbox (parents) ---
+INBOX_STATUS = 'awaiting approval'
+_awaiting_state = {} # username -> {"version", "snapshot", "items": {assign_id: assign_data}}
+_awaiting_lock = threading.Lock()
+
+def awaiting_approval(username, assignments_data):
+    """
+    A kid's standalone tasks awaiting approval, {assign_id: assign_data}. Kept per kid and
+    updated only for the assignments that changed since the kid's data was last saved
+    (a submit adds an item, an approve or reject removes it).
+    """
+    version, user_assignments = utils.get_assignments_snapshot(username, (assignments_data or {}).get(username, {}))
+    with _awaiting_lock:
+        state = _awaiting_state.get(username)
+        if state and state["version"] == version:
+            return state["items"]
+        previous_snapshot = state["snapshot"] if state else {}
+        items = {assign_id: data for assign_id, data in (state["items"] if state else {}).items() if assign_id in user_assignments}
+        for assign_id, assign_data in user_assignments.items():
+            if assign_id in previous_snapshot and previous_snapshot[assign_id] == assign_data:
+                continue
+            if assign_data.get('type') == 'standalone' and assign_data.get('status') == INBOX_STATUS:
+                items[assign_id] = assign_data
+            else:
+                items.pop(assign_id, None)
+        _awaiting_state[username] = {"version": version, "snapshot": user_assignments, "items": items}
+        return items
+
+def approval_inbox(children_usernames, assignments_data, task_templates):
+    """
+    Everything a parent has to approve, across their children, as a list of entries:
+    {"kid", "assign_id", "task_id", "template", "name", "emoji", "points"}. Items whose
+    template was deleted are left out.
+    """
+    inbox = []
+    for kid in children_usernames:
+        for assign_id, assign_data in awaiting_approval(kid, assignments_data).items():
+            task_id = assign_data.get('task_id') or assign_data.get('template_id')
+            template = task_templates.get(task_id)
+            if not template:
+                continue
+            inbox.append({
+                "kid": kid, "assign_id": assign_id, "task_id": task_id, "template": template,
+                "name": template.get('name', 'Unnamed Task'), "emoji": template.get('emoji', '❓'),
+                "points": template.get('points', 0),
+            })
+    return inbox